@@ -2,128 +2,206 @@
 API Endpoints для обработки запросов от Frontend
 """
 from aiohttp import web
+import asyncio
+import base64
 import json
+import logging
+import math
+import os
 import random
-from database.db_manager import DatabaseManager
+from backend.auth import InitDataAuth
+from backend.cases import MAX_RTP, MIN_RTP, CaseCatalog
+from backend.metrics import MetricsRegistry, RequestMetrics, instrument_database, metrics_handler
+from backend.presence import PresenceTracker
+from backend.realtime import Broadcaster
+from backend.rolls import COLORS as ROLLS_COLORS, MAX_BET as ROLLS_MAX_BET, MIN_BET as ROLLS_MIN_BET, RollsEngine
+from database.db_manager import INVENTORY_FIELDS, INVENTORY_SORTS, MIN_WITHDRAWAL, DatabaseManager
+from database.leaderboard import WINDOWS as LEADERBOARD_WINDOWS
+from database.sharding import ShardedDatabaseManager
 
-db = DatabaseManager()
+logger = logging.getLogger(__name__)
 
-# User endpoints
-async def get_user_data(request):
-    """Получить данные пользователя"""
-    user_id = int(request.headers.get('X-Telegram-User-Id', 0))
+db_options = dict(
+    db_path=os.getenv('DB_PATH', 'database/casino.db'),
+    pool_size=int(os.getenv('DB_POOL_SIZE', '4')),
+    activity_flush_interval=float(os.getenv('ACTIVITY_FLUSH_INTERVAL', '5')),
+    leaderboard_game_wins=os.getenv('LEADERBOARD_GAME_WINS', '0') == '1',
+    write_batch_size=int(os.getenv('DB_WRITE_BATCH_SIZE', '128')),
+    write_batch_delay=float(os.getenv('DB_WRITE_BATCH_DELAY_MS', '0')) / 1000
+)
+# DB_SHARDS > 1 - данные пользователей в нескольких файлах (перенос: database/reshard.py)
+DB_SHARDS = int(os.getenv('DB_SHARDS', '1'))
+db = ShardedDatabaseManager(shards=DB_SHARDS, **db_options) if DB_SHARDS > 1 else DatabaseManager(**db_options)
+presence = PresenceTracker()
+auth = InitDataAuth(
+    os.getenv('BOT_TOKEN'),
+    enabled=os.getenv('INIT_DATA_AUTH', '1') == '1',
+    exempt=('/api/ws',)
+)
+hub = Broadcaster(auth.authenticate_message)
+cases = CaseCatalog(
+    os.getenv('CASES_CATALOG', 'backend/cases.json'),
+    min_rtp=float(os.getenv('CASES_MIN_RTP', MIN_RTP)),
+    max_rtp=float(os.getenv('CASES_MAX_RTP', MAX_RTP))
+)
+
+# Метрики Prometheus на /metrics (METRICS=0 - отключить замеры); у каждого воркера свои
+METRICS_ENABLED = os.getenv('METRICS', '1') == '1'
+metrics = MetricsRegistry({'worker': os.environ['WORKER_ID']} if 'WORKER_ID' in os.environ else None)
+request_metrics = RequestMetrics(metrics)
+if METRICS_ENABLED:
+    instrument_database(db, metrics)
+    metrics.collector(lambda: [
+        ('users_online', 'gauge', 'Пользователей онлайн', presence.stats()['online_now']),
+        ('websocket_subscribers', 'gauge', 'Подключений WebSocket', hub.stats()['subscribers']),
+        ('initdata_cache_hit_ratio', 'gauge', 'Доля попаданий кэша initData', auth.stats()['hit_rate']),
+    ])
+
+MAX_CASES_PER_OPEN = 100
+INVENTORY_PAGE_SIZE = 50
+INVENTORY_PAGE_MAX = 200
+INVENTORY_EXPORT_BATCH = 500
+REFERRALS_PAGE_SIZE = 20
+REFERRALS_PAGE_MAX = 100
+rolls = RollsEngine(db, hub=hub)
+
+class RequestContext:
+    """Общие обращения к БД в пределах одного запроса: каждое выполняется один раз"""
     
-    user_info = await db.get_user_info(user_id)
-    balance_data = await db.get_balance(user_id)
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._calls = {}
     
-    return web.json_response({
+    def _once(self, key, factory):
+        if key not in self._calls:
+            self._calls[key] = asyncio.ensure_future(factory())
+        return self._calls[key]
+    
+    def user_info(self):
+        return self._once('user_info', lambda: db.get_user_info(self.user_id))
+    
+    def balance(self):
+        return self._once('balance', lambda: db.get_balance(self.user_id))
+
+# User endpoints
+async def user_data_payload(ctx, params):
+    user_info, balance_data = await asyncio.gather(ctx.user_info(), ctx.balance())
+    return {
         'user': user_info,
         'balance': balance_data['balance'],
         'ref_balance': balance_data['ref_balance']
-    })
+    }
+
+async def get_user_data(request):
+    """Получить данные пользователя"""
+    return web.json_response(await user_data_payload(RequestContext(request['user_id']), request.query))
 
 async def get_balance(request):
     """Получить баланс"""
-    user_id = int(request.headers.get('X-Telegram-User-Id', 0))
+    user_id = request['user_id']
     balance_data = await db.get_balance(user_id)
     return web.json_response(balance_data)
 
 async def update_activity(request):
     """Обновить активность пользователя"""
-    user_id = int(request.headers.get('X-Telegram-User-Id', 0))
+    user_id = request['user_id']
+    presence.touch(user_id)
     await db.update_last_activity(user_id)
     return web.json_response({'status': 'ok'})
 
 # Gift Upgrade Game
 async def play_gift_upgrade(request):
     """Играть в Gift Upgrade"""
-    user_id = int(request.headers.get('X-Telegram-User-Id', 0))
+    user_id = request['user_id']
     data = await request.json()
     
-    bet_amount = float(data['bet_amount'])
-    multiplier = float(data['multiplier'])
+    try:
+        bet_amount = float(data['bet_amount'])
+        multiplier = float(data['multiplier'])
+    except (KeyError, TypeError, ValueError):
+        return web.json_response({'error': 'Invalid bet'}, status=400)
     
-    # Проверка баланса
-    balance_data = await db.get_balance(user_id)
-    if balance_data['balance'] < bet_amount:
-        return web.json_response({'error': 'Insufficient balance'}, status=400)
+    if not (math.isfinite(bet_amount) and bet_amount > 0 and math.isfinite(multiplier) and multiplier >= 1):
+        return web.json_response({'error': 'Invalid bet'}, status=400)
     
     # Вычисление шанса выигрыша
     win_chance = min(100 / multiplier, 90)
     is_win = random.random() * 100 < win_chance
     
-    # Обновление баланса
-    if is_win:
-        win_amount = bet_amount * multiplier
-        await db.add_balance(user_id, win_amount - bet_amount)
-        result = 'win'
-    else:
-        await db.remove_balance(user_id, bet_amount)
-        win_amount = 0
-        result = 'loss'
-    
-    # Сохранение в историю
-    await db.add_game_played(user_id)
+    # Проверка баланса, обновление баланса и запись в историю одной транзакцией
+    settlement = await db.settle_gift_upgrade(user_id, bet_amount, multiplier, is_win)
+    if settlement is None:
+        return web.json_response({'error': 'Insufficient balance'}, status=400)
     
     return web.json_response({
-        'result': result,
+        'result': settlement['result'],
         'bet_amount': bet_amount,
-        'win_amount': win_amount,
+        'win_amount': settlement['win_amount'],
         'multiplier': multiplier,
-        'balance': (await db.get_balance(user_id))['balance']
+        'balance': settlement['balance']
     })
 
 async def get_gift_upgrade_history(request):
-    """История Gift Upgrade"""
-    user_id = int(request.headers.get('X-Telegram-User-Id', 0))
-    limit = int(request.query.get('limit', 10))
-    
-    # Заглушка - в реальности нужно добавить метод в db_manager
-    return web.json_response([])
+    """История Gift Upgrade (?limit=&before_id= для следующих страниц)"""
+    user_id = request['user_id']
+    try:
+        limit = min(max(int(request.query.get('limit', 10)), 1), 100)
+        before_id = int(request.query['before_id']) if request.query.get('before_id') else None
+    except ValueError:
+        return web.json_response({'error': 'Invalid pagination'}, status=400)
+    
+    history = await db.get_gift_upgrade_history(user_id, limit, before_id)
+    return web.json_response(history)
 
 # Rolls Game
 async def get_current_rolls_game(request):
     """Текущая игра Rolls"""
-    # Заглушка - нужна логика для синхронизации игр
-    return web.json_response({
-        'game_number': 1,
-        'time_remaining': 10
-    })
+    return web.json_response(rolls.current())
 
 async def place_rolls_bet(request):
     """Сделать ставку в Rolls"""
-    user_id = int(request.headers.get('X-Telegram-User-Id', 0))
+    user_id = request['user_id']
     data = await request.json()
     
-    color = data['color']
-    amount = float(data['amount'])
+    try:
+        color = data['color']
+        amount = float(data['amount'])
+    except (KeyError, TypeError, ValueError):
+        return web.json_response({'error': 'Invalid bet'}, status=400)
     
-    # Проверка баланса
-    balance_data = await db.get_balance(user_id)
-    if balance_data['balance'] < amount:
-        return web.json_response({'error': 'Insufficient balance'}, status=400)
+    # not <= отсекает и NaN
+    if not isinstance(color, str) or color not in ROLLS_COLORS or not ROLLS_MIN_BET <= amount <= ROLLS_MAX_BET:
+        return web.json_response({'error': 'Invalid bet'}, status=400)
     
-    # Снятие средств
-    await db.remove_balance(user_id, amount)
+    # Проверка приема ставок (у основного воркера), баланса, списание и запись ставки одной транзакцией
+    bet = await rolls.place_bet(user_id, color, amount)
+    if 'error' in bet:
+        return web.json_response({'error': bet['error']}, status=400)
     
-    return web.json_response({'status': 'ok'})
+    return web.json_response({
+        'status': 'ok',
+        'game_number': bet['game_number'],
+        'balance': bet['balance']
+    })
 
 async def get_rolls_history(request):
     """История Rolls"""
     limit = int(request.query.get('limit', 100))
-    # Заглушка
-    return web.json_response([])
+    return web.json_response(list(rolls.history)[:limit])
 
 async def get_rolls_bets(request):
     """Ставки текущей игры Rolls"""
-    game_number = int(request.query.get('game_number', 1))
-    # Заглушка
-    return web.json_response([])
+    game_number = int(request.query.get('game_number', rolls.game_number))
+    
+    if game_number == rolls.game_number:
+        return web.json_response(rolls.current_bets())
+    
+    return web.json_response(await db.get_rolls_bets(game_number))
 
 # Mutants (Cases)
 async def can_open_free_case(request):
     """Проверка возможности открыть бесплатный кейс"""
-    user_id = int(request.headers.get('X-Telegram-User-Id', 0))
+    user_id = request['user_id']
     can_claim = await db.can_claim_free_case(user_id)
     
     return web.json_response({
@@ -132,41 +210,164 @@ async def can_open_free_case(request):
     })
 
 async def open_case(request):
-    """Открыть кейс"""
-    user_id = int(request.headers.get('X-Telegram-User-Id', 0))
+    """Открыть кейс (или сразу несколько)"""
+    user_id = request['user_id']
     data = await request.json()
     
     case_name = data['case_name']
-    
-    # Логика открытия кейса
-    # Здесь нужна полная реализация с учетом процентов
-    
-    # Пример:
-    reward_name = "1 TON"
-    reward_value = 1.0
-    
-    if reward_value > 0:
-        await db.add_balance(user_id, reward_value)
+    try:
+        count = int(data.get('count', 1))
+    except (TypeError, ValueError):
+        return web.json_response({'error': 'Invalid count'}, status=400)
+    
+    case = cases.get(case_name)
+    if case is None:
+        return web.json_response({'error': 'Unknown case'}, status=400)
+    
+    cooldown = case.get('cooldown')
+    if not 1 <= count <= (1 if cooldown else MAX_CASES_PER_OPEN):
+        return web.json_response({'error': 'Invalid count'}, status=400)
+    
+    # Все награды выбираются за один проход, запись - одной транзакцией
+    rewards = cases.draw_many(case_name, count)
+    opened = await db.open_cases(user_id, case_name, case['price'], rewards, cooldown)
+    
+    if opened is None:
+        error = 'Free case is not available yet' if cooldown else 'Insufficient balance'
+        return web.json_response({'error': error}, status=400)
+    
+    summary = {}
+    for reward in rewards:
+        item = summary.setdefault(reward['name'], {
+            'name': reward['name'],
+            'type': reward.get('type', 'ton'),
+            'value': reward['value'],
+            'count': 0
+        })
+        item['count'] += 1
+    
+    best = max(rewards, key=lambda reward: reward['value'])
     
     return web.json_response({
-        'reward_name': reward_name,
-        'reward_value': reward_value,
-        'balance': (await db.get_balance(user_id))['balance']
+        'count': count,
+        'total_price': opened['total_price'],
+        'ton_won': opened['ton_won'],
+        'rewards': sorted(summary.values(), key=lambda item: item['value'], reverse=True),
+        # Самая ценная награда (для одиночного открытия - единственная)
+        'reward_name': best['name'],
+        'reward_value': best['value'],
+        'balance': opened['balance']
     })
 
 # Inventory
+def encode_cursor(sort, order, key):
+    """Непрозрачный курсор страницы: сортировка и ключ последнего предмета"""
+    raw = json.dumps([sort, order, *key], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor, sort, order):
+    """Ключ (значение сортировки, id) из курсора; ValueError, если курсор чужой или поврежден"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, cursor_order, value, item_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    
+    if not isinstance(value, (str, int, float)):
+        raise ValueError('Invalid cursor')
+    if (cursor_sort, cursor_order) != (sort, order):
+        raise ValueError('Cursor does not match sort')
+    return value, int(item_id)
+
+def parse_inventory_query(query):
+    """Сортировка, фильтры и поля инвентаря из query-параметров"""
+    sort = query.get('sort', 'acquired_at')
+    order = query.get('order', 'desc')
+    if sort not in INVENTORY_SORTS or order not in ('asc', 'desc'):
+        raise ValueError('Invalid sort')
+    
+    fields = query.get('fields', INVENTORY_FIELDS)
+    fields = tuple(fields.split(',') if isinstance(fields, str) else fields)
+    if not fields or any(field not in INVENTORY_FIELDS for field in fields):
+        raise ValueError('Invalid fields')
+    
+    return {
+        'sort': sort,
+        'order': order,
+        'item_type': query.get('item_type'),
+        'min_value': float(query['min_value']) if 'min_value' in query else None,
+        'max_value': float(query['max_value']) if 'max_value' in query else None,
+        'fields': fields,
+    }
+
+async def inventory_payload(ctx, params):
+    """Страница инвентаря; ValueError при неверных параметрах"""
+    query = parse_inventory_query(params)
+    limit = min(max(int(params.get('limit', INVENTORY_PAGE_SIZE)), 1), INVENTORY_PAGE_MAX)
+    cursor = params.get('cursor')
+    after = decode_cursor(cursor, query['sort'], query['order']) if cursor else None
+    
+    if after is None:
+        page, total = await asyncio.gather(
+            db.get_inventory_page(ctx.user_id, limit=limit, **query),
+            db.count_inventory(ctx.user_id, query['item_type'], query['min_value'], query['max_value'])
+        )
+    else:
+        page = await db.get_inventory_page(ctx.user_id, limit=limit, after=after, **query)
+    
+    response = {
+        'items': page['items'],
+        'next_cursor': encode_cursor(query['sort'], query['order'], page['next']) if page['next'] else None,
+    }
+    if after is None:
+        response['total'] = total
+    
+    return response
+
 async def get_inventory(request):
-    """Получить инвентарь"""
-    user_id = int(request.headers.get('X-Telegram-User-Id', 0))
-    inventory = await db.get_inventory(user_id)
-    return web.json_response(inventory)
+    """Получить страницу инвентаря (?limit=&cursor=&sort=&order=&item_type=&min_value=&max_value=&fields=)"""
+    try:
+        response = await inventory_payload(RequestContext(request['user_id']), request.query)
+    except ValueError as e:
+        return web.json_response({'error': str(e)}, status=400)
+    
+    return web.json_response(response)
+
+async def export_inventory(request):
+    """Выгрузить весь инвентарь потоком NDJSON (по предмету в строке)"""
+    user_id = request['user_id']
+    
+    try:
+        params = parse_inventory_query(request.query)
+    except ValueError as e:
+        return web.json_response({'error': str(e)}, status=400)
+    
+    response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+    
+    async for batch in db.iter_inventory(user_id, batch_size=INVENTORY_EXPORT_BATCH, **params):
+        await response.write(''.join(json.dumps(item) + '\n' for item in batch).encode())
+    
+    await response.write_eof()
+    return response
+
+def parse_item_id(value):
+    """id предмета - целое число или строка из цифр; иначе None"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return None
 
 async def sell_inventory_item(request):
     """Продать предмет"""
-    user_id = int(request.headers.get('X-Telegram-User-Id', 0))
+    user_id = request['user_id']
     data = await request.json()
     
-    item_id = data['item_id']
+    item_id = parse_item_id(data.get('item_id'))
+    if item_id is None:
+        return web.json_response({'error': 'Invalid item_id'}, status=400)
     value = await db.sell_inventory_item(item_id, user_id)
     
     return web.json_response({
@@ -176,47 +377,106 @@ async def sell_inventory_item(request):
     })
 
 async def sell_all_items(request):
-    """Продать все предметы"""
-    user_id = int(request.headers.get('X-Telegram-User-Id', 0))
-    inventory = await db.get_inventory(user_id)
-    
-    total_value = sum(item['item_value'] for item in inventory)
-    
-    for item in inventory:
-        await db.sell_inventory_item(item['id'], user_id)
+    """Продать все предметы или выборку (item_ids, item_type, min_value, max_value)"""
+    user_id = request['user_id']
+    data = await request.json() if request.can_read_body else {}
+    
+    item_ids = data.get('item_ids')
+    if item_ids is not None:
+        # Некорректный id - 400, а не ошибка в sell_items
+        item_ids = [parse_item_id(item_id) for item_id in item_ids] if isinstance(item_ids, list) else [None]
+        if None in item_ids:
+            return web.json_response({'error': 'Invalid item_ids'}, status=400)
+    
+    try:
+        min_value = float(data['min_value']) if data.get('min_value') is not None else None
+        max_value = float(data['max_value']) if data.get('max_value') is not None else None
+    except (TypeError, ValueError):
+        return web.json_response({'error': 'Invalid value range'}, status=400)
+    
+    sold = await db.sell_items(
+        user_id,
+        item_ids=item_ids,
+        item_type=data.get('item_type'),
+        min_value=min_value,
+        max_value=max_value
+    )
     
     return web.json_response({
         'status': 'ok',
-        'total_value': total_value,
-        'balance': (await db.get_balance(user_id))['balance']
+        'count': sold['count'],
+        'total_value': sold['total_value'],
+        'balance': sold['balance']
     })
 
 # Leaderboard
+async def leaderboard_payload(ctx, params):
+    """Топ игроков; ValueError при неверном окне"""
+    limit = int(params.get('limit', 35))
+    window = params.get('window', 'all')
+    
+    if window not in LEADERBOARD_WINDOWS:
+        raise ValueError('Invalid window')
+    
+    return await db.get_leaderboard(limit, window)
+
 async def get_leaderboard(request):
     """Получить лидерборд"""
-    limit = int(request.query.get('limit', 35))
-    leaderboard = await db.get_leaderboard(limit)
+    try:
+        leaderboard = await leaderboard_payload(RequestContext(request['user_id']), request.query)
+    except ValueError as e:
+        return web.json_response({'error': str(e)}, status=400)
+    
     return web.json_response(leaderboard)
 
+async def get_leaderboard_rank(request):
+    """Место пользователя в лидерборде"""
+    user_id = request['user_id']
+    window = request.query.get('window', 'all')
+    
+    if window not in LEADERBOARD_WINDOWS:
+        return web.json_response({'error': 'Invalid window'}, status=400)
+    
+    rank = await db.get_leaderboard_rank(user_id, window)
+    return web.json_response(rank)
+
 # Referrals
+async def referral_payload(ctx, params):
+    """Реферальные итоги и страница рефералов (?limit=&before=); ValueError при неверных параметрах"""
+    try:
+        limit = min(max(int(params.get('limit', REFERRALS_PAGE_SIZE)), 1), REFERRALS_PAGE_MAX)
+        before = int(params['before']) if params.get('before') else None
+    except (TypeError, ValueError):
+        raise ValueError('Invalid pagination')
+    
+    summary, referrals, balance_data = await asyncio.gather(
+        db.get_referral_summary(ctx.user_id),
+        db.get_user_referrals(ctx.user_id, limit + 1, before),
+        ctx.balance()
+    )
+    
+    return {
+        'referrals_count': summary['referrals_count'],
+        'referrals': referrals[:limit],
+        'next_before': referrals[limit - 1]['user_id'] if len(referrals) > limit else None,
+        'ref_balance': balance_data['ref_balance'],
+        'ref_percent': summary['ref_percent'],
+        'total_earned': summary['total_earned'],
+        'earned_30d': summary['earned_30d']
+    }
+
 async def get_referral_data(request):
     """Получить реферальные данные"""
-    user_id = int(request.headers.get('X-Telegram-User-Id', 0))
-    referrals = await db.get_user_referrals(user_id)
-    balance_data = await db.get_balance(user_id)
-    
-    total_earned = sum(ref['total_deposits'] * 0.1 for ref in referrals)
+    try:
+        referral = await referral_payload(RequestContext(request['user_id']), request.query)
+    except ValueError as e:
+        return web.json_response({'error': str(e)}, status=400)
     
-    return web.json_response({
-        'referrals_count': len(referrals),
-        'referrals': referrals,
-        'ref_balance': balance_data['ref_balance'],
-        'total_earned': total_earned
-    })
+    return web.json_response(referral)
 
 async def transfer_ref_balance(request):
     """Перевести реферальный баланс"""
-    user_id = int(request.headers.get('X-Telegram-User-Id', 0))
+    user_id = request['user_id']
     transferred = await db.transfer_ref_balance(user_id)
     
     return web.json_response({
@@ -228,7 +488,7 @@ async def transfer_ref_balance(request):
 # Deposits
 async def create_deposit(request):
     """Создать депозит"""
-    user_id = int(request.headers.get('X-Telegram-User-Id', 0))
+    user_id = request['user_id']
     data = await request.json()
     
     amount = float(data['amount'])
@@ -246,37 +506,108 @@ async def create_deposit(request):
 # Withdrawals
 async def create_withdrawal(request):
     """Создать запрос на вывод"""
-    user_id = int(request.headers.get('X-Telegram-User-Id', 0))
+    user_id = request['user_id']
     data = await request.json()
     
-    amount = float(data['amount'])
-    wallet = data['wallet']
+    try:
+        amount = float(data['amount'])
+    except (KeyError, TypeError, ValueError):
+        return web.json_response({'error': 'Invalid amount'}, status=400)
+    if not amount >= MIN_WITHDRAWAL:
+        return web.json_response({'error': f'Minimum withdrawal is {MIN_WITHDRAWAL} TON'}, status=400)
     
-    balance_data = await db.get_balance(user_id)
-    if balance_data['balance'] < amount:
-        return web.json_response({'error': 'Insufficient balance'}, status=400)
+    wallet = data.get('wallet')
+    if not isinstance(wallet, str) or not wallet.strip():
+        return web.json_response({'error': 'Invalid wallet'}, status=400)
     
+    # Проверка и списание баланса одной транзакцией
     request_id = await db.create_withdrawal_request(user_id, amount, wallet)
+    if request_id is None:
+        return web.json_response({'error': 'Insufficient balance'}, status=400)
     
     return web.json_response({
         'status': 'ok',
         'request_id': request_id
     })
 
-async def get_user_stats(request):
-    """Статистика пользователя"""
-    user_id = int(request.headers.get('X-Telegram-User-Id', 0))
-    user_info = await db.get_user_info(user_id)
-    
-    return web.json_response({
+async def stats_payload(ctx, params):
+    user_info = await ctx.user_info()
+    if user_info is None:
+        # Пользователь еще не зарегистрирован (/start) - нулевая статистика, как у баланса
+        return {'games_played': 0, 'total_deposits': 0, 'balance': 0}
+    return {
         'games_played': user_info['games_played'],
         'total_deposits': user_info['total_deposits'],
         'balance': user_info['balance']
-    })
+    }
+
+async def get_user_stats(request):
+    """Статистика пользователя"""
+    return web.json_response(await stats_payload(RequestContext(request['user_id']), request.query))
+
+# Bootstrap & Batch
+# Ресурсы, которые можно запросить одним запросом: имя -> функция (ctx, params)
+BATCH_RESOURCES = {
+    'user': user_data_payload,
+    'stats': stats_payload,
+    'inventory': inventory_payload,
+    'leaderboard': leaderboard_payload,
+    'referral': referral_payload,
+}
+
+async def resolve_batch(user_id, requests):
+    """Выполнить ресурсы конкурентно; общие обращения (пользователь, баланс) - один раз"""
+    ctx = RequestContext(user_id)
+    
+    async def resolve(name, params):
+        # Ошибка одного ресурса не должна ронять весь ответ
+        try:
+            return await BATCH_RESOURCES[name](ctx, params)
+        except ValueError as e:
+            return {'error': str(e)}
+        except Exception as e:
+            logger.exception(f"Batch resource {name} failed for {user_id}: {e}")
+            return {'error': 'Internal error'}
+    
+    results = await asyncio.gather(*(resolve(name, params) for name, params in requests.items()))
+    return dict(zip(requests, results))
+
+async def bootstrap(request):
+    """Все данные для старта приложения (?include=user,stats,... - по умолчанию все ресурсы)"""
+    include = request.query.get('include')
+    names = include.split(',') if include else list(BATCH_RESOURCES)
+    
+    if any(name not in BATCH_RESOURCES for name in names):
+        return web.json_response({'error': 'Unknown resource'}, status=400)
+    
+    return web.json_response(await resolve_batch(request['user_id'], {name: {} for name in names}))
+
+async def batch(request):
+    """Произвольный набор ресурсов с параметрами: {"leaderboard": {"window": "week"}, "inventory": {}}"""
+    data = await request.json()
+    
+    if not isinstance(data, dict) or any(
+        name not in BATCH_RESOURCES or not isinstance(params, dict) for name, params in data.items()
+    ):
+        return web.json_response({'error': 'Unknown resource'}, status=400)
+    
+    return web.json_response(await resolve_batch(request['user_id'], data))
 
 # Setup routes
-def setup_routes(app):
-    """Настройка маршрутов"""
+def setup_routes(app, bot_token=None):
+    """Настройка маршрутов и проверки initData для /api/"""
+    if bot_token:
+        auth.set_bot_token(bot_token)
+    if METRICS_ENABLED:
+        # Первым, чтобы время запроса включало проверку initData
+        app.middlewares.append(request_metrics.middleware)
+        app.router.add_get('/metrics', metrics_handler(metrics, os.getenv('METRICS_TOKEN')))
+    app.middlewares.append(auth.middleware)
+    
+    # Bootstrap & Batch
+    app.router.add_get('/api/bootstrap', bootstrap)
+    app.router.add_post('/api/batch', batch)
+    
     # User
     app.router.add_get('/api/user/data', get_user_data)
     app.router.add_get('/api/user/balance', get_balance)
@@ -293,17 +624,22 @@ def setup_routes(app):
     app.router.add_get('/api/games/rolls/history', get_rolls_history)
     app.router.add_get('/api/games/rolls/bets', get_rolls_bets)
     
+    # WebSocket: раунды Rolls, пул ставок, результаты и изменения баланса
+    app.router.add_get('/api/ws', hub.handle)
+    
     # Mutants
     app.router.add_get('/api/games/mutants/free-case-status', can_open_free_case)
     app.router.add_post('/api/games/mutants/open-case', open_case)
     
     # Inventory
     app.router.add_get('/api/inventory', get_inventory)
+    app.router.add_get('/api/inventory/export', export_inventory)
     app.router.add_post('/api/inventory/sell', sell_inventory_item)
     app.router.add_post('/api/inventory/sell-all', sell_all_items)
     
     # Leaderboard
     app.router.add_get('/api/leaderboard', get_leaderboard)
+    app.router.add_get('/api/leaderboard/me', get_leaderboard_rank)
     
     # Referrals
     app.router.add_get('/api/referral/data', get_referral_data)
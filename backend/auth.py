@@ -0,0 +1,150 @@
+"""
+Проверка initData Telegram WebApp с кэшем проверенных сессий
+"""
+import hashlib
+import hmac
+import json
+import logging
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL = 3600          # сколько помнить проверенную initData, секунд
+CACHE_SIZE = 10000
+MAX_AUTH_AGE = 86400      # initData старше суток не принимается
+
+
+def verify_init_data(init_data, secret_key, max_age=MAX_AUTH_AGE, now=None):
+    """Проверить подпись initData; (user_id, auth_date) или None"""
+    try:
+        fields = dict(parse_qsl(init_data, strict_parsing=True))
+    except ValueError:
+        return None
+
+    received_hash = fields.pop('hash', None)
+    if not received_hash:
+        return None
+
+    data_check_string = '\n'.join(f'{key}={fields[key]}' for key in sorted(fields))
+    expected_hash = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected_hash, received_hash):
+        return None
+
+    try:
+        auth_date = int(fields['auth_date'])
+        user_id = int(json.loads(fields['user'])['id'])
+    except (KeyError, ValueError, TypeError):
+        return None
+
+    now = time.time() if now is None else now
+    if now - auth_date > max_age:
+        return None
+
+    return user_id, auth_date
+
+
+class InitDataAuth:
+    """aiohttp middleware: initData проверяется один раз, дальше пользователь берется из TTL-кэша"""
+
+    def __init__(self, bot_token=None, enabled=True, ttl=CACHE_TTL, max_entries=CACHE_SIZE,
+                 max_age=MAX_AUTH_AGE, prefix='/api/', exempt=()):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.prefix = prefix
+        # Пути, которые проверяют пользователя сами (WebSocket - первым сообщением, см. authenticate_message)
+        self.exempt = set(exempt)
+        self.set_bot_token(bot_token)
+
+        self._cache = OrderedDict()   # initData -> (user_id, действует до)
+
+        self._hits = 0
+        self._misses = 0
+        self._failures = 0
+        self._verify_time = 0.0
+        self._verify_time_max = 0.0
+
+    def set_bot_token(self, bot_token):
+        # Ключ по спецификации WebApp: HMAC-SHA256("WebAppData", токен бота)
+        self.secret_key = hmac.new(b'WebAppData', bot_token.encode(), hashlib.sha256).digest() if bot_token else None
+
+    def authenticate(self, init_data):
+        """user_id по initData или None"""
+        now = time.time()
+        cached = self._cache.get(init_data)
+        if cached is not None:
+            user_id, expires_at = cached
+            if now < expires_at:
+                self._hits += 1
+                return user_id
+            del self._cache[init_data]
+
+        self._misses += 1
+        started = time.perf_counter()
+        verified = verify_init_data(init_data, self.secret_key, self.max_age, now) if self.secret_key else None
+        elapsed = time.perf_counter() - started
+        self._verify_time += elapsed
+        self._verify_time_max = max(self._verify_time_max, elapsed)
+
+        if verified is None:
+            self._failures += 1
+            return None
+
+        user_id, auth_date = verified
+        self._cache[init_data] = (user_id, min(now + self.ttl, auth_date + self.max_age))
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+        return user_id
+
+    def authenticate_message(self, data):
+        """user_id по сообщению {"init_data": ...} (в режиме разработки - {"user_id": ...}) или None
+
+        initData не передается в URL WebSocket: query-строка попадает в логи прокси и access-логи."""
+        if not isinstance(data, dict):
+            return None
+
+        if not self.enabled:
+            try:
+                return int(data.get('user_id', 0))
+            except (TypeError, ValueError):
+                return None
+
+        init_data = data.get('init_data')
+        return self.authenticate(init_data) if isinstance(init_data, str) and init_data else None
+
+    @web.middleware
+    async def middleware(self, request, handler):
+        if not request.path.startswith(self.prefix) or request.path in self.exempt:
+            return await handler(request)
+
+        if not self.enabled:
+            # Режим разработки: пользователь из заголовка без проверки
+            request['user_id'] = int(request.headers.get('X-Telegram-User-Id', 0))
+            return await handler(request)
+
+        init_data = request.headers.get('X-Telegram-Init-Data', '')
+        user_id = self.authenticate(init_data) if init_data else None
+        if user_id is None:
+            return web.json_response({'error': 'Unauthorized'}, status=401)
+
+        request['user_id'] = user_id
+        return await handler(request)
+
+    def stats(self):
+        lookups = self._hits + self._misses
+        return {
+            'enabled': self.enabled,
+            'cached': len(self._cache),
+            'hits': self._hits,
+            'misses': self._misses,
+            'failures': self._failures,
+            'hit_rate': self._hits / lookups if lookups else 0.0,
+            'verify_avg_us': self._verify_time / self._misses * 1e6 if self._misses else 0.0,
+            'verify_max_us': self._verify_time_max * 1e6,
+        }
@@ -0,0 +1,57 @@
+"""
+Микробенчмарк выбора награды кейса: таблица псевдонимов против линейного прохода по накопленным шансам
+Запуск: python backend/bench_cases.py
+"""
+import os
+import random
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.cases import AliasTable, CaseCatalog
+
+DRAWS = 1_000_000
+
+
+def linear_draw(rewards, rng):
+    """Прежний подход: накопленная сумма шансов до попадания"""
+    roll = rng.random() * 100
+    cumulative = 0
+    for reward in rewards:
+        cumulative += reward['chance']
+        if roll < cumulative:
+            return reward
+    return rewards[-1]
+
+
+def bench(label, draw):
+    started = time.perf_counter()
+    for _ in range(DRAWS):
+        draw()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<8} {DRAWS / elapsed:>12,.0f} выборов/с")
+
+
+def main():
+    catalog = CaseCatalog(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cases.json'))
+    # Детерминированный генератор, чтобы сравнивать только стоимость выбора
+    rng = random.Random(42)
+
+    for key in ('REGULAR_1', 'SNOOP_GIFTS'):
+        rewards = catalog.get(key)['rewards']
+        table = AliasTable([reward['chance'] for reward in rewards])
+        print(f"📦 {key} ({len(rewards)} наград, {DRAWS:,} выборов)")
+        bench('alias', lambda: rewards[table.draw(rng)])
+        bench('linear', lambda: linear_draw(rewards, rng))
+
+    # Синтетический кейс с большим числом наград, где разница заметнее
+    weights = [random.random() for _ in range(200)]
+    total = sum(weights)
+    rewards = [{'name': str(i), 'chance': w * 100 / total} for i, w in enumerate(weights)]
+    table = AliasTable([reward['chance'] for reward in rewards])
+    print(f"📦 synthetic ({len(rewards)} наград, {DRAWS:,} выборов)")
+    bench('alias', lambda: rewards[table.draw(rng)])
+    bench('linear', lambda: linear_draw(rewards, rng))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Накладные расходы метрик: middleware на запрос, обертка метода БД и рендер /metrics
+Запуск: python backend/bench_metrics.py [вызовов]
+"""
+import asyncio
+import os
+import sys
+import time
+
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.metrics import MetricsRegistry, RequestMetrics, instrument_database
+
+
+async def handler(request):
+    return web.Response()
+
+
+class FakeDatabase:
+    """Методы без работы - измеряется только обертка"""
+
+    async def get_balance(self, user_id):
+        return user_id
+
+    def get_pool_stats(self):
+        return {'in_use': 0, 'waiting': 0, 'waits_total': 0}
+
+    def get_writer_stats(self):
+        return {'batches_total': 0, 'ops_total': 0, 'failed_ops': 0, 'queued': 0,
+                'commit_time_avg_ms': 0.0, 'commit_time_max_ms': 0.0}
+
+    def get_balance_cache_stats(self):
+        return {'size': 0, 'hit_rate': 0.0}
+
+
+async def per_call(calls, call):
+    """Время одного вызова, наносекунды (лучшее из трех прогонов)"""
+    best = float('inf')
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(calls):
+            await call()
+        best = min(best, (time.perf_counter() - started) / calls * 1e9)
+    return best
+
+
+async def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+    app = web.Application()
+    app.router.add_get('/api/user/{section}', handler)
+    request = make_mocked_request('GET', '/api/user/balance', app=app)
+    request._match_info = await app.router.resolve(request)
+
+    registry = MetricsRegistry()
+    middleware = RequestMetrics(registry).middleware
+
+    print(f"⏱ {calls:,} вызовов")
+    plain = await per_call(calls, lambda: handler(request))
+    measured = await per_call(calls, lambda: middleware(request, handler))
+    print(f"  запрос:     без метрик {plain:>7.0f} нс, с метриками {measured:>7.0f} нс, "
+          f"накладные {measured - plain:>6.0f} нс")
+
+    db = FakeDatabase()
+    plain = await per_call(calls, lambda: db.get_balance(1))
+    instrument_database(db, registry)
+    measured = await per_call(calls, lambda: db.get_balance(1))
+    print(f"  метод БД:   без метрик {plain:>7.0f} нс, с метриками {measured:>7.0f} нс, "
+          f"накладные {measured - plain:>6.0f} нс")
+
+    # Реалистичный объем: 30 маршрутов x 2 метода и 60 методов БД
+    duration = registry.histogram('bench_duration_seconds', 'Нагрузочная гистограмма', ('route', 'method'))
+    for route in range(30):
+        for method in ('GET', 'POST'):
+            duration.labels(f'/api/route{route}', method).observe(0.01)
+    methods = registry.histogram('bench_db_seconds', 'Нагрузочная гистограмма', ('method',))
+    for method in range(60):
+        methods.labels(f'method{method}').observe(0.001)
+
+    started = time.perf_counter()
+    text = registry.render()
+    print(f"  /metrics:   {len(text.splitlines())} строк, рендер {(time.perf_counter() - started) * 1000:.2f} мс")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
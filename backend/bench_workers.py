@@ -0,0 +1,132 @@
+"""
+Пропускная способность API: один процесс против WEB_WORKERS процессов на одном порту
+Запускает backend/bot.py на временной базе (INIT_DATA_AUTH=0) и нагружает его
+из нескольких клиентских процессов.
+Запуск: python backend/bench_workers.py [воркеров] [клиентских процессов] [секунд] [путь]
+"""
+import asyncio
+import multiprocessing
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.db_manager import DatabaseManager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PORT = 8099
+USERS = 1000
+CONNECTIONS = 32   # одновременных запросов на клиентский процесс
+STARTUP_TIMEOUT = 30
+
+
+async def seed(db_path):
+    db = DatabaseManager(db_path)
+    await db.init_database()
+    async with db.pool.connection() as conn:
+        await conn.executemany(
+            'INSERT INTO users (user_id, username, first_name, balance) VALUES (?, ?, ?, 100)',
+            [(user_id, f'user{user_id}', 'User') for user_id in range(1, USERS + 1)]
+        )
+        await conn.commit()
+    await db.close()
+
+
+async def wait_ready(url):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(url, headers={'X-Telegram-User-Id': '1'}) as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError('Server did not start')
+
+
+async def load(url, seconds):
+    """Запросы CONNECTIONS параллельными клиентами в течение seconds; задержки запросов"""
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + seconds
+
+    async def client(session):
+        nonlocal errors
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            headers = {'X-Telegram-User-Id': str(random.randint(1, USERS))}
+            async with session.get(url, headers=headers) as response:
+                await response.read()
+                if response.status != 200:
+                    errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    # Отдельное соединение на клиента: ядро распределяет соединения между воркерами
+    connector = aiohttp.TCPConnector(limit=CONNECTIONS)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*(client(session) for _ in range(CONNECTIONS)))
+    return latencies, errors
+
+
+def client_process(args):
+    return asyncio.run(load(*args))
+
+
+def run(workers, clients, seconds, path):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        asyncio.run(seed(db_path))
+
+        env = dict(
+            os.environ, WEB_WORKERS=str(workers), PORT=str(PORT), INIT_DATA_AUTH='0',
+            DB_PATH=db_path, WEBHOOK_URL=''
+        )
+        server = subprocess.Popen(
+            [sys.executable, 'backend/bot.py'], cwd=ROOT, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        url = f'http://127.0.0.1:{PORT}{path}'
+        try:
+            asyncio.run(wait_ready(url))
+            # Дополнительные воркеры стартуют после основного
+            time.sleep(1 + workers * 0.5)
+
+            started = time.perf_counter()
+            with multiprocessing.Pool(clients) as pool:
+                results = pool.map(client_process, [(url, seconds)] * clients)
+            elapsed = time.perf_counter() - started
+        finally:
+            server.send_signal(signal.SIGINT)
+            server.wait()
+
+    latencies = sorted(latency for result, _ in results for latency in result)
+    errors = sum(errors for _, errors in results)
+    print(
+        f"  воркеров: {workers:<3} {len(latencies) / elapsed:>8.0f} запр/с "
+        f"p50 {latencies[len(latencies) // 2] * 1000:>7.2f} мс "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:>7.2f} мс  ошибок: {errors}"
+    )
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count()
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 10
+    path = sys.argv[4] if len(sys.argv) > 4 else '/api/bootstrap'
+
+    print(f"⏱ GET {path}: {clients} клиентских процессов x {CONNECTIONS} соединений, {seconds:.0f} с, ядер: {os.cpu_count()}")
+    run(1, clients, seconds, path)
+    if workers > 1:
+        run(workers, clients, seconds, path)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,12 +6,17 @@ import os
 import logging
 
 from aiogram import Bot, Dispatcher, types, F
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.filters import Command
 from aiogram.types import WebAppInfo, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 from aiohttp import web
 import asyncio
-from database.db_manager import DatabaseManager
+from backend.api_endpoints import auth, db, hub, presence, rolls, setup_routes
+from backend.cluster import PRIMARY, STARTUP_TIMEOUT, from_env as cluster_from_env, share_state, supervise
+from backend.broadcast import BroadcastRunner
+from backend.notifier import NotificationDispatcher
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -23,11 +28,57 @@ WEBAPP_URL = os.getenv('WEBAPP_URL', 'https://muhammadaminpy.github.io/gifts/fro
 ADMIN_ID = int(os.getenv('ADMIN_ID', '1027715401'))
 WEBHOOK_PATH = f'/bot/{BOT_TOKEN}'
 WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # URL вашего сервера для webhook
+PORT = int(os.getenv('PORT', '8080'))
+WEB_WORKERS = int(os.getenv('WEB_WORKERS', '1'))  # > 1 - несколько процессов на одном порту
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', '')  # другой Bot API сервер (например, backend/stub_bot_api.py)
 
 # Инициализация
-bot = Bot(token=BOT_TOKEN)
+session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)) if TELEGRAM_API_URL else None
+bot = Bot(token=BOT_TOKEN, session=session)
 dp = Dispatcher()
-db = DatabaseManager()
+cluster = cluster_from_env()
+notifier = NotificationDispatcher(
+    db, bot,
+    digest_interval=float(os.getenv('NOTIFY_DIGEST_INTERVAL', '60')),
+    global_rate=float(os.getenv('NOTIFY_RATE', '25'))
+)
+
+async def report_broadcast(broadcast):
+    """Прогресс рассылки в одном сообщении админу (редактируется по ходу)"""
+    state = {
+        'running': '⏳ идет', 'done': '✅ завершена', 'cancelled': '⛔️ остановлена', 'failed': '❗️ прервана ошибкой'
+    }[broadcast.status]
+    text = (
+        f"📣 Рассылка #{broadcast.id}: {state}\n\n"
+        f"Обработано: {broadcast.processed} из ~{broadcast.total}\n"
+        f"✅ Доставлено: {broadcast.sent}\n"
+        f"🚫 Заблокировали бота: {broadcast.blocked}\n"
+        f"❌ Ошибок: {broadcast.failed}\n"
+        f"⚡️ Скорость: {broadcast.rate():.1f} сообщ/с"
+    )
+    if broadcast.error:
+        text += f"\n\n❗️ {broadcast.error}\nОтправлено пользователям до ID {broadcast.last_user_id}"
+    
+    message_id, shown = broadcast_messages.get(broadcast.id, (None, None))
+    if message_id is None:
+        message = await bot.send_message(ADMIN_ID, text)
+        broadcast_messages[broadcast.id] = (message.message_id, text)
+    elif shown != text:
+        await bot.edit_message_text(text, chat_id=ADMIN_ID, message_id=message_id)
+        broadcast_messages[broadcast.id] = (message_id, text)
+
+# Рассылки делят с уведомлениями общий лимит сообщений бота
+broadcast_messages = {}   # id рассылки -> (id сообщения с прогрессом, его текст)
+broadcasts = BroadcastRunner(db, bot, notifier.limiter, on_progress=report_broadcast)
+
+@dp.update.outer_middleware()
+async def track_presence(handler, event, data):
+    """Учет онлайна по любым взаимодействиям с ботом"""
+    user = data.get('event_from_user')
+    if user:
+        presence.touch(user.id)
+        await db.update_last_activity(user.id)
+    return await handler(event, data)
 
 # Клавиатура с Web App
 def get_main_keyboard():
@@ -51,20 +102,13 @@ async def cmd_start(message: types.Message):
             ref_id = int(ref_code.replace('ref_', ''))
     
     # Регистрация пользователя
-    await db.register_user(user_id, username, first_name, ref_id)
+    inserted = await db.register_user(user_id, username, first_name, ref_id)
     
-    # Уведомление админа о новом пользователе
-    if user_id != ADMIN_ID:
-        try:
-            await bot.send_message(
-                ADMIN_ID,
-                f"🆕 Новый пользователь!\n"
-                f"ID: {user_id}\n"
-                f"Username: @{username}\n"
-                f"Name: {first_name}"
-            )
-        except Exception as e:
-            logger.error(f"Failed to notify admin: {e}")
+    # Уведомление админа о новом пользователе (отправляется в фоне, всплески - сводкой)
+    if inserted and user_id != ADMIN_ID:
+        await notifier.notify(ADMIN_ID, 'new_user', {
+            'user_id': user_id, 'username': username, 'first_name': first_name
+        })
     
     await message.answer(
         f"👋 Добро пожаловать, {first_name}!\n\n"
@@ -84,18 +128,48 @@ async def cmd_admin(message: types.Message):
         return
     
     stats = await db.get_admin_stats()
+    online = presence.stats()
+    pool = db.get_pool_stats()
+    balances = db.get_balance_cache_stats()
+    writer = db.get_writer_stats()
+    sessions = auth.stats()
+    notifications = notifier.stats()
+    
+    methods = ', '.join(f"{method} {total:.2f}" for method, total in sorted(stats['deposits_by_method'].items()))
+    pending = stats['withdrawals'].get('pending', {'count': 0, 'total': 0})
+    approved = stats['withdrawals'].get('approved', {'count': 0, 'total': 0})
     
     text = (
         f"📊 Админ панель\n\n"
         f"👥 Всего пользователей: {stats['total_users']}\n"
-        f"🟢 Онлайн сейчас: {stats['online_now']}\n"
+        f"🟢 Онлайн сейчас: {online['online_now']}\n"
+        f"📅 DAU: {online['dau']} (вчера {online['dau_yesterday']})\n"
+        f"🔝 Пик онлайна: {online['peak_today']} сегодня, {online['peak_all_time']} за все время\n"
         f"📈 Новых за 24ч: {stats['new_24h']}\n"
-        f"💰 Всего пополнено: {stats['total_deposits']:.2f} TON\n\n"
+        f"💰 Всего пополнено: {stats['total_deposits']:.2f} TON ({stats['deposits_count']} шт.)\n"
+        f"   По методам: {methods or '-'}\n"
+        f"⏳ Выводы в ожидании: {pending['count']} на {pending['total']:.2f} TON\n"
+        f"✅ Выведено: {approved['count']} на {approved['total']:.2f} TON\n"
+        f"🗄 Пул БД: {pool['in_use']}/{pool['size']} занято, пик {pool['peak_in_use']}, "
+        f"ожиданий {pool['waits_total']} (макс {pool['wait_time_max_ms']:.1f} мс)\n"
+        f"✍️ Запись: {writer['ops_total']} операций в {writer['batches_total']} commit "
+        f"(в среднем {writer['avg_batch']:.1f}, в очереди {writer['queued']})\n"
+        f"📨 Уведомления: отправлено {notifications['sent_total']}, сводок {notifications['digests_total']} "
+        f"({notifications['collapsed_total']} событий), повторов {notifications['retries_total']}, "
+        f"отброшено {notifications['dropped_total']}\n"
+        f"💾 Кэш балансов: {balances['size']}/{balances['capacity']}, попаданий {balances['hit_rate']:.0%}, "
+        f"вытеснений {balances['evictions']}\n"
+        f"🔑 initData: попаданий {sessions['hit_rate']:.0%}, проверка {sessions['verify_avg_us']:.0f} мкс, "
+        f"отказов {sessions['failures']}\n\n"
         f"Используйте команды:\n"
         f"/addbalance [user_id] [amount] - добавить баланс\n"
         f"/removebalance [user_id] [amount] - убрать баланс\n"
         f"/setreferral [user_id] [percent] - установить реф %\n"
-        f"/userinfo [user_id] - информация о пользователе"
+        f"/userinfo [user_id] - информация о пользователе\n"
+        f"/reconcilestats - пересчитать счетчики статистики\n"
+        f"/withdrawals [min=] [max=] [user=] - выводы в ожидании\n"
+        f"/approveall, /rejectall [min=] [max=] [user=] [limit=] - обработать выводы пачкой\n"
+        f"/broadcast [текст] - рассылка всем пользователям, /stopbroadcast - остановить"
     )
     
     await message.answer(text)
@@ -111,8 +185,12 @@ async def cmd_add_balance(message: types.Message):
         user_id = int(parts[1])
         amount = float(parts[2])
         
-        await db.add_balance(user_id, amount)
-        await message.answer(f"✅ Добавлено {amount} TON пользователю {user_id}")
+        balance = await db.add_balance(user_id, amount)
+        if balance is None:
+            await message.answer("❌ Пользователь не найден")
+            return
+        
+        await message.answer(f"✅ Добавлено {amount} TON пользователю {user_id}\nБаланс: {balance:.2f} TON")
         
         # Уведомление пользователя
         try:
@@ -136,11 +214,60 @@ async def cmd_remove_balance(message: types.Message):
         user_id = int(parts[1])
         amount = float(parts[2])
         
-        await db.remove_balance(user_id, amount)
-        await message.answer(f"✅ Убрано {amount} TON у пользователя {user_id}")
+        balance = await db.remove_balance(user_id, amount)
+        if balance is None:
+            await message.answer("❌ Пользователь не найден")
+            return
+        
+        await message.answer(f"✅ Убрано {amount} TON у пользователя {user_id}\nБаланс: {balance:.2f} TON")
     except Exception as e:
         await message.answer(f"❌ Ошибка: {e}")
 
+@dp.message(Command("reconcilestats"))
+async def cmd_reconcile_stats(message: types.Message):
+    """Пересчет счетчиков статистики из исходных таблиц"""
+    if message.from_user.id != ADMIN_ID:
+        return
+    
+    try:
+        drift = await db.reconcile_stats_counters()
+        if not drift:
+            await message.answer("✅ Счетчики совпадают с данными")
+            return
+        
+        lines = [f"{name}: {old:g} → {new:g}" for name, (old, new) in drift.items()]
+        await message.answer("⚠️ Исправлены расхождения:\n" + "\n".join(lines))
+    except Exception as e:
+        await message.answer(f"❌ Ошибка: {e}")
+
+@dp.message(Command("broadcast"))
+async def cmd_broadcast(message: types.Message):
+    """Рассылка всем пользователям: /broadcast [текст]"""
+    if message.from_user.id != ADMIN_ID:
+        return
+    
+    text = message.text.partition(' ')[2].strip()
+    if not text:
+        await message.answer("❌ Использование: /broadcast [текст]")
+        return
+    
+    try:
+        broadcast = await broadcasts.start(text)
+    except RuntimeError as e:
+        await message.answer(f"❌ {e}")
+        return
+    
+    await report_broadcast(broadcast)
+
+@dp.message(Command("stopbroadcast"))
+async def cmd_stop_broadcast(message: types.Message):
+    """Остановка текущей рассылки"""
+    if message.from_user.id != ADMIN_ID:
+        return
+    
+    if await broadcasts.cancel() is None:
+        await message.answer("❌ Рассылка не идет")
+
 @dp.message(Command("userinfo"))
 async def cmd_user_info(message: types.Message):
     """Информация о пользователе"""
@@ -155,7 +282,6 @@ async def cmd_user_info(message: types.Message):
             await message.answer("❌ Пользователь не найден")
             return
         
-        referrals = await db.get_user_referrals(user_id)
         
         text = (
             f"📋 Информация о пользователе\n\n"
@@ -165,7 +291,7 @@ async def cmd_user_info(message: types.Message):
             f"💎 Реф. баланс: {info['ref_balance']:.2f} TON\n"
             f"📊 Всего пополнено: {info['total_deposits']:.2f} TON\n"
             f"🎮 Игр сыграно: {info['games_played']}\n"
-            f"👥 Рефералов: {len(referrals)}\n"
+            f"👥 Рефералов: {info['referrals_count']} (заработано {info['ref_earned']:.2f} TON)\n"
             f"📈 Реф. процент: {info['ref_percent']}%\n"
             f"📅 Регистрация: {info['created_at']}"
         )
@@ -190,13 +316,9 @@ async def webhook_handler(request):
             user_info = await db.get_user_info(user_id)
             username = user_info['username'] if user_info else 'Unknown'
             
-            await bot.send_message(
-                ADMIN_ID,
-                f"💰 Новое пополнение!\n\n"
-                f"👤 Пользователь: @{username} (ID: {user_id})\n"
-                f"💵 Сумма: {amount} TON\n"
-                f"💳 Метод: {method}"
-            )
+            await notifier.notify(ADMIN_ID, 'deposit', {
+                'user_id': user_id, 'username': username, 'amount': amount, 'method': method
+            })
         
         elif action == 'withdrawal_request':
             # Запрос на вывод
@@ -208,28 +330,31 @@ async def webhook_handler(request):
             user_info = await db.get_user_info(user_id)
             username = user_info['username'] if user_info else 'Unknown'
             
-            keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                [
-                    InlineKeyboardButton(text="✅ Одобрить", callback_data=f"approve_{request_id}"),
-                    InlineKeyboardButton(text="❌ Отклонить", callback_data=f"reject_{request_id}")
-                ]
-            ])
-            
-            await bot.send_message(
-                ADMIN_ID,
-                f"💸 Новый запрос на вывод!\n\n"
-                f"👤 Пользователь: @{username} (ID: {user_id})\n"
-                f"💵 Сумма: {amount} TON\n"
-                f"👛 Кошелек: {wallet}\n"
-                f"🆔 ID запроса: {request_id}",
-                reply_markup=keyboard
-            )
+            # Каждый запрос - отдельным сообщением с кнопками
+            await notifier.notify(ADMIN_ID, 'withdrawal_request', {
+                'user_id': user_id, 'username': username, 'amount': amount, 'wallet': wallet,
+                'request_id': request_id
+            })
         
         return web.json_response({'status': 'ok'})
     except Exception as e:
         logger.error(f"Webhook error: {e}")
         return web.json_response({'status': 'error', 'message': str(e)}, status=500)
 
+def withdrawal_notice(withdrawal, status):
+    """Уведомление пользователю о решении по выводу (отправляется через outbox)"""
+    if status == 'approved':
+        text = (
+            f"✅ Ваш запрос на вывод {withdrawal['amount']} TON одобрен!\n"
+            f"Средства будут отправлены на кошелек в течение 24 часов."
+        )
+    else:
+        text = (
+            f"❌ Ваш запрос на вывод {withdrawal['amount']} TON отклонен.\n"
+            f"Средства возвращены на ваш баланс."
+        )
+    return withdrawal['user_id'], 'message', {'text': text}
+
 @dp.callback_query(F.data.startswith('approve_'))
 async def approve_withdrawal(callback: types.CallbackQuery):
     """Одобрение вывода средств"""
@@ -249,14 +374,7 @@ async def approve_withdrawal(callback: types.CallbackQuery):
         )
         
         # Уведомление пользователя
-        try:
-            await bot.send_message(
-                withdrawal['user_id'],
-                f"✅ Ваш запрос на вывод {withdrawal['amount']} TON одобрен!\n"
-                f"Средства будут отправлены на кошелек в течение 24 часов."
-            )
-        except:
-            pass
+        await notifier.notify(*withdrawal_notice(withdrawal, 'approved'))
     else:
         await callback.answer("❌ Ошибка при одобрении")
 
@@ -279,47 +397,202 @@ async def reject_withdrawal(callback: types.CallbackQuery):
         )
         
         # Уведомление пользователя
-        try:
-            await bot.send_message(
-                withdrawal['user_id'],
-                f"❌ Ваш запрос на вывод {withdrawal['amount']} TON отклонен.\n"
-                f"Средства возвращены на ваш баланс."
-            )
-        except:
-            pass
+        await notifier.notify(*withdrawal_notice(withdrawal, 'rejected'))
     else:
         await callback.answer("❌ Ошибка при отклонении")
 
+# Очередь выводов: страницы и массовая обработка
+WITHDRAWALS_PAGE_SIZE = 10
+WITHDRAWAL_VIEWS_MAX = 100
+WITHDRAWAL_FILTERS = {'min': ('min_amount', float), 'max': ('max_amount', float), 'user': ('user_id', int),
+                      'limit': ('limit', int)}
+withdrawal_views = {}   # номер просмотра -> фильтры и заявки показанной страницы (для кнопок)
+next_withdrawal_view = 0
+
+def parse_withdrawal_filters(text):
+    """Фильтры из текста команды: min=1 max=50 user=123 limit=100"""
+    filters = {}
+    for part in text.split()[1:]:
+        name, _, value = part.partition('=')
+        if name not in WITHDRAWAL_FILTERS:
+            raise ValueError(f"неизвестный фильтр {part}")
+        key, convert = WITHDRAWAL_FILTERS[name]
+        filters[key] = convert(value)
+    return filters
+
+async def withdrawals_page(filters, after=None):
+    """Текст и кнопки страницы ожидающих выводов"""
+    global next_withdrawal_view
+    
+    query = {key: value for key, value in filters.items() if key != 'limit'}
+    page = await db.get_pending_withdrawals(WITHDRAWALS_PAGE_SIZE, after, **query)
+    if not page['items']:
+        return "✅ Ожидающих выводов нет", None
+    
+    next_withdrawal_view += 1
+    view = next_withdrawal_view
+    withdrawal_views[view] = {'filters': filters, 'ids': [item['id'] for item in page['items']], 'next': page['next']}
+    while len(withdrawal_views) > WITHDRAWAL_VIEWS_MAX:
+        del withdrawal_views[next(iter(withdrawal_views))]
+    
+    lines = [
+        f"{item['created_at']} | {item['user_id']} | {item['amount']:.2f} TON | {item['wallet']} | {item['id']}"
+        for item in page['items']
+    ]
+    buttons = [[
+        InlineKeyboardButton(text="✅ Одобрить страницу", callback_data=f"wd:approved:{view}"),
+        InlineKeyboardButton(text="❌ Отклонить страницу", callback_data=f"wd:rejected:{view}")
+    ]]
+    if page['next']:
+        buttons.append([InlineKeyboardButton(text="▶️ Далее", callback_data=f"wd:next:{view}")])
+    
+    return "⏳ Выводы в ожидании (старые первыми):\n\n" + "\n".join(lines), InlineKeyboardMarkup(inline_keyboard=buttons)
+
+async def process_withdrawals(status, **filters):
+    """Массовая обработка одной транзакцией, уведомления пользователям - через outbox; текст итога"""
+    processed = await db.process_withdrawals(status, **filters)
+    await notifier.notify_many([withdrawal_notice(withdrawal, status) for withdrawal in processed])
+    
+    total = sum(withdrawal['amount'] for withdrawal in processed)
+    title = "✅ Одобрено" if status == 'approved' else "❌ Отклонено"
+    return f"{title}: {len(processed)} на {total:.2f} TON"
+
+@dp.message(Command("withdrawals"))
+async def cmd_withdrawals(message: types.Message):
+    """Страница ожидающих выводов: /withdrawals [min=] [max=] [user=]"""
+    if message.from_user.id != ADMIN_ID:
+        return
+    
+    try:
+        text, keyboard = await withdrawals_page(parse_withdrawal_filters(message.text))
+        await message.answer(text, reply_markup=keyboard)
+    except Exception as e:
+        await message.answer(f"❌ Ошибка: {e}")
+
+@dp.message(Command("approveall", "rejectall"))
+async def cmd_process_withdrawals(message: types.Message):
+    """Массовое одобрение/отклонение: /approveall min=1 max=50 user=123 limit=100"""
+    if message.from_user.id != ADMIN_ID:
+        return
+    
+    try:
+        filters = parse_withdrawal_filters(message.text)
+        if not filters:
+            await message.answer("❌ Укажите фильтр: min=, max=, user=, limit=")
+            return
+        
+        status = 'approved' if message.text.startswith('/approveall') else 'rejected'
+        await message.answer(await process_withdrawals(status, **filters))
+    except Exception as e:
+        await message.answer(f"❌ Ошибка: {e}")
+
+@dp.callback_query(F.data.startswith('wd:'))
+async def withdrawals_page_action(callback: types.CallbackQuery):
+    """Кнопки страницы выводов: следующая страница или обработка показанных заявок"""
+    if callback.from_user.id != ADMIN_ID:
+        return
+    
+    _, action, view = callback.data.split(':')
+    page = withdrawal_views.pop(int(view), None)
+    if page is None:
+        await callback.answer("⌛ Страница устарела, откройте /withdrawals заново")
+        return
+    
+    if action == 'next':
+        text, keyboard = await withdrawals_page(page['filters'], page['next'])
+        await callback.answer()
+        await callback.message.edit_text(text, reply_markup=keyboard)
+        return
+    
+    result = await process_withdrawals(action, request_ids=page['ids'])
+    await callback.answer(result)
+    await callback.message.edit_text(callback.message.text + f"\n\n{result}", reply_markup=None)
+
+async def forward_update(request):
+    """Обновление Telegram, пришедшее в другой воркер: обрабатывает основной"""
+    cluster.send(PRIMARY, 'bot_update', await request.json())
+    return web.Response()
+
 async def on_startup(app):
     """Действия при запуске"""
+    if cluster and not cluster.is_primary:
+        await start_replica()
+        return
+    
     await db.init_database()
+    db.start()
+    presence.load(await db.get_activity_since(presence.seed_since()))
+    await db.load_leaderboard()
+    await rolls.start()
+    notifier.start()
+    await broadcasts.resume()
     if WEBHOOK_URL:
         await bot.set_webhook(WEBHOOK_URL + WEBHOOK_PATH)
         logger.info(f"Webhook set to {WEBHOOK_URL + WEBHOOK_PATH}")
+    
+    if cluster:
+        await cluster.connect()
+        share_state(cluster, db, hub, presence, rolls)
+        cluster.on('bot_update', lambda update: dp.feed_raw_update(bot, update))
+        cluster.on('ready', lambda data: True)
+
+async def start_replica():
+    """Запуск дополнительного воркера: после основного (миграции, раунды Rolls)"""
+    await cluster.connect()
+    # Нет ответа - запуск воркера прерывается, супервизор перезапустит его
+    await cluster.request('ready', timeout=STARTUP_TIMEOUT)
+    
+    db.start()
+    presence.load(await db.get_activity_since(presence.seed_since()))
+    await db.load_leaderboard()
+    share_state(cluster, db, hub, presence, rolls)
+    rolls.restore(await cluster.request('rolls_snapshot'))
+    logger.info(f"Worker {cluster.worker_id} ready")
 
 async def on_shutdown(app):
     """Действия при остановке"""
-    await bot.delete_webhook()
+    primary = cluster is None or cluster.is_primary
+    if primary:
+        if WEBHOOK_URL:
+            await bot.delete_webhook()
+        await rolls.stop()
+        await broadcasts.stop()
+        await notifier.stop()
     await bot.session.close()
+    await hub.close()
+    await db.close()
+    if cluster:
+        await cluster.close()
 
 def main():
     """Запуск бота"""
+    if WEB_WORKERS > 1 and cluster is None:
+        # Супервизор: WEB_WORKERS копий этого процесса на одном порту
+        asyncio.run(supervise(WEB_WORKERS))
+        return
+    
     # Создание веб-приложения
     app = web.Application()
     
     # Добавление webhook обработчика
     app.router.add_post('/webhook/notify', webhook_handler)
     
-    # Настройка бота
-    webhook_handler_obj = SimpleRequestHandler(dispatcher=dp, bot=bot)
-    webhook_handler_obj.register(app, path=WEBHOOK_PATH)
+    # API для фронтенда (общий DatabaseManager и пул соединений с ботом)
+    setup_routes(app, bot_token=BOT_TOKEN)
+    
+    # Настройка бота (обновления обрабатывает только основной воркер)
+    if cluster and not cluster.is_primary:
+        app.router.add_post(WEBHOOK_PATH, forward_update)
+    else:
+        webhook_handler_obj = SimpleRequestHandler(dispatcher=dp, bot=bot)
+        webhook_handler_obj.register(app, path=WEBHOOK_PATH)
     
     # События
     app.on_startup.append(on_startup)
     app.on_shutdown.append(on_shutdown)
     
     # Запуск сервера
-    web.run_app(app, host='0.0.0.0', port=8080)
+    web.run_app(app, host='0.0.0.0', port=PORT, reuse_port=cluster is not None)
 
 if __name__ == '__main__':
     main()
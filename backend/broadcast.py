@@ -0,0 +1,198 @@
+"""
+Рассылка сообщения всем пользователям
+user_id читаются из БД пачками по ключу (в памяти - одна пачка), сообщения отправляет
+пул воркеров под общим с уведомлениями лимитом бота. Каждому пользователю уходит одно
+сообщение, поэтому лимит на чат соблюдается сам собой. После каждой пачки прогресс
+сохраняется в broadcasts: после перезапуска рассылка продолжается с последней сохраненной
+пачки (ее сообщения могут уйти повторно).
+"""
+import asyncio
+import logging
+import time
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+
+logger = logging.getLogger(__name__)
+
+WORKERS = 16
+BATCH_SIZE = 500
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 1.0
+PROGRESS_INTERVAL = 5.0
+
+
+class Broadcast:
+    """Состояние одной рассылки"""
+
+    def __init__(self, broadcast_id, text, last_user_id=0, sent=0, failed=0, blocked=0, total=0):
+        self.id = broadcast_id
+        self.text = text
+        self.last_user_id = last_user_id
+        self.sent = sent
+        self.failed = failed
+        self.blocked = blocked
+        self.total = total
+        self.status = 'running'
+        self.error = None
+
+        self._started = time.monotonic()
+        self._processed_at_start = self.processed
+
+    @property
+    def processed(self):
+        return self.sent + self.failed + self.blocked
+
+    def rate(self):
+        """Сообщений в секунду с начала (или продолжения) рассылки"""
+        elapsed = time.monotonic() - self._started
+        return (self.processed - self._processed_at_start) / elapsed if elapsed > 0 else 0.0
+
+
+class BroadcastRunner:
+    """Выполняет рассылки по одной; on_progress(broadcast) вызывается периодически и в конце"""
+
+    def __init__(self, db, bot, limiter, workers=WORKERS, batch_size=BATCH_SIZE,
+                 progress_interval=PROGRESS_INTERVAL, on_progress=None):
+        self.db = db
+        self.bot = bot
+        self.limiter = limiter
+        self.workers = workers
+        self.batch_size = batch_size
+        self.progress_interval = progress_interval
+        self.on_progress = on_progress
+
+        self.current = None
+        self._task = None
+
+    async def start(self, text):
+        """Начать рассылку; RuntimeError, если уже идет другая"""
+        if self.current is not None:
+            raise RuntimeError(f"Рассылка #{self.current.id} еще идет")
+
+        broadcast_id = await self.db.create_broadcast(text)
+        return await self._launch(Broadcast(broadcast_id, text))
+
+    async def resume(self):
+        """Продолжить рассылку, прерванную перезапуском"""
+        running = await self.db.get_running_broadcasts()
+        if not running or self.current is not None:
+            return None
+
+        broadcast = Broadcast(**{('broadcast_id' if key == 'id' else key): value for key, value in running[0].items()})
+        logger.info(f"Resuming broadcast {broadcast.id} after user {broadcast.last_user_id}")
+        return await self._launch(broadcast)
+
+    async def _launch(self, broadcast):
+        broadcast.total = (await self.db.get_admin_stats())['total_users']
+        self.current = broadcast
+        self._task = asyncio.create_task(self._run(broadcast))
+        return broadcast
+
+    async def cancel(self):
+        """Прекратить текущую рассылку (без продолжения после перезапуска)"""
+        broadcast = self.current
+        if broadcast is None:
+            return None
+
+        await self.stop()
+        broadcast.status = 'cancelled'
+        await self._checkpoint(broadcast)
+        await self._report(broadcast)
+        return broadcast
+
+    async def stop(self):
+        """Остановить отправку при завершении процесса; рассылка продолжится после запуска"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.current = None
+
+    async def _run(self, broadcast):
+        queue = asyncio.Queue(maxsize=self.workers * 2)
+
+        async def worker():
+            while True:
+                user_id = await queue.get()
+                try:
+                    await self._send(broadcast, user_id)
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.workers)]
+        reporter = asyncio.create_task(self._report_periodically(broadcast))
+        try:
+            async for user_ids in self.db.iter_user_ids(broadcast.last_user_id, self.batch_size):
+                for user_id in user_ids:
+                    await queue.put(user_id)
+                await queue.join()
+
+                broadcast.last_user_id = user_ids[-1]
+                await self._checkpoint(broadcast)
+
+            broadcast.status = 'done'
+            await self._checkpoint(broadcast)
+            self.current = None
+            self._task = None
+        except Exception as e:
+            # Рассылка прекращается; в БД остаются статус и пройденная позиция
+            logger.error(f"Broadcast {broadcast.id} failed: {e}")
+            broadcast.status = 'failed'
+            broadcast.error = str(e)
+            self.current = None
+            self._task = None
+            try:
+                await self._checkpoint(broadcast)
+            except Exception as e:
+                logger.error(f"Broadcast {broadcast.id} failure checkpoint failed: {e}")
+        finally:
+            for task in workers + [reporter]:
+                task.cancel()
+
+        await self._report(broadcast)
+
+    async def _send(self, broadcast, user_id):
+        attempts = 0
+        while True:
+            await self.limiter.acquire()
+            try:
+                await self.bot.send_message(user_id, broadcast.text)
+                broadcast.sent += 1
+                return
+            except TelegramRetryAfter as e:
+                # Лимит Telegram - пауза для всех отправок бота, попытка не засчитывается
+                self.limiter.pause(e.retry_after)
+            except TelegramForbiddenError:
+                broadcast.blocked += 1
+                return
+            except TelegramBadRequest:
+                broadcast.failed += 1
+                return
+            except Exception as e:
+                attempts += 1
+                if attempts >= MAX_ATTEMPTS:
+                    logger.error(f"Broadcast {broadcast.id} to {user_id} failed: {e}")
+                    broadcast.failed += 1
+                    return
+                await asyncio.sleep(BACKOFF_BASE * 2 ** (attempts - 1))
+
+    async def _checkpoint(self, broadcast):
+        await self.db.checkpoint_broadcast(
+            broadcast.id, broadcast.last_user_id, broadcast.sent, broadcast.failed, broadcast.blocked, broadcast.status
+        )
+
+    async def _report_periodically(self, broadcast):
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            await self._report(broadcast)
+
+    async def _report(self, broadcast):
+        if self.on_progress is None:
+            return
+        try:
+            await self.on_progress(broadcast)
+        except Exception as e:
+            logger.error(f"Broadcast progress report failed: {e}")
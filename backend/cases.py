@@ -0,0 +1,168 @@
+"""
+Каталог кейсов Mutants с таблицами псевдонимов (Walker/Vose) для выбора награды за O(1)
+"""
+import json
+import logging
+import os
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+CHANCE_TOTAL = 100
+CHANCE_TOLERANCE = 1e-6
+# Допустимая доля цены, возвращаемая игроку в среднем (RTP = ожидаемый выигрыш / цена)
+MIN_RTP = 0.3
+MAX_RTP = 0.95
+RELOAD_CHECK_INTERVAL = 1.0   # как часто проверять изменение файла каталога, секунд
+
+_system_random = random.SystemRandom()
+
+
+class AliasTable:
+    """Таблица псевдонимов Vose: построение O(n), выбор O(1)"""
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = sum(weights)
+        scaled = [weight * n / total for weight in weights]
+
+        self.n = n
+        self.prob = [0.0] * n
+        self.alias = list(range(n))
+
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] = scaled[more] + scaled[less] - 1
+            (small if scaled[more] < 1 else large).append(more)
+
+        # Остатки из-за погрешности округления
+        for i in large + small:
+            self.prob[i] = 1.0
+
+    def draw(self, rng=_system_random):
+        """Индекс награды: одно случайное число дает и столбец, и порог"""
+        u = rng.random() * self.n
+        column = int(u)
+        return column if u - column < self.prob[column] else self.alias[column]
+
+
+def expected_value(case):
+    """Средний выигрыш за одно открытие"""
+    return sum(reward['value'] * reward['chance'] for reward in case['rewards']) / CHANCE_TOTAL
+
+
+def validate_case(key, case, min_rtp=MIN_RTP, max_rtp=MAX_RTP):
+    """Проверка кейса из каталога; ValueError с описанием проблемы"""
+    rewards = case.get('rewards') or []
+    if not rewards:
+        raise ValueError(f"Case {key}: no rewards")
+
+    if case.get('price', 0) < 0:
+        raise ValueError(f"Case {key}: negative price")
+
+    for reward in rewards:
+        if reward.get('chance', -1) < 0:
+            raise ValueError(f"Case {key}: reward '{reward.get('name')}' has negative chance {reward.get('chance')}")
+        if reward.get('value', -1) < 0:
+            raise ValueError(f"Case {key}: reward '{reward.get('name')}' has negative value")
+
+    total = sum(reward['chance'] for reward in rewards)
+    if abs(total - CHANCE_TOTAL) > CHANCE_TOLERANCE:
+        raise ValueError(f"Case {key}: chances sum to {total}, expected {CHANCE_TOTAL}")
+
+    # Платный кейс не должен отдавать в среднем больше, чем стоит; бесплатный - только с перезарядкой
+    price = case.get('price', 0)
+    ev = expected_value(case)
+    if price == 0:
+        if not case.get('cooldown'):
+            raise ValueError(f"Case {key}: free case without cooldown")
+    elif not min_rtp <= ev / price <= max_rtp or ev >= price:
+        raise ValueError(
+            f"Case {key}: expected value {ev:.4f} for price {price} (RTP {ev / price:.1%}), "
+            f"allowed RTP {min_rtp:.0%}-{max_rtp:.0%}"
+        )
+
+
+class CaseCatalog:
+    """Кейсы из JSON-файла; таблицы строятся один раз при загрузке и перестраиваются при изменении файла"""
+
+    def __init__(self, path, min_rtp=MIN_RTP, max_rtp=MAX_RTP):
+        self.path = path
+        self.min_rtp = min_rtp
+        self.max_rtp = max_rtp
+        self._cases = {}
+        self._tables = {}
+        self._mtime = None
+        self._checked_at = 0.0
+        self.load()
+
+    def load(self):
+        """Загрузить и проверить каталог; при ошибке остается прежний"""
+        mtime = os.path.getmtime(self.path)
+        with open(self.path, encoding='utf-8') as f:
+            cases = json.load(f)
+
+        for key, case in cases.items():
+            validate_case(key, case, self.min_rtp, self.max_rtp)
+
+        self._tables = {
+            key: AliasTable([reward['chance'] for reward in case['rewards']])
+            for key, case in cases.items()
+        }
+        self._cases = cases
+        self._mtime = mtime
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < RELOAD_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError as e:
+            logger.error(f"Case catalog is unavailable, keeping previous version: {e}")
+            return
+
+        if mtime == self._mtime:
+            return
+
+        try:
+            self.load()
+            logger.info(f"Case catalog reloaded from {self.path}")
+        except Exception as e:
+            # Ошибочная версия файла не перечитывается до следующего изменения
+            self._mtime = mtime
+            logger.error(f"Case catalog reload failed, keeping previous version: {e}")
+
+    def get(self, key):
+        """Описание кейса или None"""
+        self._maybe_reload()
+        return self._cases.get(key)
+
+    def draw(self, key, rng=_system_random):
+        """Случайная награда кейса"""
+        self._maybe_reload()
+        case = self._cases[key]
+        return case['rewards'][self._tables[key].draw(rng)]
+
+    def draw_many(self, key, count, rng=_system_random):
+        """count наград кейса за один проход"""
+        self._maybe_reload()
+        rewards = self._cases[key]['rewards']
+        table = self._tables[key]
+        n, prob, alias, random_ = table.n, table.prob, table.alias, rng.random
+
+        drawn = []
+        for _ in range(count):
+            u = random_() * n
+            column = int(u)
+            drawn.append(rewards[column if u - column < prob[column] else alias[column]])
+        return drawn
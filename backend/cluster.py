@@ -0,0 +1,318 @@
+"""
+Несколько процессов aiohttp на одном порту (SO_REUSEPORT) и канал между ними
+
+Супервизор запускает WEB_WORKERS процессов backend/bot.py и пересылает сообщения
+между ними через Unix-сокет (JSON по строке на сообщение). Воркер 0 - основной:
+обрабатывает обновления Telegram и ведет раунды Rolls; остальные пересылают ему
+обновления бота и ставки. Изменения состояния в памяти (кэш балансов, лидерборд,
+последние игры, онлайн, события WebSocket, раунд Rolls) повторяются во всех воркерах.
+"""
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+import tempfile
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = 0
+MESSAGE_LIMIT = 16 * 1024 * 1024
+RESTART_DELAY = 1.0
+REQUEST_TIMEOUT = 5.0      # ответ на запрос к другому воркеру, секунд
+STARTUP_TIMEOUT = 50.0     # ожидание основного воркера при запуске (миграции), меньше PENDING_TTL
+PENDING_LIMIT = 10000      # сообщений для перезапускающегося воркера (старые отбрасываются)
+PENDING_TTL = 60.0         # сообщения старше этого при подключении воркера не доставляются
+
+
+class Router:
+    """Маршрутизатор сообщений в супервизоре: адресные - одному воркеру, остальные - всем"""
+
+    def __init__(self, path):
+        self.path = path
+        self._writers = {}   # worker_id -> StreamWriter
+        self._pending = {}   # worker_id -> (время, сообщение) до его подключения
+        self._server = None
+        self._routed = 0
+        self._dropped = 0
+
+    async def start(self):
+        self._server = await asyncio.start_unix_server(self._serve, self.path, limit=MESSAGE_LIMIT)
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for writer in self._writers.values():
+            writer.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _serve(self, reader, writer):
+        hello = json.loads(await reader.readline())
+        worker_id = hello['worker']
+        self._writers[worker_id] = writer
+        now = time.monotonic()
+        for queued_at, line in self._pending.pop(worker_id, ()):
+            if now - queued_at <= PENDING_TTL:
+                writer.write(line)
+            else:
+                self._dropped += 1
+
+        try:
+            while line := await reader.readline():
+                self._route(worker_id, line)
+        finally:
+            if self._writers.get(worker_id) is writer:
+                del self._writers[worker_id]
+
+    def _route(self, sender, line):
+        self._routed += 1
+        to = json.loads(line).get('to')
+        if to is None:
+            for worker_id, writer in self._writers.items():
+                if worker_id != sender:
+                    writer.write(line)
+        elif to in self._writers:
+            self._writers[to].write(line)
+        else:
+            # Адресат перезапускается - доставить после подключения (ограниченно по числу и возрасту)
+            pending = self._pending.setdefault(to, deque(maxlen=PENDING_LIMIT))
+            if len(pending) == PENDING_LIMIT:
+                self._dropped += 1
+            pending.append((time.monotonic(), line))
+
+
+class Cluster:
+    """Подключение воркера к маршрутизатору: рассылки, адресные сообщения и запросы"""
+
+    def __init__(self, worker_id, workers, path):
+        self.worker_id = worker_id
+        self.workers = workers
+        self.path = path
+        self.is_primary = worker_id == PRIMARY
+
+        # Вызывается при потере связи с супервизором; по умолчанию воркер завершается,
+        # и супервизор запускает его заново с состоянием основного
+        self.on_disconnect = self._exit
+
+        self._handlers = {}
+        self._requests = {}
+        self._next_request = 0
+        self._writer = None
+        self._reader_task = None
+
+        self._sent = 0
+        self._received = 0
+
+    async def connect(self):
+        reader, self._writer = await asyncio.open_unix_connection(self.path, limit=MESSAGE_LIMIT)
+        self._writer.write(json.dumps({'worker': self.worker_id}).encode() + b'\n')
+        self._reader_task = asyncio.create_task(self._read(reader))
+
+    async def close(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+        self._fail_requests(ConnectionError('Cluster connection closed'))
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def on(self, channel, handler):
+        """Обработчик сообщений и запросов канала (функция или корутина)"""
+        self._handlers[channel] = handler
+
+    def _send(self, message):
+        if self._writer is None:
+            return
+        self._writer.write(json.dumps(message).encode() + b'\n')
+        self._sent += 1
+
+    def publish(self, channel, data):
+        """Сообщение всем остальным воркерам"""
+        self._send({'to': None, 'channel': channel, 'data': data})
+
+    def send(self, to, channel, data):
+        """Сообщение одному воркеру"""
+        self._send({'to': to, 'channel': channel, 'data': data})
+
+    async def request(self, channel, data=None, to=PRIMARY, timeout=REQUEST_TIMEOUT):
+        """Запрос к воркеру to; результат его обработчика
+
+        asyncio.TimeoutError - нет ответа за timeout, ConnectionError - связь потеряна."""
+        if self._writer is None:
+            raise ConnectionError('Cluster connection is closed')
+
+        self._next_request += 1
+        request_id = self._next_request
+        future = asyncio.get_running_loop().create_future()
+        self._requests[request_id] = future
+        self._send({'to': to, 'channel': channel, 'data': data, 'request': request_id, 'from': self.worker_id})
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._requests.pop(request_id, None)
+
+    def replicate(self, channel, target, methods):
+        """Повторять вызовы методов target во всех воркерах (аргументы - JSON)"""
+        originals = {name: getattr(target, name) for name in methods}
+
+        for name, original in originals.items():
+            def replicated(*args, _name=name, _original=original):
+                result = _original(*args)
+                self.publish(channel, [_name, args])
+                return result
+            setattr(target, name, replicated)
+
+        self.on(channel, lambda data: originals[data[0]](*data[1]))
+
+    async def _read(self, reader):
+        try:
+            await self._read_messages(reader)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Cluster connection failed: {e}")
+
+        # Супервизор закрыл соединение (или упал): без него состояние расходится с основным
+        logger.error(f"Worker {self.worker_id} lost cluster connection")
+        self._writer = None
+        self._fail_requests(ConnectionError('Cluster connection lost'))
+        self.on_disconnect()
+
+    def _fail_requests(self, error):
+        for future in self._requests.values():
+            if not future.done():
+                future.set_exception(error)
+
+    def _exit(self):
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    async def _read_messages(self, reader):
+        while line := await reader.readline():
+            self._received += 1
+            message = json.loads(line)
+
+            if 'reply' in message:
+                future = self._requests.get(message['reply'])
+                if future is not None and not future.done():
+                    if 'error' in message:
+                        future.set_exception(RuntimeError(message['error']))
+                    else:
+                        future.set_result(message['data'])
+                continue
+
+            handler = self._handlers.get(message['channel'])
+            if handler is None:
+                logger.warning(f"No cluster handler for {message['channel']}")
+                continue
+
+            if 'request' in message:
+                asyncio.create_task(self._answer(handler, message))
+                continue
+
+            try:
+                result = handler(message['data'])
+                if asyncio.iscoroutine(result):
+                    asyncio.create_task(result)
+            except Exception as e:
+                logger.error(f"Cluster message {message['channel']} failed: {e}")
+
+    async def _answer(self, handler, message):
+        reply = {'to': message['from'], 'reply': message['request']}
+        try:
+            result = handler(message['data'])
+            if asyncio.iscoroutine(result):
+                result = await result
+            reply['data'] = result
+        except Exception as e:
+            reply['error'] = str(e)
+        self._send(reply)
+
+    def stats(self):
+        return {
+            'worker_id': self.worker_id,
+            'workers': self.workers,
+            'sent': self._sent,
+            'received': self._received,
+            'pending_requests': len(self._requests),
+        }
+
+
+def share_state(cluster, db, hub, presence, rolls):
+    """Общее состояние воркеров: повторение изменений и пересылка ставок основному"""
+    for shard in getattr(db, 'shards', [db]):
+        cluster.replicate(f'balances:{shard.db_path}', shard.balances, ['put', 'invalidate'])
+        cluster.replicate(f'gift_history:{shard.db_path}', shard.gift_upgrade_history, ['record'])
+    cluster.replicate('leaderboard', db.leaderboard, ['set_profile', 'record'])
+    cluster.replicate('presence', presence, ['touch'])
+    cluster.replicate('hub', hub, ['publish', 'publish_coalesced', 'send_to_user'])
+    cluster.replicate('rolls', rolls, ['begin_round', 'close_bets', 'add_bet', 'add_result'])
+
+    if cluster.is_primary:
+        cluster.on('rolls_snapshot', lambda data: rolls.snapshot())
+        cluster.on('rolls_bet', lambda data: rolls.place_bet(data['user_id'], data['color'], data['amount']))
+    else:
+        async def place_bet(user_id, color, amount):
+            try:
+                return await cluster.request('rolls_bet', {'user_id': user_id, 'color': color, 'amount': amount})
+            except (asyncio.TimeoutError, ConnectionError) as e:
+                logger.error(f"Rolls bet forwarding failed: {e!r}")
+                return {'error': 'Betting is unavailable'}
+        rolls.place_bet = place_bet
+
+
+def from_env():
+    """Подключение воркера, запущенного супервизором (None - обычный одиночный процесс)"""
+    if 'WORKER_ID' not in os.environ:
+        return None
+    return Cluster(int(os.environ['WORKER_ID']), int(os.environ['WEB_WORKERS']), os.environ['CLUSTER_SOCKET'])
+
+
+async def supervise(workers, argv=None):
+    """Запустить workers процессов с текущими аргументами и перезапускать упавшие"""
+    argv = argv or [sys.executable] + sys.argv
+    path = os.path.join(tempfile.mkdtemp(prefix='casino-'), 'cluster.sock')
+    router = Router(path)
+    await router.start()
+
+    processes = {}
+    stopping = asyncio.Event()
+
+    async def spawn(worker_id):
+        env = dict(os.environ, WORKER_ID=str(worker_id), WEB_WORKERS=str(workers), CLUSTER_SOCKET=path)
+        # Своя группа процессов: Ctrl+C и сигналы группе получает только супервизор,
+        # иначе повторный сигнал прервет остановку воркера на середине
+        processes[worker_id] = await asyncio.create_subprocess_exec(*argv, env=env, start_new_session=True)
+
+    async def watch(worker_id):
+        while not stopping.is_set():
+            code = await processes[worker_id].wait()
+            if stopping.is_set():
+                return
+            logger.error(f"Worker {worker_id} exited with {code}, restarting")
+            await asyncio.sleep(RESTART_DELAY)
+            await spawn(worker_id)
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    for worker_id in range(workers):
+        await spawn(worker_id)
+    watchers = [asyncio.create_task(watch(worker_id)) for worker_id in range(workers)]
+    logger.info(f"Started {workers} workers")
+
+    await stopping.wait()
+    for process in processes.values():
+        if process.returncode is None:
+            process.send_signal(signal.SIGTERM)
+    await asyncio.gather(*(process.wait() for process in processes.values()))
+    for watcher in watchers:
+        watcher.cancel()
+    await router.close()
+    os.rmdir(os.path.dirname(path))
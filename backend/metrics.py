@@ -0,0 +1,248 @@
+"""
+Метрики в текстовом формате Prometheus без внешних зависимостей
+Гистограммы задержек маршрутов API и методов DatabaseManager, запросы в работе, ошибки;
+статистика пула, писателя (commit) и кэшей снимается только при запросе /metrics.
+"""
+import asyncio
+import contextvars
+import inspect
+from bisect import bisect_left
+from time import perf_counter
+
+from aiohttp import web
+
+# Границы корзин задержки, секунды
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+
+# Идет замер метода БД: вложенные вызовы публичных методов (approve_withdrawal ->
+# process_withdrawals) не считаются второй раз
+_db_method_active = contextvars.ContextVar('db_method_active', default=False)
+
+
+class Histogram:
+    """Корзины задержек одного набора меток"""
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # последняя - +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Value:
+    """Значение счетчика или измерителя одного набора меток"""
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+
+class Family:
+    """Метрика с метками: дочерние значения по кортежу значений меток"""
+
+    def __init__(self, name, kind, help, label_names, buckets=None):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.label_names = label_names
+        self.buckets = buckets
+        self.children = {}
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = Histogram(self.buckets) if self.kind == 'histogram' else Value()
+        return child
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in pairs) + '}'
+
+
+class MetricsRegistry:
+    """Реестр метрик процесса; const_labels добавляются ко всем (например, номер воркера)"""
+
+    def __init__(self, const_labels=None):
+        self.const_labels = tuple((const_labels or {}).items())
+        self._families = []
+        self._collectors = []
+
+    def _family(self, name, kind, help, label_names, buckets=None):
+        family = Family(name, kind, help, tuple(label_names), buckets)
+        self._families.append(family)
+        return family
+
+    def histogram(self, name, help, label_names=(), buckets=LATENCY_BUCKETS):
+        return self._family(name, 'histogram', help, label_names, buckets)
+
+    def counter(self, name, help, label_names=()):
+        return self._family(name, 'counter', help, label_names)
+
+    def gauge(self, name, help, label_names=()):
+        return self._family(name, 'gauge', help, label_names)
+
+    def collector(self, collect):
+        """collect() -> [(имя, тип, описание, значение)] - вызывается при каждом рендере"""
+        self._collectors.append(collect)
+
+    def render(self):
+        """Все метрики в формате text/plain; version=0.0.4"""
+        lines = []
+        for family in self._families:
+            lines.append(f'# HELP {family.name} {family.help}')
+            lines.append(f'# TYPE {family.name} {family.kind}')
+            for values, child in family.children.items():
+                pairs = self.const_labels + tuple(zip(family.label_names, values))
+                if family.kind != 'histogram':
+                    lines.append(f'{family.name}{format_labels(pairs)} {child.value}')
+                    continue
+
+                cumulative = 0
+                for bound, count in zip(family.buckets + ('+Inf',), child.counts):
+                    cumulative += count
+                    lines.append(f'{family.name}_bucket{format_labels(pairs + (("le", bound),))} {cumulative}')
+                lines.append(f'{family.name}_sum{format_labels(pairs)} {child.sum}')
+                lines.append(f'{family.name}_count{format_labels(pairs)} {child.count}')
+
+        labels = format_labels(self.const_labels)
+        for collect in self._collectors:
+            for name, kind, help, value in collect():
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} {kind}')
+                lines.append(f'{name}{labels} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+class RequestMetrics:
+    """aiohttp middleware: задержка, запросы в работе и ошибки по шаблону маршрута"""
+
+    def __init__(self, registry):
+        self.duration = registry.histogram(
+            'http_request_duration_seconds', 'Время обработки запроса', ('route', 'method')
+        )
+        self.in_flight = registry.gauge('http_requests_in_flight', 'Запросы в обработке', ('route', 'method'))
+        self.errors = registry.counter(
+            'http_request_errors_total', 'Ответы 5xx и необработанные исключения', ('route', 'method')
+        )
+        self._children = {}   # маршрут aiohttp -> (гистограмма, в работе, ошибки)
+
+    def _metrics(self, request):
+        route = request.match_info.route
+        children = self._children.get(route)
+        if children is None:
+            resource = route.resource
+            if resource is None:
+                # Запрос без маршрута (404/405): объект маршрута каждый раз новый
+                key = ('unmatched', request.method)
+                return self.duration.labels(*key), self.in_flight.labels(*key), self.errors.labels(*key)
+            key = (resource.canonical, request.method)
+            children = self._children[route] = (
+                self.duration.labels(*key), self.in_flight.labels(*key), self.errors.labels(*key)
+            )
+        return children
+
+    @web.middleware
+    async def middleware(self, request, handler):
+        duration, in_flight, errors = self._metrics(request)
+        in_flight.value += 1
+        started = perf_counter()
+        try:
+            response = await handler(request)
+        except web.HTTPException as e:
+            if e.status >= 500:
+                errors.value += 1
+            raise
+        except BaseException:
+            errors.value += 1
+            raise
+        finally:
+            duration.observe(perf_counter() - started)
+            in_flight.value -= 1
+
+        if response.status >= 500:
+            errors.value += 1
+        return response
+
+
+def instrument_database(db, registry):
+    """Обернуть async-методы db: задержка, вызовы в работе и ошибки по имени метода"""
+    duration = registry.histogram('db_method_duration_seconds', 'Время выполнения метода БД', ('method',))
+    in_flight = registry.gauge('db_method_in_flight', 'Вызовы метода БД в работе', ('method',))
+    errors = registry.counter('db_method_errors_total', 'Исключения метода БД', ('method',))
+
+    for name, method in inspect.getmembers(db, inspect.iscoroutinefunction):
+        if name.startswith('_'):
+            continue
+
+        def instrumented(*args, _method=method, _duration=duration.labels(name), _in_flight=in_flight.labels(name),
+                         _errors=errors.labels(name), **kwargs):
+            return _observe(_method(*args, **kwargs), _duration, _in_flight, _errors)
+
+        setattr(db, name, instrumented)
+
+    def collect():
+        pool = db.get_pool_stats()
+        writer = db.get_writer_stats()
+        balances = db.get_balance_cache_stats()
+        return [
+            ('sqlite_commits_total', 'counter', 'Commit писателя (пачек записи)', writer['batches_total']),
+            ('sqlite_write_ops_total', 'counter', 'Операций записи', writer['ops_total']),
+            ('sqlite_write_failed_ops_total', 'counter', 'Откатившихся операций записи', writer['failed_ops']),
+            ('sqlite_write_queued', 'gauge', 'Операций записи в очереди', writer['queued']),
+            ('sqlite_commit_seconds_avg', 'gauge', 'Среднее время commit', writer['commit_time_avg_ms'] / 1000),
+            ('sqlite_commit_seconds_max', 'gauge', 'Максимальное время commit', writer['commit_time_max_ms'] / 1000),
+            ('sqlite_pool_in_use', 'gauge', 'Занятых соединений чтения', pool['in_use']),
+            ('sqlite_pool_waiting', 'gauge', 'Ожидающих соединения', pool['waiting']),
+            ('sqlite_pool_waits_total', 'counter', 'Ожиданий свободного соединения', pool['waits_total']),
+            ('balance_cache_size', 'gauge', 'Записей в кэше балансов', balances['size']),
+            ('balance_cache_hit_ratio', 'gauge', 'Доля попаданий кэша балансов', balances['hit_rate']),
+        ]
+
+    registry.collector(collect)
+
+
+async def _observe(coroutine, duration, in_flight, errors):
+    if _db_method_active.get():
+        return await coroutine
+
+    active = _db_method_active.set(True)
+    in_flight.value += 1
+    started = perf_counter()
+    try:
+        return await coroutine
+    except BaseException as e:
+        if not isinstance(e, asyncio.CancelledError):
+            errors.value += 1
+        raise
+    finally:
+        duration.observe(perf_counter() - started)
+        in_flight.value -= 1
+        _db_method_active.reset(active)
+
+
+def metrics_handler(registry, token=None):
+    """Обработчик /metrics; token - требовать заголовок Authorization: Bearer <token>,
+    без token - отвечать только на запросы с этого же хоста"""
+    async def handler(request):
+        if token:
+            if request.headers.get('Authorization') != f'Bearer {token}':
+                return web.Response(status=401)
+        elif request.remote not in LOCAL_ADDRESSES:
+            return web.Response(status=403)
+        return web.Response(body=registry.render().encode(), headers={'Content-Type': CONTENT_TYPE})
+    return handler
@@ -0,0 +1,321 @@
+"""
+Очередь уведомлений Telegram (outbox) и фоновая отправка
+Обработчики только добавляют строку в notification_outbox. Отправитель забирает
+наступившие уведомления, соблюдает лимиты Telegram, сворачивает всплески однотипных
+уведомлений в сводки и повторяет неудачные отправки с экспоненциальной задержкой.
+"""
+import asyncio
+import logging
+import time
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_RATE = 25        # сообщений в секунду на бота (лимит Telegram - 30)
+CHAT_RATE = 1           # сообщений в секунду в один чат
+DIGEST_INTERVAL = 60    # не чаще одного уведомления вида в чат за столько секунд
+POLL_INTERVAL = 1.0
+BATCH_SIZE = 500
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 600.0
+DIGEST_NAMES = 20       # сколько строк показывать в сводке
+
+
+class RateLimiter:
+    """Ведро токенов: rate операций в секунду, до burst подряд"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Дождаться разрешения на одну операцию"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds):
+        """Не выдавать разрешений seconds секунд (ответ Telegram retry_after)"""
+        self._tokens = min(self._tokens, 0) - seconds * self.rate
+        self._updated = time.monotonic()
+
+
+def _name(payload):
+    return f"@{payload['username']}" if payload.get('username') else str(payload['user_id'])
+
+
+def _more(lines, total):
+    if total > len(lines):
+        lines.append(f"… и еще {total - len(lines)}")
+    return '\n'.join(lines)
+
+
+def format_new_user(payload):
+    return (
+        f"🆕 Новый пользователь!\n"
+        f"ID: {payload['user_id']}\n"
+        f"Username: @{payload['username']}\n"
+        f"Name: {payload['first_name']}"
+    ), None
+
+
+def digest_new_users(payloads, period):
+    names = [f"{_name(payload)} ({payload['first_name']})" for payload in payloads[:DIGEST_NAMES]]
+    return f"🆕 Новых пользователей за {period}: {len(payloads)}\n\n" + _more(names, len(payloads))
+
+
+def format_deposit(payload):
+    return (
+        f"💰 Новое пополнение!\n\n"
+        f"👤 Пользователь: {_name(payload)} (ID: {payload['user_id']})\n"
+        f"💵 Сумма: {payload['amount']} TON\n"
+        f"💳 Метод: {payload['method']}"
+    ), None
+
+
+def digest_deposits(payloads, period):
+    total = sum(float(payload['amount'] or 0) for payload in payloads)
+    lines = [f"{_name(payload)}: {payload['amount']} TON ({payload['method']})" for payload in payloads[:DIGEST_NAMES]]
+    return f"💰 Пополнений за {period}: {len(payloads)} на {total:.2f} TON\n\n" + _more(lines, len(payloads))
+
+
+def format_withdrawal_request(payload):
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="✅ Одобрить", callback_data=f"approve_{payload['request_id']}"),
+            InlineKeyboardButton(text="❌ Отклонить", callback_data=f"reject_{payload['request_id']}")
+        ]
+    ])
+    return (
+        f"💸 Новый запрос на вывод!\n\n"
+        f"👤 Пользователь: {_name(payload)} (ID: {payload['user_id']})\n"
+        f"💵 Сумма: {payload['amount']} TON\n"
+        f"👛 Кошелек: {payload['wallet']}\n"
+        f"🆔 ID запроса: {payload['request_id']}"
+    ), keyboard
+
+
+def format_message(payload):
+    return payload['text'], None
+
+
+# Вид уведомления -> (одиночное сообщение: (текст, клавиатура), сводка или None - всегда по одному)
+FORMATS = {
+    'new_user': (format_new_user, digest_new_users),
+    'deposit': (format_deposit, digest_deposits),
+    'withdrawal_request': (format_withdrawal_request, None),
+    'message': (format_message, None),
+}
+
+
+def describe_period(seconds):
+    return f"{seconds // 60:.0f} мин" if seconds >= 60 else f"{seconds:.0f} с"
+
+
+class NotificationDispatcher:
+    """Фоновая отправка уведомлений из outbox"""
+
+    def __init__(self, db, bot, global_rate=GLOBAL_RATE, chat_rate=CHAT_RATE, digest_interval=DIGEST_INTERVAL,
+                 poll_interval=POLL_INTERVAL, batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+        self.db = db
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.digest_interval = digest_interval
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+
+        self.limiter = RateLimiter(global_rate, burst=global_rate)
+        self._chat_limiters = {}
+        self._last_sent = {}   # (chat_id, вид) -> время последней отправки
+        self._wake = None
+        self._task = None
+
+        self._sent_total = 0
+        self._digests_total = 0
+        self._collapsed_total = 0
+        self._retries_total = 0
+        self._dropped_total = 0
+        self._send_time_total = 0.0
+
+    async def notify(self, chat_id, kind, payload):
+        """Поставить уведомление в очередь (одна вставка; отправка - в фоне)"""
+        await self.notify_many([(chat_id, kind, payload)])
+
+    async def notify_many(self, notifications):
+        """Поставить в очередь [(chat_id, вид, payload)] одной операцией"""
+        if not notifications:
+            return
+        await self.db.enqueue_notifications(notifications)
+        self.wake()
+
+    def wake(self):
+        """Проверить очередь, не дожидаясь интервала опроса"""
+        if self._wake is not None:
+            self._wake.set()
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Остановить отправку; неотправленное остается в outbox"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                while await self.dispatch() >= self.batch_size:
+                    pass
+            except Exception as e:
+                logger.error(f"Notification dispatch failed: {e}")
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def dispatch(self, now=None):
+        """Отправить наступившие уведомления; сколько строк outbox обработано"""
+        now = time.time() if now is None else now
+        rows = await self.db.get_due_notifications(now, self.batch_size)
+        if not rows:
+            return 0
+
+        groups = {}
+        for row in rows:
+            groups.setdefault((row['chat_id'], row['kind']), []).append(row)
+
+        messages = {}   # chat_id -> [(строки, вид, текст, клавиатура)]
+        deferred = []
+        for (chat_id, kind), group in groups.items():
+            single, digest = FORMATS.get(kind, (format_message, None))
+
+            if digest is None:
+                for row in group:
+                    messages.setdefault(chat_id, []).append(([row], kind, *single(row['payload'])))
+                continue
+
+            # Одно уведомление вида за интервал; накопившиеся за интервал уходят одной сводкой
+            release = self._last_sent.get((chat_id, kind), 0) + self.digest_interval
+            if release > now:
+                deferred.extend((row['id'], release, None) for row in group)
+            elif len(group) == 1:
+                messages.setdefault(chat_id, []).append((group, kind, *single(group[0]['payload'])))
+            else:
+                text = digest([row['payload'] for row in group], describe_period(self.digest_interval))
+                messages.setdefault(chat_id, []).append((group, kind, text, None))
+
+        # За цикл в чат уходит не больше, чем позволяет его лимит без ожидания; остальное
+        # переносится на время, когда лимит чата освободится, чтобы занятый чат не задерживал остальные
+        for chat_id, items in messages.items():
+            limiter = self._chat_limiter(chat_id)
+            for position, (group, *_) in enumerate(items[limiter.burst:], 1):
+                release = now + position / self.chat_rate
+                deferred.extend((row['id'], release, None) for row in group)
+            del items[limiter.burst:]
+
+        if deferred:
+            await self.db.reschedule_notifications(deferred)
+
+        results = await asyncio.gather(*(self._send_chat(chat_id, items) for chat_id, items in messages.items()))
+
+        sent, retries = [], []
+        for chat_results in results:
+            for group, error in chat_results:
+                if error is None:
+                    sent.extend(row['id'] for row in group)
+                else:
+                    retries.extend(self._retry(row, error, now) for row in group)
+
+        if sent:
+            await self.db.complete_notifications(sent)
+        if retries:
+            await self.db.reschedule_notifications(retries, failed=True)
+
+        if len(self._chat_limiters) > 1000:
+            self._chat_limiters.clear()
+
+        return len(rows)
+
+    def _chat_limiter(self, chat_id):
+        limiter = self._chat_limiters.get(chat_id)
+        if limiter is None:
+            limiter = self._chat_limiters[chat_id] = RateLimiter(self.chat_rate)
+        return limiter
+
+    async def _send_chat(self, chat_id, items):
+        """Сообщения одного чата по очереди с его лимитом; [(строки, ошибка или None)]"""
+        limiter = self._chat_limiter(chat_id)
+        results = []
+        for group, kind, text, keyboard in items:
+            await limiter.acquire()
+            await self.limiter.acquire()
+
+            started = time.perf_counter()
+            try:
+                await self.bot.send_message(chat_id, text, reply_markup=keyboard)
+            except Exception as e:
+                if isinstance(e, TelegramRetryAfter):
+                    self.limiter.pause(e.retry_after)
+                results.append((group, e))
+                continue
+            self._send_time_total += time.perf_counter() - started
+
+            self._sent_total += 1
+            if len(group) > 1:
+                self._digests_total += 1
+                self._collapsed_total += len(group)
+            if FORMATS.get(kind, (None, None))[1] is not None:
+                self._last_sent[(chat_id, kind)] = time.time()
+            results.append((group, None))
+
+        return results
+
+    def _retry(self, row, error, now):
+        """Новое время отправки после ошибки: (id, время или None - прекратить, текст ошибки)"""
+        attempts = row['attempts'] + 1
+        permanent = isinstance(error, (TelegramForbiddenError, TelegramBadRequest))
+
+        if permanent or attempts >= self.max_attempts:
+            self._dropped_total += 1
+            logger.error(f"Notification {row['id']} to {row['chat_id']} dropped after {attempts} attempts: {error}")
+            return row['id'], None, str(error)
+
+        self._retries_total += 1
+        if isinstance(error, TelegramRetryAfter):
+            delay = error.retry_after
+        else:
+            delay = min(BACKOFF_BASE * 2 ** row['attempts'], BACKOFF_MAX)
+        return row['id'], now + delay, str(error)
+
+    def stats(self):
+        """Статистика отправки"""
+        return {
+            'sent_total': self._sent_total,
+            'digests_total': self._digests_total,
+            'collapsed_total': self._collapsed_total,
+            'retries_total': self._retries_total,
+            'dropped_total': self._dropped_total,
+            'send_avg_ms': self._send_time_total / self._sent_total * 1000 if self._sent_total else 0.0,
+        }
@@ -0,0 +1,103 @@
+"""
+Онлайн-присутствие пользователей в памяти
+"""
+import time
+from datetime import datetime, timezone
+
+SQLITE_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class PresenceTracker:
+    """Корзины по времени с истечением: онлайн, DAU и пик одновременных пользователей за O(1)"""
+
+    def __init__(self, online_window=300, bucket_seconds=60):
+        self.bucket_seconds = bucket_seconds
+        self.window_buckets = max(1, online_window // bucket_seconds)
+
+        self._buckets = {}       # номер корзины -> множество user_id
+        self._last_bucket = {}   # user_id -> номер корзины последней активности
+        self._online = 0
+
+        self._day = None
+        self._day_users = set()
+        self._day_peak = 0
+        self._yesterday = {'dau': 0, 'peak': 0}
+        self._peak_all_time = 0
+
+    def _expire(self, bucket):
+        """Удалить корзины за пределами окна онлайна"""
+        cutoff = bucket - self.window_buckets + 1
+        for old in [b for b in self._buckets if b < cutoff]:
+            users = self._buckets.pop(old)
+            for user_id in users:
+                del self._last_bucket[user_id]
+            self._online -= len(users)
+
+    def _roll_day(self, now):
+        day = int(now // 86400)
+        if day == self._day:
+            return
+
+        if self._day is not None:
+            previous = {'dau': len(self._day_users), 'peak': self._day_peak}
+            self._yesterday = previous if day == self._day + 1 else {'dau': 0, 'peak': 0}
+
+        self._day = day
+        self._day_users = set()
+        self._day_peak = self._online
+
+    def touch(self, user_id, now=None):
+        """Отметить активность пользователя"""
+        now = time.time() if now is None else now
+        bucket = int(now // self.bucket_seconds)
+
+        self._expire(bucket)
+        self._roll_day(now)
+
+        previous = self._last_bucket.get(user_id)
+        if previous is None:
+            self._online += 1
+        elif previous < bucket:
+            self._buckets[previous].discard(user_id)
+            if not self._buckets[previous]:
+                del self._buckets[previous]
+        else:
+            bucket = previous
+
+        self._buckets.setdefault(bucket, set()).add(user_id)
+        self._last_bucket[user_id] = bucket
+        self._day_users.add(user_id)
+
+        self._day_peak = max(self._day_peak, self._online)
+        self._peak_all_time = max(self._peak_all_time, self._online)
+
+    def seed_since(self, now=None):
+        """Начало интервала для восстановления из БД (SQLite, UTC)"""
+        now = time.time() if now is None else now
+        since = min(now - now % 86400, now - self.window_buckets * self.bucket_seconds)
+        return datetime.fromtimestamp(since, timezone.utc).strftime(SQLITE_TIME_FORMAT)
+
+    def load(self, rows):
+        """Восстановить состояние из строк (user_id, last_activity) после перезапуска"""
+        parsed = [
+            (datetime.strptime(last_activity, SQLITE_TIME_FORMAT).replace(tzinfo=timezone.utc).timestamp(), user_id)
+            for user_id, last_activity in rows
+            if last_activity
+        ]
+        for timestamp, user_id in sorted(parsed):
+            self.touch(user_id, now=timestamp)
+
+    def stats(self, now=None):
+        """Онлайн сейчас, DAU и пики"""
+        now = time.time() if now is None else now
+        self._expire(int(now // self.bucket_seconds))
+        self._roll_day(now)
+
+        return {
+            'online_now': self._online,
+            'dau': len(self._day_users),
+            'peak_today': self._day_peak,
+            'dau_yesterday': self._yesterday['dau'],
+            'peak_yesterday': self._yesterday['peak'],
+            'peak_all_time': self._peak_all_time,
+        }
@@ -0,0 +1,163 @@
+"""
+WebSocket канал для push-событий (раунды Rolls, изменения баланса)
+"""
+import asyncio
+import json
+import logging
+
+from aiohttp import web, WSCloseCode, WSMsgType
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 64          # кадров в очереди одного клиента до отключения
+COALESCE_DELAY = 0.2     # минимальный интервал между частыми событиями (пул ставок)
+AUTH_TIMEOUT = 10        # сколько ждать первого сообщения с initData, секунд
+
+
+class Subscriber:
+    """Подключенный клиент: своя очередь кадров и задача отправки"""
+
+    def __init__(self, ws, user_id):
+        self.ws = ws
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    async def writer(self):
+        while True:
+            frame = await self.queue.get()
+            await self.ws.send_str(frame)
+
+
+class Broadcaster:
+    """Рассылка одного заранее сериализованного кадра всем подписчикам
+
+    authenticate(data) -> user_id или None проверяет первое сообщение клиента."""
+
+    def __init__(self, authenticate):
+        self.authenticate = authenticate
+        self._subscribers = set()
+        self._by_user = {}
+        self._coalesced = {}
+        self._coalesce_handles = {}
+
+        self._frames_sent = 0
+        self._slow_dropped = 0
+
+    @staticmethod
+    def _frame(event, data):
+        return json.dumps({'event': event, 'data': data})
+
+    def _enqueue(self, subscriber, frame):
+        try:
+            subscriber.queue.put_nowait(frame)
+            self._frames_sent += 1
+        except asyncio.QueueFull:
+            # Медленный клиент не должен тормозить остальных: отключаем, он переподключится
+            self._slow_dropped += 1
+            self._detach(subscriber)
+            asyncio.ensure_future(subscriber.ws.close(code=WSCloseCode.TRY_AGAIN_LATER, message=b'slow consumer'))
+
+    def publish(self, event, data):
+        """Событие для всех подписчиков"""
+        if not self._subscribers:
+            return
+        frame = self._frame(event, data)
+        for subscriber in list(self._subscribers):
+            self._enqueue(subscriber, frame)
+
+    def publish_coalesced(self, event, data):
+        """Частое событие: отправляется не чаще COALESCE_DELAY, только последнее значение"""
+        self._coalesced[event] = data
+        if event not in self._coalesce_handles:
+            loop = asyncio.get_running_loop()
+            self._coalesce_handles[event] = loop.call_later(COALESCE_DELAY, self._flush_coalesced, event)
+
+    def _flush_coalesced(self, event):
+        self._coalesce_handles.pop(event, None)
+        data = self._coalesced.pop(event, None)
+        if data is not None:
+            self.publish(event, data)
+
+    def send_to_user(self, user_id, event, data):
+        """Событие для всех подключений одного пользователя"""
+        subscribers = self._by_user.get(user_id)
+        if not subscribers:
+            return
+        frame = self._frame(event, data)
+        for subscriber in list(subscribers):
+            self._enqueue(subscriber, frame)
+
+    def _attach(self, subscriber):
+        self._subscribers.add(subscriber)
+        self._by_user.setdefault(subscriber.user_id, set()).add(subscriber)
+
+    def _detach(self, subscriber):
+        self._subscribers.discard(subscriber)
+        subscribers = self._by_user.get(subscriber.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._by_user[subscriber.user_id]
+
+    async def _handshake(self, ws):
+        """Первое сообщение клиента - {"init_data": ...}; user_id или None"""
+        try:
+            message = await ws.receive(timeout=AUTH_TIMEOUT)
+        except asyncio.TimeoutError:
+            return None
+        if message.type != WSMsgType.TEXT:
+            return None
+
+        try:
+            data = json.loads(message.data)
+        except ValueError:
+            return None
+        return self.authenticate(data)
+
+    async def handle(self, request):
+        """GET /api/ws; пользователь проверяется по первому сообщению, а не по URL"""
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+
+        user_id = await self._handshake(ws)
+        if user_id is None:
+            await ws.close(code=WSCloseCode.POLICY_VIOLATION, message=b'unauthorized')
+            return ws
+
+        subscriber = Subscriber(ws, user_id)
+        self._attach(subscriber)
+        writer = asyncio.create_task(subscriber.writer())
+
+        try:
+            # Входящие сообщения не ожидаются, цикл нужен для обработки закрытия и ping/pong
+            async for _ in ws:
+                pass
+        finally:
+            self._detach(subscriber)
+            writer.cancel()
+            try:
+                await writer
+            except (asyncio.CancelledError, ConnectionResetError):
+                pass
+            except Exception as e:
+                logger.debug(f"WebSocket writer stopped: {e}")
+
+        return ws
+
+    async def close(self):
+        """Закрыть все подключения (при остановке сервера)"""
+        for handle in self._coalesce_handles.values():
+            handle.cancel()
+        self._coalesce_handles.clear()
+
+        for subscriber in list(self._subscribers):
+            self._detach(subscriber)
+            await subscriber.ws.close(code=WSCloseCode.GOING_AWAY, message=b'server shutdown')
+
+    def stats(self):
+        return {
+            'subscribers': len(self._subscribers),
+            'users': len(self._by_user),
+            'frames_sent': self._frames_sent,
+            'slow_dropped': self._slow_dropped,
+        }
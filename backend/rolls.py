@@ -0,0 +1,235 @@
+"""
+Серверный движок раундов Rolls
+"""
+import asyncio
+import logging
+import secrets
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Цвет -> (множитель, количество фишек из 100), как в CONFIG.GAMES.ROLLS
+COLORS = {
+    'red': (2, 49),
+    'blue': (2, 49),
+    'green': (10, 2),
+}
+
+# Пределы ставки, как CONFIG.GAMES.ROLLS.MIN_BET/MAX_BET
+MIN_BET = 0.01
+MAX_BET = 50
+
+ROUND_DURATION = 10
+HISTORY_SIZE = 100
+
+
+def draw_color():
+    """Выбор победного цвета на сервере"""
+    roll = secrets.randbelow(sum(count for _, count in COLORS.values()))
+    for color, (_, count) in COLORS.items():
+        if roll < count:
+            return color
+        roll -= count
+
+
+class RollsEngine:
+    """Раунды по ROUND_DURATION секунд: прием ставок, розыгрыш и пакетный расчет
+
+    Состояние меняется только методами begin_round/close_bets/add_bet/add_result,
+    поэтому в нескольких воркерах его можно повторить по сообщениям основного."""
+
+    def __init__(self, db, round_duration=ROUND_DURATION, hub=None):
+        self.db = db
+        self.round_duration = round_duration
+        self.hub = hub
+
+        self.game_number = 0
+        self.accepting_bets = False
+        self.history = deque(maxlen=HISTORY_SIZE)
+
+        self._ends_at = 0.0
+        self._bets = []
+        self._pool = {color: 0.0 for color in COLORS}
+        self._inflight = 0
+        self._drained = None
+        self._task = None
+
+    async def start(self):
+        """Восстановить состояние из БД и запустить цикл раундов"""
+        last_game = await self.db.get_last_rolls_game_number()
+
+        # Ставки раундов без результата (прерванных остановкой сервера или ошибкой расчета)
+        # возвращаются игрокам
+        refunded = await self.db.refund_rolls_bets()
+        if refunded['refunded']:
+            logger.info(f"Refunded {refunded['refunded']} unsettled Rolls bets")
+
+        self.history.extend(await self.db.get_rolls_history(HISTORY_SIZE))
+        self.game_number = last_game
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Остановить цикл; ставки незавершенного раунда вернутся при следующем запуске"""
+        self.close_bets()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def begin_round(self, game_number, ends_at):
+        """Открыть раунд; ends_at - время окончания приема ставок (unix time)"""
+        self.game_number = game_number
+        self._ends_at = ends_at
+        self._bets = []
+        self._pool = {color: 0.0 for color in COLORS}
+        self.accepting_bets = True
+
+    def close_bets(self):
+        self.accepting_bets = False
+
+    def add_bet(self, bet):
+        self._bets.append(bet)
+        self._pool[bet['color']] += bet['amount']
+
+    def add_result(self, result):
+        self.history.appendleft(result)
+
+    def snapshot(self):
+        """Состояние для воркера, подключившегося позже"""
+        return {
+            'game_number': self.game_number,
+            'ends_at': self._ends_at,
+            'accepting_bets': self.accepting_bets,
+            'bets': self._bets,
+            'history': list(self.history),
+        }
+
+    def restore(self, state):
+        self.begin_round(state['game_number'], state['ends_at'])
+        for bet in state['bets']:
+            self.add_bet(bet)
+        self.accepting_bets = state['accepting_bets']
+        self.history.clear()
+        self.history.extend(state['history'])
+
+    def _open_round(self):
+        self.begin_round(self.game_number + 1, time.time() + self.round_duration)
+
+        if self.hub is not None:
+            self.hub.publish('round_start', {
+                'game_number': self.game_number,
+                'time_remaining': self.round_duration,
+            })
+
+    async def _run(self):
+        while True:
+            self._open_round()
+            await asyncio.sleep(self.round_duration)
+
+            self.close_bets()
+            # Дождаться ставок, которые уже пишутся в БД
+            await self._drained.wait()
+
+            try:
+                await self._settle()
+            except Exception as e:
+                logger.error(f"Rolls round {self.game_number} settlement failed: {e}")
+                await self._refund()
+
+    async def _settle(self):
+        winning_color = draw_color()
+        multiplier = COLORS[winning_color][0]
+
+        result = await self.db.settle_rolls_round(self.game_number, winning_color, multiplier)
+        self.add_result({'game_number': self.game_number, 'winning_color': winning_color})
+
+        if self.hub is not None:
+            self.hub.publish('result', {'game_number': self.game_number, 'winning_color': winning_color})
+            for user_id, balance in result['balances'].items():
+                self.hub.send_to_user(user_id, 'balance', {
+                    'balance': balance,
+                    'reason': 'rolls_win',
+                    'game_number': self.game_number,
+                })
+
+        return result
+
+    async def _refund(self):
+        """Вернуть ставки раунда, который не удалось рассчитать; при неудаче их вернет следующий запуск"""
+        try:
+            result = await self.db.refund_rolls_bets(self.game_number)
+        except Exception as e:
+            logger.error(f"Rolls round {self.game_number} refund failed: {e}")
+            return
+
+        if self.hub is not None:
+            for user_id, balance in result['balances'].items():
+                self.hub.send_to_user(user_id, 'balance', {
+                    'balance': balance,
+                    'reason': 'rolls_refund',
+                    'game_number': self.game_number,
+                })
+
+    def time_remaining(self):
+        if not self.accepting_bets:
+            return 0
+        return max(0.0, self._ends_at - time.time())
+
+    def current(self):
+        """Состояние текущего раунда"""
+        return {
+            'game_number': self.game_number,
+            'time_remaining': self.time_remaining(),
+            'accepting_bets': self.accepting_bets,
+            'pool': self._pool,
+            'bets_count': len(self._bets),
+        }
+
+    def current_bets(self):
+        """Ставки текущего раунда (из памяти)"""
+        return self._bets
+
+    async def place_bet(self, user_id, color, amount):
+        """Принять ставку в текущий раунд; {'error': ...} - прием закрыт или недостаточно средств
+
+        Проверка accepting_bets и учет ставки в _inflight идут без await между ними:
+        после close_bets расчет ждет _drained, поэтому принятая ставка попадает
+        в раунд до его расчета, а опоздавшая отклоняется."""
+        if not self.accepting_bets:
+            return {'error': 'Betting is closed'}
+        game_number = self.game_number
+
+        self._inflight += 1
+        self._drained.clear()
+        try:
+            balance = await self.db.place_rolls_bet(user_id, game_number, color, amount)
+        finally:
+            self._inflight -= 1
+            if self._inflight == 0:
+                self._drained.set()
+
+        if balance is None:
+            return {'error': 'Insufficient balance'}
+
+        self.add_bet({'user_id': user_id, 'color': color, 'amount': amount})
+
+        if self.hub is not None:
+            self.hub.publish_coalesced('pool', {
+                'game_number': game_number,
+                'pool': self._pool,
+                'bets_count': len(self._bets),
+            })
+            self.hub.send_to_user(user_id, 'balance', {
+                'balance': balance,
+                'delta': -amount,
+                'reason': 'rolls_bet',
+                'game_number': game_number,
+            })
+
+        return {'game_number': game_number, 'balance': balance}
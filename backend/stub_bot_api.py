@@ -0,0 +1,85 @@
+"""
+Локальная заглушка Telegram Bot API для проверки отправки уведомлений без сети
+Отвечает на sendMessage (и любые другие методы) как Telegram, может изображать
+задержку, лимит (429 с retry_after), заблокировавших бота (403) и сбои. Печатает полученные сообщения.
+
+Запуск:
+    python backend/stub_bot_api.py [--port 8081] [--latency-ms 50] [--flood-every 10] [--forbidden-every 0] [--fail-every 0]
+    TELEGRAM_API_URL=http://127.0.0.1:8081 python backend/bot.py
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+
+from aiohttp import web
+
+
+def create_app(latency=0.0, flood_every=0, fail_every=0, retry_after=1, quiet=False, forbidden_every=0):
+    app = web.Application()
+    app['messages'] = []
+    counter = itertools.count(1)
+
+    async def handle(request):
+        number = next(counter)
+        method = request.match_info['method']
+        data = dict(await request.post()) if request.content_type != 'application/json' else await request.json()
+
+        if latency:
+            await asyncio.sleep(latency)
+
+        if flood_every and number % flood_every == 0:
+            return web.json_response({
+                'ok': False, 'error_code': 429,
+                'description': f'Too Many Requests: retry after {retry_after}',
+                'parameters': {'retry_after': retry_after},
+            }, status=429)
+        if forbidden_every and number % forbidden_every == 0:
+            return web.json_response({
+                'ok': False, 'error_code': 403, 'description': 'Forbidden: bot was blocked by the user',
+            }, status=403)
+        if fail_every and number % fail_every == 0:
+            return web.json_response({'ok': False, 'error_code': 500, 'description': 'Internal Server Error'}, status=500)
+
+        if method != 'sendMessage':
+            if method == 'editMessageText' and not quiet:
+                print(f"~> {data.get('chat_id')}/{data.get('message_id')}: {data.get('text', '')!r}")
+            return web.json_response({'ok': True, 'result': True})
+
+        chat_id = int(data['chat_id'])
+        message = {
+            'message_id': number,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'text': data.get('text', ''),
+        }
+        app['messages'].append(message)
+        if not quiet:
+            markup = f" [кнопки: {json.loads(data['reply_markup'])}]" if data.get('reply_markup') else ''
+            print(f"-> {chat_id}: {message['text']!r}{markup}")
+        return web.json_response({'ok': True, 'result': message})
+
+    app.router.add_post('/bot{token}/{method}', handle)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Заглушка Telegram Bot API')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency-ms', type=float, default=0, help='задержка ответа')
+    parser.add_argument('--flood-every', type=int, default=0, help='каждый N-й запрос - 429')
+    parser.add_argument('--forbidden-every', type=int, default=0, help='каждый N-й запрос - 403')
+    parser.add_argument('--fail-every', type=int, default=0, help='каждый N-й запрос - 500')
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--quiet', action='store_true', help='не печатать сообщения')
+    args = parser.parse_args()
+
+    app = create_app(
+        args.latency_ms / 1000, args.flood_every, args.fail_every, args.retry_after, args.quiet, args.forbidden_every
+    )
+    web.run_app(app, host='127.0.0.1', port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Буфер отложенной записи активности пользователей (heartbeat)
+"""
+import asyncio
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityBuffer:
+    """Хранит последнюю отметку активности на пользователя и сбрасывает их пачкой"""
+
+    def __init__(self, writer, flush_interval=5.0):
+        self.writer = writer
+        self.flush_interval = flush_interval
+
+        self._pending = {}
+        self._task = None
+
+        self._touches_total = 0
+        self._flushes_total = 0
+        self._rows_flushed_total = 0
+
+    def touch(self, user_id):
+        """Отметить активность (только в памяти)"""
+        # Формат совпадает с CURRENT_TIMESTAMP в SQLite (UTC)
+        self._pending[user_id] = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        self._touches_total += 1
+
+    async def flush(self):
+        """Записать накопленные отметки одной операцией писателя"""
+        if not self._pending:
+            return 0
+
+        batch, self._pending = self._pending, {}
+
+        async def write(db):
+            await db.executemany(
+                'UPDATE users SET last_activity = ? WHERE user_id = ?',
+                [(timestamp, user_id) for user_id, timestamp in batch.items()]
+            )
+
+        try:
+            await self.writer.submit(write)
+        except BaseException:
+            # Вернуть несохраненные отметки, не затирая более свежие
+            for user_id, timestamp in batch.items():
+                self._pending.setdefault(user_id, timestamp)
+            raise
+
+        self._flushes_total += 1
+        self._rows_flushed_total += len(batch)
+        return len(batch)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Activity flush failed: {e}")
+
+    def start(self):
+        """Запустить периодический сброс"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Остановить периодический сброс и записать остаток"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        await self.flush()
+
+    def stats(self):
+        """Статистика буфера"""
+        return {
+            'pending': len(self._pending),
+            'touches_total': self._touches_total,
+            'flushes_total': self._flushes_total,
+            'rows_flushed_total': self._rows_flushed_total,
+        }
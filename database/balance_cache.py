@@ -0,0 +1,64 @@
+"""
+Кэш балансов пользователей в памяти (LRU с версиями из БД)
+"""
+from collections import OrderedDict
+
+CAPACITY = 10000
+
+
+class BalanceCache:
+    """(balance, ref_balance, version) на пользователя; версия - users.balance_version,
+    поэтому запоздавшая запись или чтение не перетирает более новое значение"""
+
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self._entries = OrderedDict()   # user_id -> (balance, ref_balance, version)
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._stale = 0
+
+    def get(self, user_id):
+        """Баланс из кэша или None"""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self._misses += 1
+            return None
+
+        self._entries.move_to_end(user_id)
+        self._hits += 1
+        return {'balance': entry[0], 'ref_balance': entry[1]}
+
+    def put(self, user_id, balance, ref_balance, version):
+        """Записать значение из БД, если оно не старее закэшированного"""
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            if entry[2] >= version:
+                self._stale += 1
+                return
+            self._entries.move_to_end(user_id)
+
+        self._entries[user_id] = (balance, ref_balance, version)
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def invalidate(self, user_id=None):
+        """Удалить пользователя из кэша (или очистить весь кэш)"""
+        if user_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(user_id, None)
+
+    def stats(self):
+        lookups = self._hits + self._misses
+        return {
+            'size': len(self._entries),
+            'capacity': self.capacity,
+            'hits': self._hits,
+            'misses': self._misses,
+            'evictions': self._evictions,
+            'stale_writes': self._stale,
+            'hit_rate': self._hits / lookups if lookups else 0.0,
+        }
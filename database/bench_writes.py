@@ -0,0 +1,87 @@
+"""
+Сравнение записи в SQLite: commit на каждую операцию против группового commit (WriteQueue)
+Запуск: python database/bench_writes.py [клиентов] [операций на клиента] [synchronous: NORMAL|FULL]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.db_manager import BALANCE_VERSION, RETURNING_BALANCE, DatabaseManager
+
+USERS = 1000
+UPDATE = f'UPDATE users SET balance = balance + 1, {BALANCE_VERSION} WHERE user_id = ? {RETURNING_BALANCE}'
+
+
+async def per_op_commit(db, user_id):
+    """Прежний путь: соединение из пула, своя транзакция и commit"""
+    async with db.pool.connection() as conn:
+        cursor = await conn.execute(UPDATE, (user_id,))
+        row = await cursor.fetchone()
+        await cursor.close()
+        await conn.commit()
+        return row
+
+
+async def group_commit(db, user_id):
+    """Операция писателя: commit общий для пачки"""
+    async def write(conn):
+        cursor = await conn.execute(UPDATE, (user_id,))
+        row = await cursor.fetchone()
+        await cursor.close()
+        return row
+
+    return await db.writer.submit(write)
+
+
+async def run(name, write, clients, ops, synchronous):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'bench.db'))
+        db.pool.pragmas = tuple(
+            (pragma, synchronous if pragma == 'synchronous' else value) for pragma, value in db.pool.pragmas
+        )
+        await db.init_database()
+        async with db.pool.connection() as conn:
+            await conn.executemany(
+                'INSERT INTO users (user_id, username, first_name) VALUES (?, ?, ?)',
+                [(user_id, f'user{user_id}', 'User') for user_id in range(USERS)]
+            )
+            await conn.commit()
+
+        latencies = []
+
+        async def client(index):
+            for op in range(ops):
+                started = time.perf_counter()
+                await write(db, (index * ops + op) % USERS)
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client(index) for index in range(clients)))
+        elapsed = time.perf_counter() - started
+
+        writer = db.writer.stats()
+        commits = writer['batches_total'] if writer['ops_total'] else len(latencies)
+        await db.close()
+
+    latencies.sort()
+    print(
+        f"{name:<16} {len(latencies) / elapsed:>9.0f} оп/с {commits / elapsed:>9.0f} commit/с "
+        f"p50 {latencies[len(latencies) // 2] * 1000:>7.2f} мс "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:>7.2f} мс"
+    )
+
+
+async def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    ops = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    synchronous = sys.argv[3] if len(sys.argv) > 3 else 'NORMAL'
+
+    print(f"⏱ {clients} клиентов x {ops} операций (UPDATE баланса), synchronous={synchronous}")
+    await run('commit на оп.', per_op_commit, clients, ops, synchronous)
+    await run('групповой commit', group_commit, clients, ops, synchronous)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,194 @@
+"""
+Проверка планов запросов DatabaseManager
+Выполняет все методы на временной базе, собирает реально выполненные SQL-запросы
+и прогоняет каждый через EXPLAIN QUERY PLAN. Завершается с ошибкой,
+если какой-либо запрос читает таблицу полным сканированием.
+"""
+import asyncio
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.db_manager import DatabaseManager
+
+# Сканирование таблицы: "SCAN users" или обход индекса целиком "SCAN users USING INDEX idx_..."
+SCAN = re.compile(r'^SCAN (\w+)( USING (COVERING )?INDEX \w+)?')
+
+# Служебные и не читающие таблицы запросы
+SKIP_PREFIXES = ('PRAGMA', 'BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE', 'CREATE', 'ALTER', 'DROP', 'EXPLAIN')
+
+# Известные сканирования: (метод, таблица) -> причина
+ALLOWED_SCANS = {
+    ('init_database', 'users'): 'начальное заполнение реферальных агрегатов',
+    ('init_database', 'deposits'): 'начальное заполнение счетчиков статистики',
+    ('init_database', 'withdrawals'): 'начальное заполнение счетчиков статистики',
+    ('reconcile_stats_counters', 'stats_counters'): 'сравнение всех счетчиков до и после пересчета',
+    ('reconcile_stats_counters', 'users'): 'полный пересчет счетчиков',
+    ('reconcile_stats_counters', 'deposits'): 'полный пересчет счетчиков',
+    ('reconcile_stats_counters', 'withdrawals'): 'полный пересчет счетчиков',
+    ('load_leaderboard', 'users'): 'однократная загрузка лидерборда при старте',
+    ('fetch_leaderboard_rows', 'users'): 'данные для load_leaderboard - все пользователи',
+    ('get_last_rolls_game_number', 'rolls_games'): 'последний раунд: обход по rowid с конца без фильтра, LIMIT 1',
+    ('get_rolls_history', 'rolls_games'): 'последние раунды: обход по rowid с конца без фильтра, LIMIT',
+}
+
+
+async def run_scenario(db, trace):
+    """Вызвать каждый метод DatabaseManager, запоминая, какой метод выполняет запрос"""
+    async def call(name, *args):
+        trace['method'] = name
+        result = await getattr(db, name)(*args)
+        trace['method'] = None
+        return result
+
+    async def collect(name, *args):
+        """Как call, для async-генераторов: все пачки списком"""
+        trace['method'] = name
+        batches = [batch async for batch in getattr(db, name)(*args)]
+        trace['method'] = None
+        return batches
+
+    await call('init_database')
+    await call('register_user', 1, 'alice', 'Alice')
+    await call('register_user', 2, 'bob', 'Bob', 1)
+    await call('add_referral', 1)
+    await call('credit_referrer', 1, 0.5)
+    await call('update_last_activity', 1)
+    trace['method'] = 'update_last_activity'
+    await db.activity.flush()
+    await call('get_balance', 1)
+    await call('add_balance', 1, 100)
+    await call('remove_balance', 1, 10)
+    await call('add_deposit', 2, 50, 'ton')
+    await call('settle_gift_upgrade', 1, 1, 2, True)
+    await call('get_gift_upgrade_history', 1, 10)
+    await call('get_gift_upgrade_history', 1, 10, 1000)
+    await call('add_game_played', 1)
+    request_id = await call('create_withdrawal_request', 1, 10, 'wallet')
+    await call('approve_withdrawal', request_id)
+    request_id = await call('create_withdrawal_request', 1, 10, 'wallet')
+    await call('reject_withdrawal', request_id)
+    await call('create_withdrawal_request', 1, 10, 'wallet')
+    request_id = await call('create_withdrawal_request', 2, 10, 'wallet')
+    page = await call('get_pending_withdrawals', 1)
+    await call('get_pending_withdrawals', 1, page['next'], 1, 5, 20)
+    await call('process_withdrawals', 'rejected', None, None, 5, 20, 10)
+    await call('process_withdrawals', 'approved', [request_id])
+    await call('transfer_ref_balance', 1)
+    await call('get_user_info', 1)
+    await call('get_user_referrals', 1)
+    await call('get_user_referrals', 1, 20, 5)
+    await call('get_referral_summary', 1)
+    await call('get_activity_since', '2000-01-01 00:00:00')
+    await call('get_admin_stats')
+    await call('get_stats_counters')
+    await call('reconcile_stats_counters')
+    await call('load_leaderboard')
+    await call('fetch_leaderboard_rows')
+    await call('add_deposit', 1, 5, 'stars')
+    await call('get_leaderboard', 35, 'week')
+    await call('get_leaderboard_rank', 1, 'day')
+    await call('add_to_inventory', 1, 'Jolly Chimp', 15, 'nft')
+    await call('add_to_inventory', 1, 'Jolly Chimp', 15, 'nft')
+    await call('count_inventory', 1)
+    await call('count_inventory', 1, 'nft', 10, 20)
+    page = await call('get_inventory_page', 1, 1)
+    await call('get_inventory_page', 1, 1, page['next'])
+    await call('get_inventory_page', 1, 10, (15, 0), 'item_value', 'asc', 'nft', 10, 20)
+    await collect('iter_inventory', 1, 1)
+    await call('sell_inventory_item', page['items'][0]['id'], 1)
+    await call('add_to_inventory', 1, 'Jolly Chimp', 15, 'nft')
+    await call('add_to_inventory', 1, '1 TON', 1, 'ton')
+    await call('sell_items', 1, None, 'nft', 10, 20)
+    await call('sell_items', 1)
+    await call('can_claim_free_case', 1)
+    reward = {'name': 'Jolly Chimp', 'type': 'nft', 'value': 15, 'chance': 100}
+    await call('open_cases', 1, 'REGULAR_1', 5, [reward, reward])
+    await call('open_cases', 1, 'FREE', 0, [reward], 86400)
+    await call('get_last_rolls_game_number')
+    await call('place_rolls_bet', 1, 1, 'red', 1)
+    await call('settle_rolls_round', 1, 'red', 2)
+    await call('place_rolls_bet', 2, 2, 'blue', 1)
+    await call('refund_rolls_bets', 1)
+    await call('refund_rolls_bets')
+    await call('get_rolls_history', 100)
+    await call('get_rolls_bets', 1)
+    await call('claim_free_case', 1)
+    await call('enqueue_notifications', [(1, 'new_user', {'user_id': 2})])
+    notifications = await call('get_due_notifications', 2e9, 100)
+    await call('reschedule_notifications', [(notifications[0]['id'], 1.0, 'error')], True)
+    await call('complete_notifications', [notifications[0]['id']])
+    await call('get_user_ids', 1, 1000)
+    await collect('iter_user_ids', 0, 1)
+    broadcast_id = await call('create_broadcast', 'hello')
+    await call('get_running_broadcasts')
+    await call('checkpoint_broadcast', broadcast_id, 2, 2, 0, 0, 'done')
+
+
+async def main():
+    statements = []
+    trace = {'method': None}
+
+    def on_statement(sql):
+        statements.append((trace['method'], sql))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'plans.db')
+        db = DatabaseManager(db_path)
+        db.pool.trace_callback = on_statement
+
+        await run_scenario(db, trace)
+        await db.close()
+
+        conn = sqlite3.connect(db_path)
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        # Частичный индекс содержит только строки под своим условием - его обход не читает всю таблицу
+        partial = {
+            name for name, index_sql in conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index'")
+            if index_sql and ' WHERE ' in index_sql.upper()
+        }
+        seen = set()
+        failures = []
+        checked = 0
+
+        for method, sql in statements:
+            sql = ' '.join(sql.split())
+            if method is None or sql.upper().startswith(SKIP_PREFIXES) or (method, sql) in seen:
+                continue
+            seen.add((method, sql))
+            checked += 1
+
+            plan = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql)]
+
+            # Обход индекса в порядке ORDER BY без сортировки, остановленный LIMIT, не читает всю таблицу.
+            # Сканирование без индекса так не засчитывается: с фильтром оно может пройти всю таблицу
+            bounded = 'ORDER BY' in sql.upper() and ' LIMIT ' in sql.upper() and \
+                not any('TEMP B-TREE' in detail for detail in plan)
+
+            for detail in plan:
+                match = SCAN.match(detail)
+                if not match or match.group(1) not in tables:
+                    continue
+                if match.group(2) and (bounded or match.group(2).split()[-1] in partial):
+                    continue
+                if (method, match.group(1)) not in ALLOWED_SCANS:
+                    failures.append((method, detail, sql))
+
+        conn.close()
+
+    print(f"🔍 Проверено запросов: {checked}")
+    for (method, table), reason in ALLOWED_SCANS.items():
+        print(f"⚠️ Разрешено сканирование {table} в {method}: {reason}")
+
+    if failures:
+        for method, detail, sql in failures:
+            print(f"❌ {method}: {detail}\n   {sql}")
+        sys.exit(1)
+
+    print("✅ Полных сканирований таблиц не найдено")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,327 +1,390 @@
-import aiosqlite
 import asyncio
-from datetime import datetime, timedelta
+from datetime import datetime
 import json
+import math
 import random
 import string
+import time
+
+from database.activity_buffer import ActivityBuffer
+from database.balance_cache import BalanceCache
+from database.leaderboard import Leaderboard, build_leaderboard, leaderboard_since
+from database.migrations import run_migrations
+from database.pool import ConnectionPool
+from database.recent_games import RecentGames
+from database.stats_counters import NEW_USERS_PREFIX, new_users_cutoff, rebuild_stats_counters, \
+    summarize as summarize_stats
+from database.writer import WriteQueue
+
+INVENTORY_FIELDS = ('id', 'item_name', 'item_value', 'item_type', 'acquired_at')
+INVENTORY_SORTS = ('acquired_at', 'item_value')
+# Минимальная сумма вывода, как CONFIG.WITHDRAWAL.MIN_AMOUNT
+MIN_WITHDRAWAL = 10
+
+# Каждое изменение баланса увеличивает версию и возвращает новое значение для кэша
+BALANCE_VERSION = 'balance_version = balance_version + 1'
+RETURNING_BALANCE = 'RETURNING balance, ref_balance, balance_version'
+
+async def credit_referrer(db, referrer_id, ref_bonus):
+    """Начисление рефереру внутри транзакции вызывающего; новый баланс реферера"""
+    cursor = await db.execute(
+        f'UPDATE users SET ref_balance = ref_balance + ?, ref_earned = ref_earned + ?, {BALANCE_VERSION} '
+        f'WHERE user_id = ? {RETURNING_BALANCE}',
+        (ref_bonus, ref_bonus, referrer_id)
+    )
+    row = await cursor.fetchone()
+    await cursor.close()
+    
+    await db.execute(
+        'INSERT INTO referral_earnings_daily (referrer_id, day, amount) VALUES (?, date("now"), ?) '
+        'ON CONFLICT(referrer_id, day) DO UPDATE SET amount = amount + excluded.amount',
+        (referrer_id, ref_bonus)
+    )
+    return row
 
 class DatabaseManager:
-    def __init__(self, db_path='database/casino.db'):
+    def __init__(self, db_path='database/casino.db', pool_size=4, activity_flush_interval=5.0,
+                 leaderboard_game_wins=False, balance_cache_size=10000, write_batch_size=128, write_batch_delay=0.0):
         self.db_path = db_path
+        self.pool = ConnectionPool(db_path, size=pool_size)
+        # Все изменения выполняет один писатель; пул соединений - только для чтения
+        self.writer = WriteQueue(self.pool, max_batch=write_batch_size, max_delay=write_batch_delay)
+        self.activity = ActivityBuffer(self.writer, flush_interval=activity_flush_interval)
+        self.leaderboard = Leaderboard()
+        self.leaderboard_game_wins = leaderboard_game_wins
+        self._leaderboard_lock = None
+        self.gift_upgrade_history = RecentGames()
+        self.balances = BalanceCache(balance_cache_size)
+    
+    def start(self):
+        """Запуск фоновых задач (писатель, сброс буфера активности)"""
+        self.writer.start()
+        self.activity.start()
+    
+    async def close(self):
+        """Сброс буферов, остановка писателя и закрытие пула соединений"""
+        await self.activity.stop()
+        await self.writer.stop()
+        await self.pool.close()
+    
+    def get_pool_stats(self):
+        """Статистика пула соединений"""
+        return self.pool.stats()
+    
+    def get_balance_cache_stats(self):
+        """Статистика кэша балансов"""
+        return self.balances.stats()
+    
+    def get_writer_stats(self):
+        """Статистика писателя (группового commit)"""
+        return self.writer.stats()
     
     async def init_database(self):
-        """Инициализация базы данных"""
-        async with aiosqlite.connect(self.db_path) as db:
-            # Таблица пользователей
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id INTEGER PRIMARY KEY,
-                    username TEXT,
-                    first_name TEXT,
-                    balance REAL DEFAULT 0,
-                    ref_balance REAL DEFAULT 0,
-                    total_deposits REAL DEFAULT 0,
-                    games_played INTEGER DEFAULT 0,
-                    ref_percent INTEGER DEFAULT 10,
-                    referred_by INTEGER,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Таблица игр Gift Upgrade
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS gift_upgrade_games (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    bet_amount REAL,
-                    multiplier REAL,
-                    win_amount REAL,
-                    result TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id)
-                )
-            ''')
-            
-            # Таблица игр Rolls
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS rolls_games (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    game_number INTEGER,
-                    winning_color TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Таблица ставок в Rolls
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS rolls_bets (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    game_number INTEGER,
-                    bet_color TEXT,
-                    bet_amount REAL,
-                    win_amount REAL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id)
-                )
-            ''')
-            
-            # Таблица открытия кейсов
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS case_openings (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    case_name TEXT,
-                    case_price REAL,
-                    reward_name TEXT,
-                    reward_value REAL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id)
-                )
-            ''')
-            
-            # Таблица инвентаря
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS inventory (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    item_name TEXT,
-                    item_value REAL,
-                    item_type TEXT,
-                    acquired_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id)
-                )
-            ''')
-            
-            # Таблица пополнений
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS deposits (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    amount REAL,
-                    method TEXT,
-                    status TEXT DEFAULT 'completed',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id)
-                )
-            ''')
-            
-            # Таблица выводов
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS withdrawals (
-                    id TEXT PRIMARY KEY,
-                    user_id INTEGER,
-                    amount REAL,
-                    wallet TEXT,
-                    status TEXT DEFAULT 'pending',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    processed_at TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id)
-                )
-            ''')
-            
-            # Таблица последнего бесплатного кейса
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS free_case_claims (
-                    user_id INTEGER PRIMARY KEY,
-                    last_claim TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id)
-                )
-            ''')
-            
-            await db.commit()
+        """Инициализация базы данных (применение недостающих миграций схемы)"""
+        async with self.pool.connection() as db:
+            return await run_migrations(db)
     
     async def register_user(self, user_id, username, first_name, referred_by=None):
-        """Регистрация нового пользователя"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
+        """Регистрация нового пользователя; True, если пользователь добавлен"""
+        async def write(db):
+            cursor = await db.execute(
                 'INSERT OR IGNORE INTO users (user_id, username, first_name, referred_by) VALUES (?, ?, ?, ?)',
                 (user_id, username, first_name, referred_by)
             )
-            await db.commit()
+            inserted = cursor.rowcount == 1
             
-            # Если есть реферер, начислить ему бонус за привлечение
-            if referred_by:
+            # Счетчик рефералов реферера обновляется в той же транзакции
+            if inserted and referred_by and referred_by != user_id:
                 await db.execute(
-                    'UPDATE users SET ref_balance = ref_balance + 0 WHERE user_id = ?',
+                    'UPDATE users SET referrals_count = referrals_count + 1 WHERE user_id = ?',
                     (referred_by,)
                 )
-                await db.commit()
+            
+            return inserted
+        
+        inserted = await self.writer.submit(write)
+        
+        if inserted and self.leaderboard.loaded:
+            self.leaderboard.set_profile(user_id, username, first_name)
+        
+        return inserted
     
-    async def update_last_activity(self, user_id):
-        """Обновление последней активности"""
-        async with aiosqlite.connect(self.db_path) as db:
+    async def add_referral(self, referrer_id):
+        """Увеличить счетчик рефералов (реферал зарегистрирован в другом шарде)"""
+        async def write(db):
             await db.execute(
-                'UPDATE users SET last_activity = CURRENT_TIMESTAMP WHERE user_id = ?',
-                (user_id,)
+                'UPDATE users SET referrals_count = referrals_count + 1 WHERE user_id = ?',
+                (referrer_id,)
             )
-            await db.commit()
+        
+        await self.writer.submit(write)
+    
+    async def update_last_activity(self, user_id):
+        """Обновление последней активности (запись в БД откладывается буфером)"""
+        self.activity.touch(user_id)
     
     async def get_balance(self, user_id):
-        """Получение баланса пользователя"""
-        async with aiosqlite.connect(self.db_path) as db:
+        """Получение баланса пользователя (из кэша, при промахе - из БД)"""
+        cached = self.balances.get(user_id)
+        if cached is not None:
+            return cached
+        
+        async with self.pool.connection() as db:
             cursor = await db.execute(
-                'SELECT balance, ref_balance FROM users WHERE user_id = ?',
+                'SELECT balance, ref_balance, balance_version FROM users WHERE user_id = ?',
                 (user_id,)
             )
             row = await cursor.fetchone()
-            return {'balance': row[0] if row else 0, 'ref_balance': row[1] if row else 0}
+        
+        if not row:
+            return {'balance': 0, 'ref_balance': 0}
+        
+        self.balances.put(user_id, *row)
+        return {'balance': row[0], 'ref_balance': row[1]}
     
     async def add_balance(self, user_id, amount):
-        """Добавление баланса"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                'UPDATE users SET balance = balance + ? WHERE user_id = ?',
+        """Добавление баланса; новый баланс или None, если пользователя нет"""
+        async def write(db):
+            cursor = await db.execute(
+                f'UPDATE users SET balance = balance + ?, {BALANCE_VERSION} WHERE user_id = ? {RETURNING_BALANCE}',
                 (amount, user_id)
             )
-            await db.commit()
+            row = await cursor.fetchone()
+            await cursor.close()
+            return row
+        
+        row = await self.writer.submit(write)
+        
+        if not row:
+            return None
+        
+        self.balances.put(user_id, *row)
+        return row[0]
     
     async def remove_balance(self, user_id, amount):
-        """Удаление баланса"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                'UPDATE users SET balance = balance - ? WHERE user_id = ?',
-                (amount, user_id)
-            )
-            await db.commit()
+        """Удаление баланса; новый баланс или None, если пользователя нет"""
+        return await self.add_balance(user_id, -amount)
     
-    async def add_deposit(self, user_id, amount, method):
-        """Добавление записи о пополнении"""
-        async with aiosqlite.connect(self.db_path) as db:
+    async def add_deposit(self, user_id, amount, method, remote_referrer=None):
+        """Добавление записи о пополнении; возвращает реферальный бонус
+        remote_referrer - (user_id, ref_percent) реферера из другого шарда: бонус учитывается
+        у пользователя, а начисляет его вызывающий через credit_referrer на шарде реферера"""
+        async def write(db):
             # Добавить пополнение
             await db.execute(
                 'INSERT INTO deposits (user_id, amount, method) VALUES (?, ?, ?)',
                 (user_id, amount, method)
             )
             
-            # Обновить баланс
-            await db.execute(
-                'UPDATE users SET balance = balance + ?, total_deposits = total_deposits + ? WHERE user_id = ?',
-                (amount, amount, user_id)
-            )
+            # Реферер и его процент
+            referrer = remote_referrer
+            if referrer is None:
+                cursor = await db.execute(
+                    'SELECT referrer.user_id, referrer.ref_percent FROM users '
+                    'JOIN users AS referrer ON referrer.user_id = users.referred_by WHERE users.user_id = ?',
+                    (user_id,)
+                )
+                referrer = await cursor.fetchone()
+            ref_bonus = amount * (referrer[1] / 100) if referrer else 0
             
-            # Начислить рефереру
+            # Обновить баланс (и сколько пользователь принес рефереру)
             cursor = await db.execute(
-                'SELECT referred_by FROM users WHERE user_id = ?',
-                (user_id,)
+                'UPDATE users SET balance = balance + ?, total_deposits = total_deposits + ?, '
+                f'ref_bonus_paid = ref_bonus_paid + ?, {BALANCE_VERSION} WHERE user_id = ? {RETURNING_BALANCE}',
+                (amount, amount, ref_bonus, user_id)
             )
-            row = await cursor.fetchone()
+            balance_row = await cursor.fetchone()
+            await cursor.close()
+            ref_row = None
             
-            if row and row[0]:
-                referred_by = row[0]
-                cursor = await db.execute(
-                    'SELECT ref_percent FROM users WHERE user_id = ?',
-                    (referred_by,)
-                )
-                ref_row = await cursor.fetchone()
-                
-                if ref_row:
-                    ref_percent = ref_row[0]
-                    ref_bonus = amount * (ref_percent / 100)
-                    
-                    await db.execute(
-                        'UPDATE users SET ref_balance = ref_balance + ? WHERE user_id = ?',
-                        (ref_bonus, referred_by)
-                    )
+            # Начислить рефереру
+            if referrer and remote_referrer is None:
+                ref_row = await credit_referrer(db, referrer[0], ref_bonus)
             
-            await db.commit()
+            return balance_row, referrer, ref_row, ref_bonus
+        
+        balance_row, referrer, ref_row, ref_bonus = await self.writer.submit(write)
+        
+        if balance_row:
+            self.balances.put(user_id, *balance_row)
+        if ref_row:
+            self.balances.put(referrer[0], *ref_row)
+        
+        if self.leaderboard.loaded:
+            self.leaderboard.record(user_id, amount)
+        
+        return ref_bonus
+    
+    async def credit_referrer(self, referrer_id, ref_bonus):
+        """Начислить реферальный бонус за пополнение реферала из другого шарда"""
+        row = await self.writer.submit(lambda db: credit_referrer(db, referrer_id, ref_bonus))
+        if row:
+            self.balances.put(referrer_id, *row)
     
     async def create_withdrawal_request(self, user_id, amount, wallet):
-        """Создание запроса на вывод"""
+        """Создание запроса на вывод; None - недостаточно средств, ValueError - сумма меньше минимальной"""
+        # not >= отсекает и NaN
+        if not amount >= MIN_WITHDRAWAL:
+            raise ValueError(f'Minimum withdrawal is {MIN_WITHDRAWAL} TON')
+        
         request_id = ''.join(random.choices(string.ascii_letters + string.digits, k=16))
         
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                'INSERT INTO withdrawals (id, user_id, amount, wallet) VALUES (?, ?, ?, ?)',
-                (request_id, user_id, amount, wallet)
+        async def write(db):
+            # Заблокировать средства, только если их хватает
+            cursor = await db.execute(
+                f'UPDATE users SET balance = balance - ?, {BALANCE_VERSION} '
+                f'WHERE user_id = ? AND balance >= ? {RETURNING_BALANCE}',
+                (amount, user_id, amount)
             )
+            row = await cursor.fetchone()
+            await cursor.close()
             
-            # Заблокировать средства
-            await db.execute(
-                'UPDATE users SET balance = balance - ? WHERE user_id = ?',
-                (amount, user_id)
-            )
+            if row:
+                await db.execute(
+                    'INSERT INTO withdrawals (id, user_id, amount, wallet) VALUES (?, ?, ?, ?)',
+                    (request_id, user_id, amount, wallet)
+                )
             
-            await db.commit()
+            return row
+        
+        row = await self.writer.submit(write)
+        if not row:
+            return None
         
+        self.balances.put(user_id, *row)
         return request_id
     
     async def approve_withdrawal(self, request_id):
         """Одобрение вывода"""
-        async with aiosqlite.connect(self.db_path) as db:
+        processed = await self.process_withdrawals('approved', request_ids=[request_id])
+        return processed[0] if processed else None
+    
+    async def reject_withdrawal(self, request_id):
+        """Отклонение вывода с возвратом средств"""
+        processed = await self.process_withdrawals('rejected', request_ids=[request_id])
+        return processed[0] if processed else None
+    
+    def _pending_withdrawals_filter(self, request_ids=None, user_id=None, min_amount=None, max_amount=None):
+        conditions = ["status = 'pending'"]
+        params = []
+        
+        if request_ids is not None:
+            conditions.append('id IN (SELECT value FROM json_each(?))')
+            params.append(json.dumps([str(request_id) for request_id in request_ids]))
+        if user_id is not None:
+            conditions.append('user_id = ?')
+            params.append(user_id)
+        if min_amount is not None:
+            conditions.append('amount >= ?')
+            params.append(min_amount)
+        if max_amount is not None:
+            conditions.append('amount <= ?')
+            params.append(max_amount)
+        
+        return conditions, params
+    
+    async def get_pending_withdrawals(self, limit=20, after=None, user_id=None, min_amount=None, max_amount=None):
+        """Страница ожидающих выводов, старые первыми; after - ключ (created_at, id) последней заявки предыдущей страницы"""
+        conditions, params = self._pending_withdrawals_filter(None, user_id, min_amount, max_amount)
+        if after is not None:
+            conditions.append('(created_at, id) > (?, ?)')
+            params.extend(after)
+        params.append(limit + 1)
+        
+        async with self.pool.connection() as db:
             cursor = await db.execute(
-                'SELECT user_id, amount FROM withdrawals WHERE id = ? AND status = "pending"',
-                (request_id,)
+                f'SELECT id, user_id, amount, wallet, created_at FROM withdrawals WHERE {" AND ".join(conditions)} '
+                f'ORDER BY created_at, id LIMIT ?',
+                params
             )
-            row = await cursor.fetchone()
-            
-            if row:
-                await db.execute(
-                    'UPDATE withdrawals SET status = "approved", processed_at = CURRENT_TIMESTAMP WHERE id = ?',
-                    (request_id,)
-                )
-                await db.commit()
-                
-                return {'user_id': row[0], 'amount': row[1]}
+            rows = await cursor.fetchall()
         
-        return None
+        # Лишняя строка показывает, есть ли следующая страница
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        return {
+            'items': [dict(row) for row in rows],
+            'next': (rows[-1]['created_at'], rows[-1]['id']) if has_more else None,
+        }
     
-    async def reject_withdrawal(self, request_id):
-        """Отклонение вывода"""
-        async with aiosqlite.connect(self.db_path) as db:
+    async def process_withdrawals(self, status, request_ids=None, user_id=None, min_amount=None, max_amount=None,
+                                  limit=None):
+        """Одобрить ('approved') или отклонить ('rejected') ожидающие выводы по фильтру одной транзакцией;
+        limit - не больше стольких самых старых. Список обработанных заявок"""
+        if status not in ('approved', 'rejected'):
+            raise ValueError(f"Invalid withdrawal status: {status}")
+        
+        conditions, params = self._pending_withdrawals_filter(request_ids, user_id, min_amount, max_amount)
+        selection = f'SELECT id FROM withdrawals WHERE {" AND ".join(conditions)} ORDER BY created_at, id'
+        if limit is not None:
+            selection += ' LIMIT ?'
+            params.append(limit)
+        
+        async def write(db):
+            # Обрабатывается только то, что еще ожидает: заявку, обработанную параллельно, не затронет
             cursor = await db.execute(
-                'SELECT user_id, amount FROM withdrawals WHERE id = ? AND status = "pending"',
-                (request_id,)
+                f'UPDATE withdrawals SET status = ?, processed_at = CURRENT_TIMESTAMP '
+                f'WHERE id IN ({selection}) RETURNING id, user_id, amount',
+                [status, *params]
             )
-            row = await cursor.fetchone()
+            rows = await cursor.fetchall()
             
-            if row:
-                user_id, amount = row
-                
-                # Вернуть средства
-                await db.execute(
-                    'UPDATE users SET balance = balance + ? WHERE user_id = ?',
-                    (amount, user_id)
-                )
-                
-                await db.execute(
-                    'UPDATE withdrawals SET status = "rejected", processed_at = CURRENT_TIMESTAMP WHERE id = ?',
-                    (request_id,)
-                )
-                
-                await db.commit()
-                
-                return {'user_id': user_id, 'amount': amount}
+            if status != 'rejected' or not rows:
+                return rows, []
+            
+            # Возврат средств: одно обновление на всех пользователей пачки
+            refunds = {}
+            for row in rows:
+                refunds[row['user_id']] = refunds.get(row['user_id'], 0) + row['amount']
+            
+            cursor = await db.execute(
+                f'UPDATE users SET balance = balance + refunds.amount, {BALANCE_VERSION} '
+                f"FROM (SELECT json_extract(value, '$[0]') AS user_id, json_extract(value, '$[1]') AS amount "
+                f'FROM json_each(?)) AS refunds '
+                f'WHERE users.user_id = refunds.user_id '
+                f'RETURNING users.user_id, balance, ref_balance, balance_version',
+                (json.dumps(list(refunds.items())),)
+            )
+            return rows, await cursor.fetchall()
         
-        return None
+        rows, balance_rows = await self.writer.submit(write)
+        
+        for user_id, *balance_row in balance_rows:
+            self.balances.put(user_id, *balance_row)
+        
+        return [{'id': row['id'], 'user_id': row['user_id'], 'amount': row['amount']} for row in rows]
     
     async def transfer_ref_balance(self, user_id):
         """Перевод реферального баланса на основной"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async def write(db):
             cursor = await db.execute(
                 'SELECT ref_balance FROM users WHERE user_id = ?',
                 (user_id,)
             )
             row = await cursor.fetchone()
             
-            if row and row[0] >= 3:
-                ref_balance = row[0]
-                
-                await db.execute(
-                    'UPDATE users SET balance = balance + ?, ref_balance = 0 WHERE user_id = ?',
-                    (ref_balance, user_id)
-                )
-                await db.commit()
-                
-                return ref_balance
+            if not row or row[0] < 3:
+                return 0, None
+            
+            cursor = await db.execute(
+                f'UPDATE users SET balance = balance + ?, ref_balance = 0, {BALANCE_VERSION} '
+                f'WHERE user_id = ? {RETURNING_BALANCE}',
+                (row[0], user_id)
+            )
+            balance_row = await cursor.fetchone()
+            await cursor.close()
+            return row[0], balance_row
         
-        return 0
+        ref_balance, balance_row = await self.writer.submit(write)
+        
+        if balance_row:
+            self.balances.put(user_id, *balance_row)
+        return ref_balance
     
     async def get_user_info(self, user_id):
         """Получение информации о пользователе"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.pool.connection() as db:
             cursor = await db.execute(
                 'SELECT * FROM users WHERE user_id = ?',
                 (user_id,)
@@ -333,116 +396,568 @@ class DatabaseManager:
         
         return None
     
-    async def get_user_referrals(self, user_id):
-        """Получение списка рефералов"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+    async def get_user_referrals(self, user_id, limit=20, before=None):
+        """Страница рефералов, новые первыми; before - user_id последнего реферала предыдущей страницы"""
+        condition = 'referred_by = ?' if before is None else 'referred_by = ? AND user_id < ?'
+        params = (user_id,) if before is None else (user_id, before)
+        
+        async with self.pool.connection() as db:
             cursor = await db.execute(
-                'SELECT user_id, username, total_deposits, created_at FROM users WHERE referred_by = ?',
-                (user_id,)
+                'SELECT user_id, username, first_name, total_deposits, ref_bonus_paid AS earned, created_at '
+                f'FROM users WHERE {condition} ORDER BY user_id DESC LIMIT ?',
+                (*params, limit)
             )
             rows = await cursor.fetchall()
             
             return [dict(row) for row in rows]
     
-    async def get_admin_stats(self):
-        """Получение статистики для админа"""
-        async with aiosqlite.connect(self.db_path) as db:
-            # Всего пользователей
-            cursor = await db.execute('SELECT COUNT(*) FROM users')
-            total_users = (await cursor.fetchone())[0]
-            
-            # Онлайн (активность за последние 5 минут)
+    async def get_referral_summary(self, user_id):
+        """Реферальные итоги пользователя из агрегатов: число рефералов, заработок всего и за 30 дней"""
+        async with self.pool.connection() as db:
             cursor = await db.execute(
-                'SELECT COUNT(*) FROM users WHERE last_activity > datetime("now", "-5 minutes")'
+                'SELECT referrals_count, ref_earned, ref_percent, '
+                '(SELECT COALESCE(SUM(amount), 0) FROM referral_earnings_daily '
+                'WHERE referrer_id = users.user_id AND day >= date("now", "-30 days")) '
+                'FROM users WHERE user_id = ?',
+                (user_id,)
             )
-            online_now = (await cursor.fetchone())[0]
+            row = await cursor.fetchone()
+        
+        if not row:
+            return {'referrals_count': 0, 'total_earned': 0, 'earned_30d': 0, 'ref_percent': 0}
+        
+        return {'referrals_count': row[0], 'total_earned': row[1], 'earned_30d': row[3], 'ref_percent': row[2]}
+    
+    async def get_activity_since(self, since):
+        """Пользователи, активные начиная с момента since (для восстановления онлайна)"""
+        await self.activity.flush()
+        
+        async with self.pool.connection() as db:
+            cursor = await db.execute(
+                'SELECT user_id, last_activity FROM users WHERE last_activity >= ?',
+                (since,)
+            )
+            rows = await cursor.fetchall()
             
-            # Новые за 24 часа
+            return [(row[0], row[1]) for row in rows]
+    
+    async def get_admin_stats(self):
+        """Получение статистики для админа (чтение материализованных счетчиков)"""
+        return summarize_stats(await self.get_stats_counters())
+    
+    async def get_stats_counters(self):
+        """Все счетчики статистики, кроме часовых корзин новых пользователей старше суток"""
+        async with self.pool.connection() as db:
             cursor = await db.execute(
-                'SELECT COUNT(*) FROM users WHERE created_at > datetime("now", "-1 day")'
+                'SELECT name, value FROM stats_counters WHERE name < ? '
+                'UNION ALL SELECT name, value FROM stats_counters WHERE name >= ?',
+                (NEW_USERS_PREFIX, new_users_cutoff())
             )
-            new_24h = (await cursor.fetchone())[0]
+            return {row[0]: row[1] for row in await cursor.fetchall()}
+    
+    async def reconcile_stats_counters(self):
+        """Пересчитать счетчики статистики с нуля; расхождения {имя: (было, стало)}"""
+        # Транзакция писателя: счетчики и таблицы читаются в одном состоянии
+        async def write(db):
+            cursor = await db.execute('SELECT name, value FROM stats_counters')
+            before = {row[0]: row[1] for row in await cursor.fetchall()}
+            
+            await rebuild_stats_counters(db)
             
-            # Всего пополнено
-            cursor = await db.execute('SELECT COALESCE(SUM(amount), 0) FROM deposits')
-            total_deposits = (await cursor.fetchone())[0]
+            cursor = await db.execute('SELECT name, value FROM stats_counters')
+            after = {row[0]: row[1] for row in await cursor.fetchall()}
+            return before, after
+        
+        before, after = await self.writer.submit(write)
+        
+        # Старые часовые корзины удаляются пересчетом и расхождением не считаются
+        cutoff = new_users_cutoff()
+        return {
+            name: (before.get(name, 0), after.get(name, 0))
+            for name in sorted(before.keys() | after.keys())
+            if abs(before.get(name, 0) - after.get(name, 0)) > 1e-9
+            and not (name.startswith(NEW_USERS_PREFIX) and name < cutoff)
+        }
+    
+    async def load_leaderboard(self):
+        """Однократная загрузка лидерборда в память"""
+        if self._leaderboard_lock is None:
+            self._leaderboard_lock = asyncio.Lock()
+        
+        async with self._leaderboard_lock:
+            if self.leaderboard.loaded:
+                return
             
-            return {
-                'total_users': total_users,
-                'online_now': online_now,
-                'new_24h': new_24h,
-                'total_deposits': total_deposits
-            }
+            self.leaderboard = build_leaderboard(*await self.fetch_leaderboard_rows())
     
-    async def get_leaderboard(self, limit=35):
-        """Получение лидерборда"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+    async def fetch_leaderboard_rows(self):
+        """Исходные данные лидерборда: (пользователи, выигрыши за все время, события за 7 дней)"""
+        since = leaderboard_since()
+        
+        async with self.pool.connection() as db:
             cursor = await db.execute(
-                'SELECT user_id, username, first_name, total_deposits FROM users ORDER BY total_deposits DESC LIMIT ?',
-                (limit,)
+                'SELECT user_id, username, first_name, total_deposits FROM users'
             )
-            rows = await cursor.fetchall()
+            users = await cursor.fetchall()
             
-            return [dict(row) for row in rows]
+            # Пополнения за последние 7 дней для окон "день" и "неделя"
+            cursor = await db.execute(
+                'SELECT user_id, amount, created_at FROM deposits WHERE created_at >= ? ORDER BY created_at',
+                (since,)
+            )
+            events = list(await cursor.fetchall())
+            
+            game_wins = []
+            if self.leaderboard_game_wins:
+                cursor = await db.execute(
+                    'SELECT user_id, SUM(win_amount - bet_amount) FROM gift_upgrade_games '
+                    'WHERE result = "win" GROUP BY user_id'
+                )
+                game_wins = await cursor.fetchall()
+                
+                cursor = await db.execute(
+                    'SELECT user_id, win_amount - bet_amount, created_at FROM gift_upgrade_games '
+                    'WHERE created_at >= ? AND result = "win"',
+                    (since,)
+                )
+                events.extend(await cursor.fetchall())
+        
+        return users, game_wins, events
+    
+    async def get_leaderboard(self, limit=35, window='all'):
+        """Получение лидерборда (из памяти)"""
+        if not self.leaderboard.loaded:
+            await self.load_leaderboard()
+        
+        return self.leaderboard.top(window, limit)
+    
+    async def get_leaderboard_rank(self, user_id, window='all'):
+        """Место пользователя в лидерборде"""
+        if not self.leaderboard.loaded:
+            await self.load_leaderboard()
+        
+        return self.leaderboard.rank(user_id, window)
     
     async def add_game_played(self, user_id):
         """Увеличить счетчик игр"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async def write(db):
             await db.execute(
                 'UPDATE users SET games_played = games_played + 1 WHERE user_id = ?',
                 (user_id,)
             )
-            await db.commit()
+        
+        await self.writer.submit(write)
     
-    async def get_inventory(self, user_id):
-        """Получение инвентаря пользователя"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+    async def settle_gift_upgrade(self, user_id, bet_amount, multiplier, is_win):
+        """Расчет игры Gift Upgrade одной транзакцией"""
+        # Отрицательная ставка прошла бы проверку баланса и увеличила его
+        if not (math.isfinite(bet_amount) and bet_amount > 0 and math.isfinite(multiplier) and multiplier >= 1):
+            raise ValueError(f"Invalid Gift Upgrade bet: {bet_amount} x{multiplier}")
+        
+        win_amount = bet_amount * multiplier if is_win else 0
+        result = 'win' if is_win else 'loss'
+        
+        async def write(db):
+            # Списание/начисление только при достаточном балансе
             cursor = await db.execute(
-                'SELECT * FROM inventory WHERE user_id = ?',
-                (user_id,)
+                f'UPDATE users SET balance = balance + ?, games_played = games_played + 1, {BALANCE_VERSION} '
+                f'WHERE user_id = ? AND balance >= ? {RETURNING_BALANCE}',
+                (win_amount - bet_amount, user_id, bet_amount)
+            )
+            row = await cursor.fetchone()
+            await cursor.close()
+            
+            if not row:
+                return None
+            
+            cursor = await db.execute(
+                'INSERT INTO gift_upgrade_games (user_id, bet_amount, multiplier, win_amount, result) VALUES (?, ?, ?, ?, ?) '
+                'RETURNING id, created_at',
+                (user_id, bet_amount, multiplier, win_amount, result)
+            )
+            game = await cursor.fetchone()
+            await cursor.close()
+            return row, game
+        
+        settled = await self.writer.submit(write)
+        if not settled:
+            return None
+        
+        row, (game_id, created_at) = settled
+        self.balances.put(user_id, *row)
+        self.gift_upgrade_history.record(user_id, {
+            'id': game_id,
+            'bet_amount': bet_amount,
+            'multiplier': multiplier,
+            'win_amount': win_amount,
+            'result': result,
+            'created_at': created_at,
+        })
+        
+        if is_win and self.leaderboard_game_wins and self.leaderboard.loaded:
+            self.leaderboard.record(user_id, win_amount - bet_amount)
+        
+        return {'result': result, 'win_amount': win_amount, 'balance': row[0]}
+    
+    async def get_gift_upgrade_history(self, user_id, limit=10, before_id=None):
+        """История Gift Upgrade, новые первыми; последние игры - из буфера в памяти"""
+        recent = self.gift_upgrade_history
+        if before_id is None and limit <= recent.per_user:
+            games = recent.get(user_id, limit)
+            if games is not None:
+                return games
+            
+            generation = recent.begin_load(user_id)
+            games = None
+            try:
+                games = await self._fetch_gift_upgrade_games(user_id, recent.per_user)
+            finally:
+                recent.finish_load(user_id, generation, games)
+            return games[:limit]
+        
+        return await self._fetch_gift_upgrade_games(user_id, limit, before_id)
+    
+    async def _fetch_gift_upgrade_games(self, user_id, limit, before_id=None):
+        condition = 'user_id = ?' if before_id is None else 'user_id = ? AND id < ?'
+        params = (user_id,) if before_id is None else (user_id, before_id)
+        
+        async with self.pool.connection() as db:
+            cursor = await db.execute(
+                'SELECT id, bet_amount, multiplier, win_amount, result, created_at FROM gift_upgrade_games '
+                f'WHERE {condition} ORDER BY id DESC LIMIT ?',
+                (*params, limit)
+            )
+            rows = await cursor.fetchall()
+            
+            return [dict(row) for row in rows]
+    
+    async def get_last_rolls_game_number(self):
+        """Номер последнего начатого раунда Rolls (разыгранного или со ставками)
+
+        Номера раундов, ставки которых были возвращены, повторно не используются."""
+        async with self.pool.connection() as db:
+            cursor = await db.execute(
+                'SELECT game_number FROM rolls_games ORDER BY id DESC LIMIT 1'
+            )
+            row = await cursor.fetchone()
+            
+            cursor = await db.execute('SELECT MAX(game_number) FROM rolls_bets')
+            last_bet = (await cursor.fetchone())[0]
+            
+            return max(row[0] if row else 0, last_bet or 0)
+    
+    async def get_rolls_history(self, limit=100):
+        """Последние результаты Rolls (новые первыми)"""
+        async with self.pool.connection() as db:
+            cursor = await db.execute(
+                'SELECT game_number, winning_color FROM rolls_games ORDER BY id DESC LIMIT ?',
+                (limit,)
+            )
+            rows = await cursor.fetchall()
+            
+            return [dict(row) for row in rows]
+    
+    async def get_rolls_bets(self, game_number):
+        """Ставки раунда Rolls"""
+        async with self.pool.connection() as db:
+            cursor = await db.execute(
+                'SELECT user_id, bet_color AS color, bet_amount AS amount, win_amount FROM rolls_bets WHERE game_number = ?',
+                (game_number,)
             )
             rows = await cursor.fetchall()
             
             return [dict(row) for row in rows]
     
+    async def place_rolls_bet(self, user_id, game_number, color, amount):
+        """Ставка в Rolls: списание и запись одной транзакцией; None - недостаточно средств"""
+        async def write(db):
+            cursor = await db.execute(
+                f'UPDATE users SET balance = balance - ?, {BALANCE_VERSION} '
+                f'WHERE user_id = ? AND balance >= ? {RETURNING_BALANCE}',
+                (amount, user_id, amount)
+            )
+            row = await cursor.fetchone()
+            await cursor.close()
+            
+            if row:
+                await db.execute(
+                    'INSERT INTO rolls_bets (user_id, game_number, bet_color, bet_amount) VALUES (?, ?, ?, ?)',
+                    (user_id, game_number, color, amount)
+                )
+            
+            return row
+        
+        row = await self.writer.submit(write)
+        if not row:
+            return None
+        
+        self.balances.put(user_id, *row)
+        return row[0]
+    
+    async def settle_rolls_round(self, game_number, winning_color, multiplier):
+        """Расчет всех ставок раунда одной транзакцией, независимо от их количества"""
+        async def write(db):
+            await db.execute(
+                'INSERT INTO rolls_games (game_number, winning_color) VALUES (?, ?)',
+                (game_number, winning_color)
+            )
+            
+            await db.execute(
+                'UPDATE rolls_bets SET win_amount = CASE WHEN bet_color = ? THEN bet_amount * ? ELSE 0 END '
+                'WHERE game_number = ?',
+                (winning_color, multiplier, game_number)
+            )
+            
+            # Зачисление выигрышей всем победителям одним запросом
+            cursor = await db.execute(
+                f'UPDATE users SET balance = balance + wins.total, {BALANCE_VERSION} '
+                'FROM (SELECT user_id, SUM(win_amount) AS total FROM rolls_bets '
+                'WHERE game_number = ? AND bet_color = ? GROUP BY user_id) AS wins '
+                f'WHERE users.user_id = wins.user_id RETURNING users.user_id, balance, ref_balance, balance_version',
+                (game_number, winning_color)
+            )
+            updated = await cursor.fetchall()
+            
+            cursor = await db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(win_amount), 0) FROM rolls_bets WHERE game_number = ? AND bet_color = ?',
+                (game_number, winning_color)
+            )
+            winners, paid = await cursor.fetchone()
+            return updated, winners, paid
+        
+        updated, winners, paid = await self.writer.submit(write)
+        
+        for row in updated:
+            self.balances.put(*row)
+        
+        return {'winners': winners, 'paid': paid, 'balances': {row[0]: row[1] for row in updated}}
+    
+    async def refund_rolls_bets(self, game_number=None):
+        """Вернуть нерассчитанные ставки раунда game_number (None - всех раундов)"""
+        round_filter = '' if game_number is None else 'AND game_number = ? '
+        params = () if game_number is None else (game_number,)
+        
+        async def write(db):
+            cursor = await db.execute(
+                f'UPDATE users SET balance = balance + refunds.total, {BALANCE_VERSION} '
+                'FROM (SELECT user_id, SUM(bet_amount) AS total FROM rolls_bets '
+                f'WHERE win_amount IS NULL {round_filter}GROUP BY user_id) AS refunds '
+                'WHERE users.user_id = refunds.user_id RETURNING users.user_id, balance, ref_balance, balance_version',
+                params
+            )
+            updated = await cursor.fetchall()
+            
+            # Возврат отмечается выигрышем, равным ставке
+            cursor = await db.execute(
+                f'UPDATE rolls_bets SET win_amount = bet_amount WHERE win_amount IS NULL {round_filter}',
+                params
+            )
+            return updated, cursor.rowcount
+        
+        updated, refunded = await self.writer.submit(write)
+        
+        for row in updated:
+            self.balances.put(*row)
+        
+        return {'refunded': refunded, 'balances': {row[0]: row[1] for row in updated}}
+    
+    def _inventory_filter(self, user_id, item_ids=None, item_type=None, min_value=None, max_value=None):
+        conditions = ['user_id = ?']
+        params = [user_id]
+        
+        if item_ids is not None:
+            conditions.append('id IN (SELECT value FROM json_each(?))')
+            params.append(json.dumps([int(item_id) for item_id in item_ids]))
+        if item_type is not None:
+            conditions.append('item_type = ?')
+            params.append(item_type)
+        if min_value is not None:
+            conditions.append('item_value >= ?')
+            params.append(min_value)
+        if max_value is not None:
+            conditions.append('item_value <= ?')
+            params.append(max_value)
+        
+        return conditions, params
+    
+    async def count_inventory(self, user_id, item_type=None, min_value=None, max_value=None):
+        """Количество предметов пользователя с теми же фильтрами, что у страницы (по индексу, без чтения строк)"""
+        conditions, params = self._inventory_filter(user_id, None, item_type, min_value, max_value)
+        async with self.pool.connection() as db:
+            cursor = await db.execute(f'SELECT COUNT(*) FROM inventory WHERE {" AND ".join(conditions)}', params)
+            row = await cursor.fetchone()
+            return row[0]
+    
+    async def get_inventory_page(self, user_id, limit=50, after=None, sort='acquired_at', order='desc',
+                                 item_type=None, min_value=None, max_value=None, fields=INVENTORY_FIELDS):
+        """Страница инвентаря по ключу (sort, id); after - ключ последнего предмета предыдущей страницы"""
+        if sort not in INVENTORY_SORTS or order not in ('asc', 'desc'):
+            raise ValueError(f"Invalid inventory sort: {sort} {order}")
+        
+        columns = [field for field in INVENTORY_FIELDS if field in fields or field in ('id', sort)]
+        conditions, params = self._inventory_filter(user_id, None, item_type, min_value, max_value)
+        
+        if after is not None:
+            conditions.append(f'({sort}, id) {"<" if order == "desc" else ">"} (?, ?)')
+            params.extend(after)
+        
+        params.append(limit + 1)
+        
+        async with self.pool.connection() as db:
+            cursor = await db.execute(
+                f'SELECT {", ".join(columns)} FROM inventory WHERE {" AND ".join(conditions)} '
+                f'ORDER BY {sort} {order}, id {order} LIMIT ?',
+                params
+            )
+            rows = await cursor.fetchall()
+        
+        # Лишняя строка показывает, есть ли следующая страница
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        return {
+            'items': [{field: row[field] for field in fields} for row in rows],
+            'next': (rows[-1][sort], rows[-1]['id']) if has_more else None,
+        }
+    
+    async def iter_inventory(self, user_id, batch_size=500, **filters):
+        """Весь инвентарь пачками по batch_size; соединение не удерживается между пачками"""
+        after = None
+        while True:
+            page = await self.get_inventory_page(user_id, limit=batch_size, after=after, **filters)
+            if page['items']:
+                yield page['items']
+            if page['next'] is None:
+                return
+            after = page['next']
+    
+    async def get_user_ids(self, after=0, limit=1000):
+        """user_id по возрастанию, больше after"""
+        async with self.pool.connection() as db:
+            cursor = await db.execute(
+                'SELECT user_id FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?',
+                (after, limit)
+            )
+            return [row[0] for row in await cursor.fetchall()]
+    
+    async def iter_user_ids(self, after=0, batch_size=1000):
+        """Все user_id после after пачками по batch_size; соединение не удерживается между пачками"""
+        while True:
+            user_ids = await self.get_user_ids(after, batch_size)
+            if not user_ids:
+                return
+            yield user_ids
+            after = user_ids[-1]
+    
     async def add_to_inventory(self, user_id, item_name, item_value, item_type):
         """Добавление предмета в инвентарь"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async def write(db):
             await db.execute(
                 'INSERT INTO inventory (user_id, item_name, item_value, item_type) VALUES (?, ?, ?, ?)',
                 (user_id, item_name, item_value, item_type)
             )
-            await db.commit()
+        
+        await self.writer.submit(write)
     
     async def sell_inventory_item(self, item_id, user_id):
         """Продажа предмета из инвентаря"""
-        async with aiosqlite.connect(self.db_path) as db:
+        sold = await self.sell_items(user_id, item_ids=[item_id])
+        return sold['total_value']
+    
+    async def sell_items(self, user_id, item_ids=None, item_type=None, min_value=None, max_value=None):
+        """Продажа предметов одной транзакцией: все (item_ids=None) или выбранные, с фильтром по типу и стоимости"""
+        conditions, params = self._inventory_filter(user_id, item_ids, item_type, min_value, max_value)
+        
+        async def write(db):
+            # Зачисляется только то, что удалено этим запросом: предмет, проданный
+            # параллельно, сюда уже не попадет
             cursor = await db.execute(
-                'SELECT item_value FROM inventory WHERE id = ? AND user_id = ?',
-                (item_id, user_id)
+                f'DELETE FROM inventory WHERE {" AND ".join(conditions)} RETURNING item_value',
+                params
+            )
+            values = [row[0] for row in await cursor.fetchall()]
+            
+            # Нечего продавать - баланс и его версия не меняются
+            if not values:
+                return values, None
+            
+            cursor = await db.execute(
+                f'UPDATE users SET balance = balance + ?, {BALANCE_VERSION} WHERE user_id = ? {RETURNING_BALANCE}',
+                (sum(values), user_id)
             )
             row = await cursor.fetchone()
+            await cursor.close()
+            return values, row
+        
+        values, row = await self.writer.submit(write)
+        
+        if row:
+            self.balances.put(user_id, *row)
+            balance = row[0]
+        else:
+            balance = (await self.get_balance(user_id))['balance']
+        
+        return {'count': len(values), 'total_value': sum(values), 'balance': balance}
+    
+    async def open_cases(self, user_id, case_name, price, rewards, cooldown=None):
+        """Открытие пачки кейсов одной транзакцией; None - недостаточно средств или кейс на перезарядке"""
+        total_price = price * len(rewards)
+        ton_won = sum(reward['value'] for reward in rewards if reward.get('type') != 'nft')
+        nfts = [reward for reward in rewards if reward.get('type') == 'nft']
+        
+        async def write(db):
+            if cooldown:
+                # Перезарядка не прошла - ничего не пишется
+                cursor = await db.execute(
+                    'SELECT 1 FROM free_case_claims WHERE user_id = ? AND last_claim > datetime("now", ?)',
+                    (user_id, f'-{cooldown} seconds')
+                )
+                if await cursor.fetchone():
+                    return None
             
-            if row:
-                item_value = row[0]
-                
-                await db.execute('DELETE FROM inventory WHERE id = ?', (item_id,))
+            # Списание стоимости и зачисление TON-наград одним запросом
+            cursor = await db.execute(
+                f'UPDATE users SET balance = balance - ? + ?, {BALANCE_VERSION} '
+                f'WHERE user_id = ? AND balance >= ? {RETURNING_BALANCE}',
+                (total_price, ton_won, user_id, total_price)
+            )
+            row = await cursor.fetchone()
+            await cursor.close()
+            
+            if not row:
+                return None
+            
+            if cooldown:
+                # Проверка и отметка идут в одной операции писателя, поэтому гонки между ними нет
                 await db.execute(
-                    'UPDATE users SET balance = balance + ? WHERE user_id = ?',
-                    (item_value, user_id)
+                    'INSERT INTO free_case_claims (user_id, last_claim) VALUES (?, CURRENT_TIMESTAMP) '
+                    'ON CONFLICT(user_id) DO UPDATE SET last_claim = CURRENT_TIMESTAMP',
+                    (user_id,)
                 )
-                await db.commit()
-                
-                return item_value
+            
+            await db.executemany(
+                'INSERT INTO case_openings (user_id, case_name, case_price, reward_name, reward_value) VALUES (?, ?, ?, ?, ?)',
+                [(user_id, case_name, price, reward['name'], reward['value']) for reward in rewards]
+            )
+            
+            if nfts:
+                await db.executemany(
+                    'INSERT INTO inventory (user_id, item_name, item_value, item_type) VALUES (?, ?, ?, ?)',
+                    [(user_id, reward['name'], reward['value'], 'nft') for reward in nfts]
+                )
+            
+            return row
         
-        return 0
+        row = await self.writer.submit(write)
+        if not row:
+            return None
+        
+        self.balances.put(user_id, *row)
+        return {'total_price': total_price, 'ton_won': ton_won, 'balance': row[0]}
     
     async def can_claim_free_case(self, user_id):
         """Проверка возможности открыть бесплатный кейс"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.connection() as db:
             cursor = await db.execute(
                 'SELECT last_claim FROM free_case_claims WHERE user_id = ?',
                 (user_id,)
@@ -459,9 +974,79 @@ class DatabaseManager:
     
     async def claim_free_case(self, user_id):
         """Отметка об открытии бесплатного кейса"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async def write(db):
             await db.execute(
                 'INSERT OR REPLACE INTO free_case_claims (user_id, last_claim) VALUES (?, CURRENT_TIMESTAMP)',
                 (user_id,)
             )
-            await db.commit()
+        
+        await self.writer.submit(write)
+    
+    async def enqueue_notifications(self, notifications):
+        """Добавить уведомления [(chat_id, kind, payload)] в outbox одной операцией"""
+        now = time.time()
+        
+        async def write(db):
+            await db.executemany(
+                'INSERT INTO notification_outbox (chat_id, kind, payload, next_attempt_at) VALUES (?, ?, ?, ?)',
+                [(chat_id, kind, json.dumps(payload), now) for chat_id, kind, payload in notifications]
+            )
+        
+        await self.writer.submit(write)
+    
+    async def get_due_notifications(self, now, limit=100):
+        """Уведомления, время отправки которых наступило (старые первыми)"""
+        async with self.pool.connection() as db:
+            cursor = await db.execute(
+                'SELECT id, chat_id, kind, payload, attempts FROM notification_outbox '
+                'WHERE next_attempt_at IS NOT NULL AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?',
+                (now, limit)
+            )
+            rows = await cursor.fetchall()
+            
+            return [dict(row, payload=json.loads(row['payload'])) for row in rows]
+    
+    async def complete_notifications(self, ids):
+        """Удалить отправленные уведомления"""
+        async def write(db):
+            await db.executemany('DELETE FROM notification_outbox WHERE id = ?', [(id,) for id in ids])
+        
+        await self.writer.submit(write)
+    
+    async def reschedule_notifications(self, schedule, failed=False):
+        """Перенести отправку [(id, next_attempt_at, ошибка)]; failed - засчитать попытку"""
+        async def write(db):
+            await db.executemany(
+                'UPDATE notification_outbox SET next_attempt_at = ?, last_error = COALESCE(?, last_error), '
+                'attempts = attempts + ? WHERE id = ?',
+                [(next_attempt_at, error, int(failed), id) for id, next_attempt_at, error in schedule]
+            )
+        
+        await self.writer.submit(write)
+    
+    async def create_broadcast(self, text):
+        """Новая рассылка; ее id"""
+        async def write(db):
+            cursor = await db.execute('INSERT INTO broadcasts (text) VALUES (?)', (text,))
+            return cursor.lastrowid
+        
+        return await self.writer.submit(write)
+    
+    async def get_running_broadcasts(self):
+        """Незавершенные рассылки (для продолжения после перезапуска)"""
+        async with self.pool.connection() as db:
+            cursor = await db.execute(
+                "SELECT id, text, last_user_id, sent, failed, blocked FROM broadcasts WHERE status = 'running' ORDER BY id"
+            )
+            return [dict(row) for row in await cursor.fetchall()]
+    
+    async def checkpoint_broadcast(self, broadcast_id, last_user_id, sent, failed, blocked, status='running'):
+        """Сохранить прогресс рассылки; status - 'running', 'done', 'cancelled' или 'failed'"""
+        async def write(db):
+            await db.execute(
+                'UPDATE broadcasts SET last_user_id = ?, sent = ?, failed = ?, blocked = ?, status = ?, '
+                "finished_at = CASE WHEN ? = 'running' THEN NULL ELSE CURRENT_TIMESTAMP END WHERE id = ?",
+                (last_user_id, sent, failed, blocked, status, status, broadcast_id)
+            )
+        
+        await self.writer.submit(write)
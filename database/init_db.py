@@ -10,9 +10,12 @@ from database.db_manager import DatabaseManager
 async def main():
     print("🔧 Инициализация базы данных...")
     db = DatabaseManager()
-    await db.init_database()
-    print("✅ База данных успешно создана!")
-    print("📊 Создано таблиц: users, gift_upgrade_games, rolls_games, rolls_bets, case_openings, inventory, deposits, withdrawals, free_case_claims")
+    applied = await db.init_database()
+    await db.close()
+    if applied:
+        print(f"✅ Применены миграции: {', '.join(map(str, applied))}")
+    else:
+        print("✅ Схема базы данных уже актуальна")
 
 if __name__ == '__main__':
     asyncio.run(main())
@@ -0,0 +1,162 @@
+"""
+Лидерборд в памяти с окнами за день, неделю и все время
+"""
+import time
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
+
+SQLITE_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+DAY_SECONDS = 86400
+WEEK_DAYS = 7
+
+WINDOWS = ('all', 'week', 'day')
+
+
+def parse_timestamp(value):
+    """Время SQLite (CURRENT_TIMESTAMP, UTC) -> unix time"""
+    return datetime.strptime(value, SQLITE_TIME_FORMAT).replace(tzinfo=timezone.utc).timestamp()
+
+
+class RankedBoard:
+    """Очки пользователей и упорядоченный список: топ и ранг без полной сортировки"""
+
+    def __init__(self, keep_empty=False):
+        self.keep_empty = keep_empty
+        self._scores = {}
+        self._order = []  # (-очки, user_id) по возрастанию
+
+    def add(self, user_id, delta):
+        old = self._scores.get(user_id)
+        if old is not None:
+            del self._order[bisect_left(self._order, (-old, user_id))]
+
+        score = (old or 0) + delta
+        if score <= 1e-9 and not self.keep_empty:
+            self._scores.pop(user_id, None)
+            return
+
+        self._scores[user_id] = score
+        insort(self._order, (-score, user_id))
+
+    def top(self, limit):
+        return [(user_id, -neg_score) for neg_score, user_id in self._order[:limit]]
+
+    def rank(self, user_id):
+        score = self._scores.get(user_id)
+        if score is None:
+            return None, 0
+        return bisect_left(self._order, (-score, user_id)) + 1, score
+
+    def __len__(self):
+        return len(self._order)
+
+
+class Leaderboard:
+    """Топ по пополнениям: все время + скользящие окна по дневным корзинам"""
+
+    def __init__(self):
+        self.loaded = False
+        self._profiles = {}   # user_id -> (username, first_name)
+        self._days = {}       # номер дня -> {user_id: сумма за день}
+        self._day = None
+        self._boards = {
+            'all': RankedBoard(keep_empty=True),
+            'week': RankedBoard(),
+            'day': RankedBoard(),
+        }
+
+    def _roll(self, now):
+        """Сдвинуть окна при смене дня (UTC)"""
+        day = int(now // DAY_SECONDS)
+        if self._day is not None and day <= self._day:
+            return
+
+        week = self._boards['week']
+        for old in [d for d in self._days if d <= day - WEEK_DAYS]:
+            for user_id, amount in self._days.pop(old).items():
+                week.add(user_id, -amount)
+
+        today = RankedBoard()
+        for user_id, amount in self._days.get(day, {}).items():
+            today.add(user_id, amount)
+        self._boards['day'] = today
+
+        self._day = day
+
+    def set_profile(self, user_id, username, first_name):
+        """Имя пользователя для выдачи; новый пользователь попадает в общий рейтинг с нулем"""
+        self._profiles[user_id] = (username, first_name)
+        if self._boards['all'].rank(user_id)[0] is None:
+            self._boards['all'].add(user_id, 0)
+
+    def add_all_time(self, user_id, amount):
+        """Добавить к общему рейтингу без учета в окнах (загрузка накопленных сумм)"""
+        self._boards['all'].add(user_id, amount)
+
+    def record(self, user_id, amount, now=None, windows_only=False):
+        """Учесть пополнение (или выигрыш) пользователя"""
+        now = time.time() if now is None else now
+        self._roll(now)
+
+        day = int(now // DAY_SECONDS)
+        if day <= self._day - WEEK_DAYS:
+            if not windows_only:
+                self._boards['all'].add(user_id, amount)
+            return
+
+        bucket = self._days.setdefault(day, {})
+        bucket[user_id] = bucket.get(user_id, 0) + amount
+
+        self._boards['week'].add(user_id, amount)
+        if day == self._day:
+            self._boards['day'].add(user_id, amount)
+        if not windows_only:
+            self._boards['all'].add(user_id, amount)
+
+    def top(self, window='all', limit=35, now=None):
+        """Топ пользователей в окне"""
+        self._roll(time.time() if now is None else now)
+
+        result = []
+        for user_id, score in self._boards[window].top(limit):
+            username, first_name = self._profiles.get(user_id, (None, None))
+            result.append({
+                'user_id': user_id,
+                'username': username,
+                'first_name': first_name,
+                'total_deposits': score,
+            })
+        return result
+
+    def rank(self, user_id, window='all', now=None):
+        """Место пользователя в окне"""
+        self._roll(time.time() if now is None else now)
+
+        board = self._boards[window]
+        rank, score = board.rank(user_id)
+        return {'rank': rank, 'score': score, 'total': len(board)}
+
+
+def leaderboard_since(now=None):
+    """Начало самого старого дня, входящего в окно "неделя" (время SQLite)"""
+    now = time.time() if now is None else now
+    return datetime.utcfromtimestamp((int(now // DAY_SECONDS) - WEEK_DAYS + 1) * DAY_SECONDS).strftime(SQLITE_TIME_FORMAT)
+
+
+def build_leaderboard(users, game_wins, events):
+    """Лидерборд из исходных строк: (user_id, username, first_name, total_deposits),
+    (user_id, выигрыш за все время) и события (user_id, сумма, created_at) за последние 7 дней"""
+    leaderboard = Leaderboard()
+
+    for user_id, username, first_name, total_deposits in users:
+        leaderboard.set_profile(user_id, username, first_name)
+        leaderboard.add_all_time(user_id, total_deposits or 0)
+
+    for user_id, won in game_wins:
+        leaderboard.add_all_time(user_id, won or 0)
+
+    for user_id, amount, created_at in sorted(events, key=lambda row: row[2]):
+        leaderboard.record(user_id, amount, now=parse_timestamp(created_at), windows_only=True)
+
+    leaderboard.loaded = True
+    return leaderboard
@@ -0,0 +1,294 @@
+"""
+Версионные миграции схемы базы данных
+"""
+
+# Упорядоченный список миграций: (версия, название, шаги).
+# Шаг - SQL-строка или async-функция, принимающая соединение.
+# Уже примененные версии хранятся в таблице schema_version и не выполняются повторно.
+from database.stats_counters import CREATE_TABLE as CREATE_STATS_COUNTERS, TRIGGERS as STATS_TRIGGERS, \
+    rebuild_stats_counters
+
+MIGRATIONS = [
+    (1, 'base schema', [
+        # Таблица пользователей
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            first_name TEXT,
+            balance REAL DEFAULT 0,
+            ref_balance REAL DEFAULT 0,
+            total_deposits REAL DEFAULT 0,
+            games_played INTEGER DEFAULT 0,
+            ref_percent INTEGER DEFAULT 10,
+            referred_by INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        # Таблица игр Gift Upgrade
+        '''
+        CREATE TABLE IF NOT EXISTS gift_upgrade_games (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            bet_amount REAL,
+            multiplier REAL,
+            win_amount REAL,
+            result TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+        ''',
+        # Таблица игр Rolls
+        '''
+        CREATE TABLE IF NOT EXISTS rolls_games (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            game_number INTEGER,
+            winning_color TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        # Таблица ставок в Rolls
+        '''
+        CREATE TABLE IF NOT EXISTS rolls_bets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            game_number INTEGER,
+            bet_color TEXT,
+            bet_amount REAL,
+            win_amount REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+        ''',
+        # Таблица открытия кейсов
+        '''
+        CREATE TABLE IF NOT EXISTS case_openings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            case_name TEXT,
+            case_price REAL,
+            reward_name TEXT,
+            reward_value REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+        ''',
+        # Таблица инвентаря
+        '''
+        CREATE TABLE IF NOT EXISTS inventory (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            item_name TEXT,
+            item_value REAL,
+            item_type TEXT,
+            acquired_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+        ''',
+        # Таблица пополнений
+        '''
+        CREATE TABLE IF NOT EXISTS deposits (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            amount REAL,
+            method TEXT,
+            status TEXT DEFAULT 'completed',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+        ''',
+        # Таблица выводов
+        '''
+        CREATE TABLE IF NOT EXISTS withdrawals (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER,
+            amount REAL,
+            wallet TEXT,
+            status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            processed_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+        ''',
+        # Таблица последнего бесплатного кейса
+        '''
+        CREATE TABLE IF NOT EXISTS free_case_claims (
+            user_id INTEGER PRIMARY KEY,
+            last_claim TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+        ''',
+    ]),
+    (2, 'hot path indexes', [
+        # Рефералы пользователя (get_user_referrals)
+        'CREATE INDEX IF NOT EXISTS idx_users_referred_by ON users (referred_by)',
+        # Лидерборд (ORDER BY total_deposits DESC)
+        'CREATE INDEX IF NOT EXISTS idx_users_total_deposits ON users (total_deposits)',
+        # Счетчики по времени в статистике и восстановление онлайна
+        'CREATE INDEX IF NOT EXISTS idx_users_created_at ON users (created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_users_last_activity ON users (last_activity)',
+        # Инвентарь пользователя (get_inventory)
+        'CREATE INDEX IF NOT EXISTS idx_inventory_user_id ON inventory (user_id)',
+        # Выводы по статусу
+        'CREATE INDEX IF NOT EXISTS idx_withdrawals_status ON withdrawals (status, created_at)',
+    ]),
+    (3, 'leaderboard window indexes', [
+        # Пополнения и выигрыши за последние 7 дней при загрузке лидерборда
+        'CREATE INDEX IF NOT EXISTS idx_deposits_created_at ON deposits (created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_gift_upgrade_games_created_at ON gift_upgrade_games (created_at)',
+    ]),
+    (4, 'rolls bets index', [
+        # Расчет и просмотр ставок раунда Rolls
+        'CREATE INDEX IF NOT EXISTS idx_rolls_bets_game ON rolls_bets (game_number, bet_color)',
+    ]),
+    (5, 'inventory keyset indexes', [
+        # Постраничный инвентарь: ключ (сортировка, id) внутри пользователя
+        'CREATE INDEX IF NOT EXISTS idx_inventory_user_acquired ON inventory (user_id, acquired_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_inventory_user_value ON inventory (user_id, item_value, id)',
+        # Покрыт префиксом новых индексов
+        'DROP INDEX IF EXISTS idx_inventory_user_id',
+    ]),
+    (6, 'gift upgrade history index', [
+        # История игр пользователя, новые первыми
+        'CREATE INDEX IF NOT EXISTS idx_gift_upgrade_games_user ON gift_upgrade_games (user_id, id DESC)',
+    ]),
+    (7, 'balance version', [
+        # Увеличивается при каждом изменении balance/ref_balance (версия для кэша балансов)
+        'ALTER TABLE users ADD COLUMN balance_version INTEGER DEFAULT 0',
+    ]),
+    (8, 'stats counters', [
+        # Счетчики статистики админа, поддерживаемые триггерами, и их начальное заполнение
+        CREATE_STATS_COUNTERS,
+        *STATS_TRIGGERS,
+        rebuild_stats_counters,
+    ]),
+    (9, 'referral aggregates', [
+        # У реферера: число рефералов и заработок за все время; у реферала: сколько принес рефереру
+        'ALTER TABLE users ADD COLUMN referrals_count INTEGER DEFAULT 0',
+        'ALTER TABLE users ADD COLUMN ref_earned REAL DEFAULT 0',
+        'ALTER TABLE users ADD COLUMN ref_bonus_paid REAL DEFAULT 0',
+        # Заработок по дням для окна "за 30 дней"
+        '''
+        CREATE TABLE IF NOT EXISTS referral_earnings_daily (
+            referrer_id INTEGER,
+            day TEXT,
+            amount REAL DEFAULT 0,
+            PRIMARY KEY (referrer_id, day)
+        ) WITHOUT ROWID
+        ''',
+        # Заполнение по существующим данным; прошлые начисления оцениваются по текущему ref_percent
+        '''
+        UPDATE users SET referrals_count = refs.total
+        FROM (SELECT referred_by, COUNT(*) AS total FROM users WHERE referred_by IS NOT NULL GROUP BY referred_by) AS refs
+        WHERE users.user_id = refs.referred_by
+        ''',
+        '''
+        UPDATE users SET ref_bonus_paid = users.total_deposits * referrer.ref_percent / 100.0
+        FROM users AS referrer WHERE referrer.user_id = users.referred_by
+        ''',
+        '''
+        UPDATE users SET ref_earned = earned.total
+        FROM (SELECT referred_by, SUM(ref_bonus_paid) AS total FROM users WHERE referred_by IS NOT NULL GROUP BY referred_by) AS earned
+        WHERE users.user_id = earned.referred_by
+        ''',
+        '''
+        INSERT INTO referral_earnings_daily (referrer_id, day, amount)
+        SELECT referrer.user_id, date(deposits.created_at), SUM(deposits.amount * referrer.ref_percent / 100.0)
+        FROM deposits
+        JOIN users ON users.user_id = deposits.user_id
+        JOIN users AS referrer ON referrer.user_id = users.referred_by
+        WHERE deposits.created_at >= date('now', '-30 days')
+        GROUP BY 1, 2
+        ''',
+    ]),
+    (10, 'notification outbox', [
+        # Уведомления к отправке в Telegram; next_attempt_at - unix-время, NULL - отправка прекращена
+        '''
+        CREATE TABLE IF NOT EXISTS notification_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            attempts INTEGER DEFAULT 0,
+            next_attempt_at REAL,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_notification_outbox_due ON notification_outbox (next_attempt_at) '
+        'WHERE next_attempt_at IS NOT NULL',
+    ]),
+    (11, 'withdrawal queue index', [
+        # Очередь ожидающих выводов: ключ страницы (created_at, id) внутри статуса
+        'CREATE INDEX IF NOT EXISTS idx_withdrawals_status_created ON withdrawals (status, created_at, id)',
+        # Покрыт префиксом нового индекса
+        'DROP INDEX IF EXISTS idx_withdrawals_status',
+    ]),
+    (12, 'broadcasts', [
+        # Рассылки всем пользователям; last_user_id - контрольная точка для продолжения после перезапуска
+        '''
+        CREATE TABLE IF NOT EXISTS broadcasts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            text TEXT NOT NULL,
+            status TEXT DEFAULT 'running',
+            last_user_id INTEGER DEFAULT 0,
+            sent INTEGER DEFAULT 0,
+            failed INTEGER DEFAULT 0,
+            blocked INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_broadcasts_running ON broadcasts (id) WHERE status = 'running'",
+    ]),
+    (13, 'unsettled rolls bets index', [
+        # Возврат нерассчитанных ставок Rolls (при ошибке расчета и при запуске)
+        'CREATE INDEX IF NOT EXISTS idx_rolls_bets_unsettled ON rolls_bets (game_number) WHERE win_amount IS NULL',
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+async def get_schema_version(db):
+    """Текущая версия схемы"""
+    await db.execute(
+        'CREATE TABLE IF NOT EXISTS schema_version ('
+        'version INTEGER PRIMARY KEY, name TEXT, applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)'
+    )
+    cursor = await db.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version')
+    return (await cursor.fetchone())[0]
+
+
+async def run_migrations(db):
+    """Применить недостающие миграции по порядку, каждую в своей транзакции"""
+    current = await get_schema_version(db)
+    if current >= LATEST_VERSION:
+        return []
+
+    applied = []
+    for version, name, steps in MIGRATIONS:
+        if version <= current:
+            continue
+
+        await db.execute('BEGIN')
+        try:
+            for step in steps:
+                if callable(step):
+                    await step(db)
+                else:
+                    await db.execute(step)
+
+            await db.execute(
+                'INSERT INTO schema_version (version, name) VALUES (?, ?)',
+                (version, name)
+            )
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
+
+        applied.append(version)
+
+    return applied
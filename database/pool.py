@@ -0,0 +1,148 @@
+"""
+Пул долгоживущих соединений SQLite для DatabaseManager
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+import aiosqlite
+
+# PRAGMA, применяемые один раз при открытии каждого соединения
+DEFAULT_PRAGMAS = (
+    ('journal_mode', 'WAL'),        # читатели не блокируют писателя
+    ('synchronous', 'NORMAL'),      # в режиме WAL безопасно и без fsync на каждый commit
+    ('cache_size', -16000),         # ~16 МБ кэша страниц на соединение
+    ('mmap_size', 268435456),       # 256 МБ memory-mapped I/O
+    ('busy_timeout', 5000),         # ждать блокировку до 5 секунд вместо ошибки
+    ('temp_store', 'MEMORY'),
+)
+
+
+class ConnectionPool:
+    """Ограниченный пул соединений aiosqlite"""
+
+    def __init__(self, db_path, size=4, pragmas=DEFAULT_PRAGMAS, trace_callback=None):
+        self.db_path = db_path
+        self.size = size
+        self.pragmas = pragmas
+        self.trace_callback = trace_callback
+
+        self._idle = None
+        self._created = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+
+        # Счетчики для подбора размера пула
+        self._acquired_total = 0
+        self._waits_total = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._peak_in_use = 0
+
+    async def connect(self):
+        """Открытие и настройка нового соединения (вне пула - для писателя)"""
+        conn = await aiosqlite.connect(self.db_path)
+        conn.row_factory = aiosqlite.Row
+        for name, value in self.pragmas:
+            await conn.execute(f'PRAGMA {name} = {value}')
+        if self.trace_callback is not None:
+            await conn.set_trace_callback(self.trace_callback)
+        return conn
+
+    async def acquire(self):
+        """Получить соединение из пула (или дождаться свободного)"""
+        if self._closed:
+            raise RuntimeError('Connection pool is closed')
+
+        # Очередь создается лениво, чтобы привязаться к работающему event loop
+        if self._idle is None:
+            self._idle = asyncio.LifoQueue()
+
+        started = time.perf_counter()
+
+        try:
+            conn = self._idle.get_nowait()
+        except asyncio.QueueEmpty:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    conn = await self.connect()
+                except BaseException:
+                    self._created -= 1
+                    raise
+            else:
+                self._waiting += 1
+                self._waits_total += 1
+                try:
+                    conn = await self._idle.get()
+                finally:
+                    self._waiting -= 1
+
+                waited = time.perf_counter() - started
+                self._wait_time_total += waited
+                self._wait_time_max = max(self._wait_time_max, waited)
+
+        self._in_use += 1
+        self._acquired_total += 1
+        self._peak_in_use = max(self._peak_in_use, self._in_use)
+        return conn
+
+    async def release(self, conn):
+        """Вернуть соединение в пул"""
+        self._in_use -= 1
+
+        try:
+            # Незавершенная транзакция не должна утечь к следующему владельцу
+            if conn.in_transaction:
+                await conn.rollback()
+        except Exception:
+            await self._discard(conn)
+            return
+
+        if self._closed:
+            await self._discard(conn)
+            return
+
+        self._idle.put_nowait(conn)
+
+    async def _discard(self, conn):
+        """Закрыть соединение и освободить место в пуле"""
+        self._created -= 1
+        try:
+            await conn.close()
+        except Exception:
+            pass
+
+    @asynccontextmanager
+    async def connection(self):
+        """Контекстный менеджер: соединение из пула на время блока"""
+        conn = await self.acquire()
+        try:
+            yield conn
+        finally:
+            await self.release(conn)
+
+    async def close(self):
+        """Закрыть все свободные соединения; занятые закроются при возврате"""
+        self._closed = True
+        if self._idle is None:
+            return
+
+        while not self._idle.empty():
+            await self._discard(self._idle.get_nowait())
+
+    def stats(self):
+        """Статистика пула"""
+        return {
+            'size': self.size,
+            'open': self._created,
+            'in_use': self._in_use,
+            'idle': self._idle.qsize() if self._idle is not None else 0,
+            'waiting': self._waiting,
+            'peak_in_use': self._peak_in_use,
+            'acquired_total': self._acquired_total,
+            'waits_total': self._waits_total,
+            'wait_time_avg_ms': (self._wait_time_total / self._waits_total * 1000) if self._waits_total else 0.0,
+            'wait_time_max_ms': self._wait_time_max * 1000,
+        }
@@ -0,0 +1,83 @@
+"""
+Кольцевой буфер последних игр на пользователя (история Gift Upgrade без обращения к SQLite)
+"""
+from collections import OrderedDict, deque
+
+RECENT_GAMES = 20
+MAX_USERS = 10000
+
+
+class RecentGames:
+    """Последние per_user игр для max_users недавно активных пользователей (LRU)"""
+
+    def __init__(self, per_user=RECENT_GAMES, max_users=MAX_USERS):
+        self.per_user = per_user
+        self.max_users = max_users
+
+        self._games = OrderedDict()   # user_id -> deque новых игр слева
+        self._loading = {}            # user_id -> [поколение записей, число идущих загрузок]
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, user_id, limit):
+        """Последние limit игр или None, если пользователя нет в буфере"""
+        games = self._games.get(user_id)
+        if games is None:
+            self._misses += 1
+            return None
+
+        self._games.move_to_end(user_id)
+        self._hits += 1
+        return list(games)[:limit]
+
+    def record(self, user_id, game):
+        """Новая игра; пользователь не в буфере - его история загрузится из БД при чтении"""
+        games = self._games.get(user_id)
+        if games is not None:
+            # Параллельные игры могут завершиться не по порядку id
+            position = 0
+            while position < len(games) and games[position]['id'] > game['id']:
+                position += 1
+            if position < self.per_user:
+                if len(games) == self.per_user:
+                    games.pop()
+                games.insert(position, game)
+            self._games.move_to_end(user_id)
+        elif user_id in self._loading:
+            # Идущие загрузки могли прочитать БД до этой игры - их результат устарел
+            self._loading[user_id][0] += 1
+
+    def begin_load(self, user_id):
+        """Отметить начало загрузки истории из БД; поколение для finish_load"""
+        loading = self._loading.setdefault(user_id, [0, 0])
+        loading[1] += 1
+        return loading[0]
+
+    def finish_load(self, user_id, generation, games=None):
+        """Сохранить загруженную историю (новые игры первыми), если с begin_load не было записей
+
+        games=None - загрузка не удалась, только снять отметку."""
+        loading = self._loading[user_id]
+        loading[1] -= 1
+        if loading[1] == 0:
+            del self._loading[user_id]
+
+        if games is None or loading[0] != generation or user_id in self._games:
+            return
+
+        self._games[user_id] = deque(games, maxlen=self.per_user)
+        if len(self._games) > self.max_users:
+            self._games.popitem(last=False)
+            self._evictions += 1
+
+    def stats(self):
+        lookups = self._hits + self._misses
+        return {
+            'users': len(self._games),
+            'hits': self._hits,
+            'misses': self._misses,
+            'evictions': self._evictions,
+            'hit_rate': self._hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,129 @@
+"""
+Перенос данных в шарды: один файл базы (или шарды прежней конфигурации) -> N новых шардов
+Бот на время переноса должен быть остановлен; исходные файлы не меняются,
+кроме применения недостающих миграций схемы.
+
+Запуск:
+    python database/reshard.py 4                                  # casino.db -> casino.0.db ... casino.3.db
+    python database/reshard.py 8 --target database/casino8.db database/casino.0.db database/casino.1.db ...
+После переноса запускайте бота с DB_SHARDS=<N> (и DB_PATH, равным --target).
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.db_manager import DatabaseManager
+from database.sharding import GLOBAL_TABLES, PRIMARY_TABLES, USER_TABLES, shard_paths
+from database.stats_counters import REBUILD as REBUILD_STATS_COUNTERS
+
+
+def table_columns(conn, schema, table):
+    return [row[1] for row in conn.execute(f'PRAGMA {schema}.table_info({table})')]
+
+
+def copy_into_shard(target, index, count, sources):
+    """Скопировать в шард index строки его пользователей из всех источников одной транзакцией"""
+    conn = sqlite3.connect(target)
+    try:
+        for number, source in enumerate(sources):
+            conn.execute('ATTACH DATABASE ? AS src', (source,))
+            conn.execute('BEGIN')
+
+            for table, key in USER_TABLES.items():
+                columns = table_columns(conn, 'src', table)
+                order = ' ORDER BY id' if 'id' in columns else ''
+                # Из нескольких источников автоинкрементные id могут совпасть - выдаются новые
+                # (в порядке старых, поэтому история пользователя сохраняет порядок)
+                if len(sources) > 1 and 'id' in columns and table != 'withdrawals':
+                    columns.remove('id')
+                names = ', '.join(columns)
+                conn.execute(
+                    f'INSERT INTO main.{table} ({names}) SELECT {names} FROM src.{table} '
+                    f'WHERE (({key} % ?) + ?) % ? = ?{order}',
+                    (count, count, count, index)
+                )
+
+            # Общие таблицы одинаковы во всех источниках - берутся из первого
+            if number == 0:
+                for table in GLOBAL_TABLES:
+                    names = ', '.join(table_columns(conn, 'src', table))
+                    conn.execute(f'INSERT INTO main.{table} ({names}) SELECT {names} FROM src.{table}')
+
+            # Очередь уведомлений и рассылки - в шард 0 из всех источников
+            if index == 0:
+                for table in PRIMARY_TABLES:
+                    columns = table_columns(conn, 'src', table)
+                    if len(sources) > 1:
+                        columns.remove('id')
+                    names = ', '.join(columns)
+                    conn.execute(f'INSERT INTO main.{table} ({names}) SELECT {names} FROM src.{table} ORDER BY id')
+
+            conn.commit()
+            conn.execute('DETACH DATABASE src')
+
+        # Триггеры считали вставки как новые события - счетчики пересчитываются
+        conn.execute('BEGIN')
+        for sql in REBUILD_STATS_COUNTERS:
+            conn.execute(sql)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def count_rows(paths):
+    """{таблица: строк во всех файлах}"""
+    totals = {}
+    for path in paths:
+        conn = sqlite3.connect(path)
+        for table in (*USER_TABLES, *PRIMARY_TABLES):
+            totals[table] = totals.get(table, 0) + conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        conn.close()
+    return totals
+
+
+async def prepare(paths):
+    """Схема актуальной версии во всех файлах"""
+    for path in paths:
+        db = DatabaseManager(path)
+        await db.init_database()
+        await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Перенос базы в N шардов')
+    parser.add_argument('shards', type=int, help='количество шардов')
+    parser.add_argument('sources', nargs='*', default=['database/casino.db'], help='исходные файлы базы')
+    parser.add_argument('--target', default='database/casino.db', help='база, от имени которой строятся имена шардов')
+    args = parser.parse_args()
+
+    targets = shard_paths(args.target, args.shards)
+    existing = [path for path in targets if os.path.exists(path)]
+    if existing or set(targets) & set(args.sources):
+        print(f"❌ Файлы шардов уже существуют: {', '.join(existing or targets)}")
+        sys.exit(1)
+    missing = [path for path in args.sources if not os.path.exists(path)]
+    if missing:
+        print(f"❌ Нет исходных файлов: {', '.join(missing)}")
+        sys.exit(1)
+
+    print(f"🔧 {len(args.sources)} -> {args.shards} шардов")
+    asyncio.run(prepare(args.sources + targets))
+
+    for index, target in enumerate(targets):
+        copy_into_shard(target, index, args.shards, args.sources)
+        print(f"   {target}: {count_rows([target])['users']} пользователей")
+
+    before, after = count_rows(args.sources), count_rows(targets)
+    if before != after:
+        for table in before:
+            if before[table] != after[table]:
+                print(f"❌ {table}: было {before[table]}, перенесено {after[table]}")
+        sys.exit(1)
+
+    print(f"✅ Перенесено строк: {sum(after.values())}; запускайте с DB_SHARDS={args.shards}")
+
+
+if __name__ == '__main__':
+    main()
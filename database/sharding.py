@@ -0,0 +1,385 @@
+"""
+Шардирование по пользователям: данные пользователя - в одном из N файлов SQLite
+
+Каждый шард - обычный DatabaseManager со своим пулом и писателем, поэтому запись
+в разные шарды не упирается в одну блокировку файла. Таблицы пользователя (users,
+inventory, игры, пополнения, выводы, ставки, кейсы) лежат в шарде user_id % N;
+referral_earnings_daily - в шарде реферера. История раундов Rolls записывается
+во все шарды, очередь уведомлений и рассылки - только в шард 0. Общие выборки (лидерборд, статистика, рефералы) собираются
+параллельными запросами ко всем шардам.
+
+Операции, затрагивающие двух пользователей из разных шардов (счетчик рефералов,
+реферальный бонус), выполняются двумя транзакциями.
+"""
+import asyncio
+import heapq
+import os
+
+from database.db_manager import INVENTORY_FIELDS, DatabaseManager
+from database.leaderboard import Leaderboard, build_leaderboard
+from database.stats_counters import summarize as summarize_stats
+
+# Таблица -> столбец пользователя, по которому выбирается шард
+USER_TABLES = {
+    'users': 'user_id',
+    'inventory': 'user_id',
+    'gift_upgrade_games': 'user_id',
+    'rolls_bets': 'user_id',
+    'case_openings': 'user_id',
+    'deposits': 'user_id',
+    'withdrawals': 'user_id',
+    'free_case_claims': 'user_id',
+    'referral_earnings_daily': 'referrer_id',
+}
+# Копируются во все шарды
+GLOBAL_TABLES = ('rolls_games',)
+# Общие таблицы, которые ведет только шард 0 (очередь уведомлений, рассылки)
+PRIMARY_TABLES = ('notification_outbox', 'broadcasts')
+
+
+def shard_paths(db_path, count):
+    """Файлы шардов: database/casino.db -> database/casino.0.db, database/casino.1.db, ..."""
+    root, ext = os.path.splitext(db_path)
+    return [f'{root}.{index}{ext}' for index in range(count)]
+
+
+def shard_index(user_id, count):
+    """Номер шарда пользователя"""
+    return user_id % count
+
+
+def merge_stats(stats):
+    """Статистика шардов в одну: суммы складываются, максимумы и средние - по шардам"""
+    merged = {}
+    for key in stats[0]:
+        values = [shard[key] for shard in stats]
+        if 'max' in key or 'peak' in key:
+            merged[key] = max(values)
+        elif 'avg' in key or 'rate' in key:
+            merged[key] = sum(values) / len(values)
+        elif isinstance(values[0], bool):
+            merged[key] = values[0]
+        else:
+            merged[key] = sum(values)
+    return merged
+
+
+class ShardedDatabaseManager:
+    """Интерфейс DatabaseManager поверх N шардов"""
+
+    def __init__(self, db_path='database/casino.db', shards=4, pool_size=4, activity_flush_interval=5.0,
+                 leaderboard_game_wins=False, balance_cache_size=10000, write_batch_size=128,
+                 write_batch_delay=0.0):
+        self.db_path = db_path
+        self.shards = [
+            DatabaseManager(
+                path,
+                pool_size=pool_size,
+                activity_flush_interval=activity_flush_interval,
+                leaderboard_game_wins=leaderboard_game_wins,
+                balance_cache_size=max(balance_cache_size // shards, 1),
+                write_batch_size=write_batch_size,
+                write_batch_delay=write_batch_delay,
+            )
+            for path in shard_paths(db_path, shards)
+        ]
+        self.leaderboard = Leaderboard()
+        self._leaderboard_lock = None
+
+    def shard(self, user_id):
+        """Шард пользователя"""
+        return self.shards[shard_index(user_id, len(self.shards))]
+
+    async def _gather(self, method, *args):
+        """Вызвать метод на всех шардах параллельно"""
+        return await asyncio.gather(*(getattr(shard, method)(*args) for shard in self.shards))
+
+    def start(self):
+        """Запуск фоновых задач всех шардов"""
+        for shard in self.shards:
+            shard.start()
+
+    async def close(self):
+        """Закрытие всех шардов"""
+        await asyncio.gather(*(shard.close() for shard in self.shards))
+
+    def get_pool_stats(self):
+        """Статистика пулов соединений (по всем шардам)"""
+        return merge_stats([shard.get_pool_stats() for shard in self.shards])
+
+    def get_balance_cache_stats(self):
+        """Статистика кэшей балансов (по всем шардам)"""
+        return merge_stats([shard.get_balance_cache_stats() for shard in self.shards])
+
+    def get_writer_stats(self):
+        """Статистика писателей (по всем шардам)"""
+        stats = merge_stats([shard.get_writer_stats() for shard in self.shards])
+        stats['avg_batch'] = stats['ops_total'] / stats['batches_total'] if stats['batches_total'] else 0.0
+        return stats
+
+    async def init_database(self):
+        """Миграции схемы во всех шардах; список примененных версий первого шарда"""
+        applied = await self._gather('init_database')
+        return applied[0]
+
+    async def register_user(self, user_id, username, first_name, referred_by=None):
+        """Регистрация нового пользователя; True, если пользователь добавлен"""
+        # Реферер из того же шарда учитывается в транзакции регистрации
+        inserted = await self.shard(user_id).register_user(user_id, username, first_name, referred_by)
+
+        if inserted and referred_by and referred_by != user_id and \
+                self.shard(referred_by) is not self.shard(user_id):
+            await self.shard(referred_by).add_referral(referred_by)
+
+        return inserted
+
+    async def update_last_activity(self, user_id):
+        await self.shard(user_id).update_last_activity(user_id)
+
+    async def get_balance(self, user_id):
+        return await self.shard(user_id).get_balance(user_id)
+
+    async def add_balance(self, user_id, amount):
+        return await self.shard(user_id).add_balance(user_id, amount)
+
+    async def remove_balance(self, user_id, amount):
+        return await self.shard(user_id).remove_balance(user_id, amount)
+
+    async def add_deposit(self, user_id, amount, method):
+        """Пополнение; бонус рефереру из другого шарда начисляется второй транзакцией"""
+        shard = self.shard(user_id)
+        info = await shard.get_user_info(user_id)
+        referred_by = info['referred_by'] if info else None
+
+        if not referred_by or self.shard(referred_by) is shard:
+            return await shard.add_deposit(user_id, amount, method)
+
+        referrer = await self.shard(referred_by).get_user_info(referred_by)
+        if not referrer:
+            return await shard.add_deposit(user_id, amount, method)
+
+        ref_bonus = await shard.add_deposit(user_id, amount, method, (referred_by, referrer['ref_percent']))
+        await self.shard(referred_by).credit_referrer(referred_by, ref_bonus)
+        return ref_bonus
+
+    async def create_withdrawal_request(self, user_id, amount, wallet):
+        return await self.shard(user_id).create_withdrawal_request(user_id, amount, wallet)
+
+    async def approve_withdrawal(self, request_id):
+        """Одобрение вывода (заявка ищется во всех шардах)"""
+        results = await self._gather('approve_withdrawal', request_id)
+        return next((result for result in results if result), None)
+
+    async def reject_withdrawal(self, request_id):
+        """Отклонение вывода (заявка ищется во всех шардах)"""
+        results = await self._gather('reject_withdrawal', request_id)
+        return next((result for result in results if result), None)
+
+    async def get_pending_withdrawals(self, limit=20, after=None, user_id=None, min_amount=None, max_amount=None):
+        """Страница ожидающих выводов: страницы всех шардов сливаются по (created_at, id)"""
+        if user_id is not None:
+            return await self.shard(user_id).get_pending_withdrawals(limit, after, user_id, min_amount, max_amount)
+
+        pages = await self._gather('get_pending_withdrawals', limit, after, None, min_amount, max_amount)
+        merged = list(heapq.merge(*(page['items'] for page in pages), key=lambda item: (item['created_at'], item['id'])))
+        items = merged[:limit]
+        has_more = len(merged) > limit or any(page['next'] for page in pages)
+
+        return {
+            'items': items,
+            'next': (items[-1]['created_at'], items[-1]['id']) if has_more and items else None,
+        }
+
+    async def process_withdrawals(self, status, request_ids=None, user_id=None, min_amount=None, max_amount=None,
+                                  limit=None):
+        """Обработка выводов по фильтру: в каждом шарде своей транзакцией"""
+        if user_id is not None:
+            return await self.shard(user_id).process_withdrawals(
+                status, request_ids, user_id, min_amount, max_amount, limit
+            )
+
+        if limit is not None:
+            # Самые старые заявки по всем шардам, затем обработка именно их
+            page = await self.get_pending_withdrawals(limit, None, None, min_amount, max_amount)
+            request_ids = [item['id'] for item in page['items']]
+            if not request_ids:
+                return []
+
+        results = await self._gather('process_withdrawals', status, request_ids, None, min_amount, max_amount)
+        return [withdrawal for result in results for withdrawal in result]
+
+    async def transfer_ref_balance(self, user_id):
+        return await self.shard(user_id).transfer_ref_balance(user_id)
+
+    async def get_user_info(self, user_id):
+        return await self.shard(user_id).get_user_info(user_id)
+
+    async def get_user_referrals(self, user_id, limit=20, before=None):
+        """Страница рефералов: страницы всех шардов сливаются по user_id"""
+        pages = await self._gather('get_user_referrals', user_id, limit, before)
+        merged = heapq.merge(*pages, key=lambda referral: referral['user_id'], reverse=True)
+        return list(merged)[:limit]
+
+    async def get_referral_summary(self, user_id):
+        return await self.shard(user_id).get_referral_summary(user_id)
+
+    async def get_activity_since(self, since):
+        """Активные пользователи всех шардов"""
+        return [row for rows in await self._gather('get_activity_since', since) for row in rows]
+
+    async def get_admin_stats(self):
+        """Статистика для админа: сумма счетчиков всех шардов"""
+        return summarize_stats(await self.get_stats_counters())
+
+    async def get_stats_counters(self):
+        counters = {}
+        for shard_counters in await self._gather('get_stats_counters'):
+            for name, value in shard_counters.items():
+                counters[name] = counters.get(name, 0) + value
+        return counters
+
+    async def reconcile_stats_counters(self):
+        """Пересчет счетчиков во всех шардах; расхождения суммируются по именам"""
+        drift = {}
+        for shard_drift in await self._gather('reconcile_stats_counters'):
+            for name, (old, new) in shard_drift.items():
+                total_old, total_new = drift.get(name, (0, 0))
+                drift[name] = (total_old + old, total_new + new)
+        return dict(sorted(drift.items()))
+
+    async def load_leaderboard(self):
+        """Однократная загрузка общего лидерборда из всех шардов"""
+        if self._leaderboard_lock is None:
+            self._leaderboard_lock = asyncio.Lock()
+
+        async with self._leaderboard_lock:
+            if self.leaderboard.loaded:
+                return
+
+            users, game_wins, events = [], [], []
+            for shard_users, shard_wins, shard_events in await self._gather('fetch_leaderboard_rows'):
+                users.extend(shard_users)
+                game_wins.extend(shard_wins)
+                events.extend(shard_events)
+
+            self.leaderboard = build_leaderboard(users, game_wins, events)
+
+            # Шарды обновляют общий лидерборд при пополнениях и выигрышах
+            for shard in self.shards:
+                shard.leaderboard = self.leaderboard
+
+    async def get_leaderboard(self, limit=35, window='all'):
+        if not self.leaderboard.loaded:
+            await self.load_leaderboard()
+
+        return self.leaderboard.top(window, limit)
+
+    async def get_leaderboard_rank(self, user_id, window='all'):
+        if not self.leaderboard.loaded:
+            await self.load_leaderboard()
+
+        return self.leaderboard.rank(user_id, window)
+
+    async def add_game_played(self, user_id):
+        await self.shard(user_id).add_game_played(user_id)
+
+    async def settle_gift_upgrade(self, user_id, bet_amount, multiplier, is_win):
+        return await self.shard(user_id).settle_gift_upgrade(user_id, bet_amount, multiplier, is_win)
+
+    async def get_gift_upgrade_history(self, user_id, limit=10, before_id=None):
+        return await self.shard(user_id).get_gift_upgrade_history(user_id, limit, before_id)
+
+    async def get_last_rolls_game_number(self):
+        """Номер последнего раунда Rolls (история раундов есть в каждом шарде)"""
+        return max(await self._gather('get_last_rolls_game_number'))
+
+    async def get_rolls_history(self, limit=100):
+        return await self.shards[0].get_rolls_history(limit)
+
+    async def get_rolls_bets(self, game_number):
+        return [bet for bets in await self._gather('get_rolls_bets', game_number) for bet in bets]
+
+    async def place_rolls_bet(self, user_id, game_number, color, amount):
+        return await self.shard(user_id).place_rolls_bet(user_id, game_number, color, amount)
+
+    async def settle_rolls_round(self, game_number, winning_color, multiplier):
+        """Расчет раунда во всех шардах параллельно (каждый шард - своей транзакцией)"""
+        results = await self._gather('settle_rolls_round', game_number, winning_color, multiplier)
+        return {
+            'winners': sum(result['winners'] for result in results),
+            'paid': sum(result['paid'] for result in results),
+            'balances': {user_id: balance for result in results for user_id, balance in result['balances'].items()},
+        }
+
+    async def refund_rolls_bets(self, game_number=None):
+        results = await self._gather('refund_rolls_bets', game_number)
+        return {
+            'refunded': sum(result['refunded'] for result in results),
+            'balances': {user_id: balance for result in results for user_id, balance in result['balances'].items()},
+        }
+
+    async def count_inventory(self, user_id, item_type=None, min_value=None, max_value=None):
+        return await self.shard(user_id).count_inventory(user_id, item_type, min_value, max_value)
+
+    async def get_inventory_page(self, user_id, limit=50, after=None, sort='acquired_at', order='desc',
+                                 item_type=None, min_value=None, max_value=None, fields=INVENTORY_FIELDS):
+        return await self.shard(user_id).get_inventory_page(
+            user_id, limit, after, sort, order, item_type, min_value, max_value, fields
+        )
+
+    def iter_inventory(self, user_id, batch_size=500, **filters):
+        return self.shard(user_id).iter_inventory(user_id, batch_size, **filters)
+
+    async def get_user_ids(self, after=0, limit=1000):
+        """user_id всех шардов по возрастанию"""
+        pages = await self._gather('get_user_ids', after, limit)
+        return list(heapq.merge(*pages))[:limit]
+
+    async def iter_user_ids(self, after=0, batch_size=1000):
+        while True:
+            user_ids = await self.get_user_ids(after, batch_size)
+            if not user_ids:
+                return
+            yield user_ids
+            after = user_ids[-1]
+
+    async def add_to_inventory(self, user_id, item_name, item_value, item_type):
+        await self.shard(user_id).add_to_inventory(user_id, item_name, item_value, item_type)
+
+    async def sell_inventory_item(self, item_id, user_id):
+        return await self.shard(user_id).sell_inventory_item(item_id, user_id)
+
+    async def sell_items(self, user_id, item_ids=None, item_type=None, min_value=None, max_value=None):
+        return await self.shard(user_id).sell_items(user_id, item_ids, item_type, min_value, max_value)
+
+    async def open_cases(self, user_id, case_name, price, rewards, cooldown=None):
+        return await self.shard(user_id).open_cases(user_id, case_name, price, rewards, cooldown)
+
+    async def can_claim_free_case(self, user_id):
+        return await self.shard(user_id).can_claim_free_case(user_id)
+
+    async def claim_free_case(self, user_id):
+        await self.shard(user_id).claim_free_case(user_id)
+
+    # Outbox уведомлений не относится к пользователю - хранится в первом шарде
+    async def enqueue_notifications(self, notifications):
+        await self.shards[0].enqueue_notifications(notifications)
+
+    async def get_due_notifications(self, now, limit=100):
+        return await self.shards[0].get_due_notifications(now, limit)
+
+    async def complete_notifications(self, ids):
+        await self.shards[0].complete_notifications(ids)
+
+    async def reschedule_notifications(self, schedule, failed=False):
+        await self.shards[0].reschedule_notifications(schedule, failed)
+
+    # Рассылки - в первом шарде, как и outbox
+    async def create_broadcast(self, text):
+        return await self.shards[0].create_broadcast(text)
+
+    async def get_running_broadcasts(self):
+        return await self.shards[0].get_running_broadcasts()
+
+    async def checkpoint_broadcast(self, broadcast_id, last_user_id, sent, failed, blocked, status='running'):
+        await self.shards[0].checkpoint_broadcast(broadcast_id, last_user_id, sent, failed, blocked, status)
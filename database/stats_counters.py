@@ -0,0 +1,148 @@
+"""
+Материализованные счетчики для статистики админа (таблица stats_counters)
+
+Счетчики поддерживаются триггерами SQLite, поэтому учитывают любую запись в users,
+deposits и withdrawals. Имена:
+    users_total
+    users_new:<YYYY-MM-DD HH>          новые пользователи по часам (UTC)
+    deposits_count, deposits_total
+    deposits_count:<method>, deposits_total:<method>
+    withdrawals_count:<status>, withdrawals_total:<status>
+"""
+from datetime import datetime, timedelta
+
+NEW_USERS_PREFIX = 'users_new:'
+HOUR_FORMAT = '%Y-%m-%d %H'
+
+UPSERT = 'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value'
+
+CREATE_TABLE = 'CREATE TABLE IF NOT EXISTS stats_counters (name TEXT PRIMARY KEY, value REAL NOT NULL DEFAULT 0)'
+
+TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_users_insert AFTER INSERT ON users BEGIN
+        INSERT INTO stats_counters (name, value) VALUES
+            ('users_total', 1),
+            ('{NEW_USERS_PREFIX}' || strftime('%Y-%m-%d %H', NEW.created_at), 1)
+        {UPSERT};
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_users_delete AFTER DELETE ON users BEGIN
+        INSERT INTO stats_counters (name, value) VALUES ('users_total', -1) {UPSERT};
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_deposits_insert AFTER INSERT ON deposits BEGIN
+        INSERT INTO stats_counters (name, value) VALUES
+            ('deposits_count', 1),
+            ('deposits_total', NEW.amount),
+            ('deposits_count:' || COALESCE(NEW.method, 'unknown'), 1),
+            ('deposits_total:' || COALESCE(NEW.method, 'unknown'), NEW.amount)
+        {UPSERT};
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_deposits_delete AFTER DELETE ON deposits BEGIN
+        INSERT INTO stats_counters (name, value) VALUES
+            ('deposits_count', -1),
+            ('deposits_total', -OLD.amount),
+            ('deposits_count:' || COALESCE(OLD.method, 'unknown'), -1),
+            ('deposits_total:' || COALESCE(OLD.method, 'unknown'), -OLD.amount)
+        {UPSERT};
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_withdrawals_insert AFTER INSERT ON withdrawals BEGIN
+        INSERT INTO stats_counters (name, value) VALUES
+            ('withdrawals_count:' || NEW.status, 1),
+            ('withdrawals_total:' || NEW.status, NEW.amount)
+        {UPSERT};
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_withdrawals_status AFTER UPDATE OF status ON withdrawals
+    WHEN OLD.status IS NOT NEW.status BEGIN
+        INSERT INTO stats_counters (name, value) VALUES
+            ('withdrawals_count:' || OLD.status, -1),
+            ('withdrawals_total:' || OLD.status, -OLD.amount),
+            ('withdrawals_count:' || NEW.status, 1),
+            ('withdrawals_total:' || NEW.status, NEW.amount)
+        {UPSERT};
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_withdrawals_delete AFTER DELETE ON withdrawals BEGIN
+        INSERT INTO stats_counters (name, value) VALUES
+            ('withdrawals_count:' || OLD.status, -1),
+            ('withdrawals_total:' || OLD.status, -OLD.amount)
+        {UPSERT};
+    END
+    ''',
+]
+
+# Полный пересчет из исходных таблиц (миграция и сверка)
+REBUILD = [
+    'DELETE FROM stats_counters',
+    "INSERT INTO stats_counters (name, value) SELECT 'users_total', COUNT(*) FROM users",
+    f"""
+    INSERT INTO stats_counters (name, value)
+    SELECT '{NEW_USERS_PREFIX}' || strftime('%Y-%m-%d %H', created_at), COUNT(*) FROM users
+    WHERE created_at > datetime('now', '-2 days') GROUP BY 1
+    """,
+    """
+    INSERT INTO stats_counters (name, value)
+    SELECT 'deposits_count', COUNT(*) FROM deposits
+    UNION ALL SELECT 'deposits_total', COALESCE(SUM(amount), 0) FROM deposits
+    """,
+    """
+    INSERT INTO stats_counters (name, value)
+    SELECT 'deposits_count:' || COALESCE(method, 'unknown'), COUNT(*) FROM deposits GROUP BY 1
+    UNION ALL
+    SELECT 'deposits_total:' || COALESCE(method, 'unknown'), SUM(amount) FROM deposits GROUP BY 1
+    """,
+    """
+    INSERT INTO stats_counters (name, value)
+    SELECT 'withdrawals_count:' || status, COUNT(*) FROM withdrawals GROUP BY 1
+    UNION ALL
+    SELECT 'withdrawals_total:' || status, SUM(amount) FROM withdrawals GROUP BY 1
+    """,
+]
+
+
+async def rebuild_stats_counters(db):
+    """Пересчитать все счетчики (внутри транзакции вызывающего)"""
+    for sql in REBUILD:
+        await db.execute(sql)
+
+
+def new_users_cutoff(now=None):
+    """Имя самой старой часовой корзины, входящей в последние 24 часа"""
+    now = datetime.utcnow() if now is None else now
+    return NEW_USERS_PREFIX + (now - timedelta(days=1)).strftime(HOUR_FORMAT)
+
+
+def summarize(counters):
+    """{имя: значение} -> статистика для админа"""
+    deposits_by_method = {}
+    withdrawals = {}
+    new_24h = 0
+
+    for name, value in counters.items():
+        if name.startswith(NEW_USERS_PREFIX):
+            new_24h += value
+        elif name.startswith('deposits_total:'):
+            deposits_by_method[name.split(':', 1)[1]] = value
+        elif name.startswith(('withdrawals_count:', 'withdrawals_total:')):
+            kind, status = name.split(':', 1)
+            key = 'count' if kind == 'withdrawals_count' else 'total'
+            withdrawals.setdefault(status, {'count': 0, 'total': 0})[key] = int(value) if key == 'count' else value
+
+    return {
+        'total_users': int(counters.get('users_total', 0)),
+        'new_24h': int(new_24h),
+        'total_deposits': counters.get('deposits_total', 0),
+        'deposits_count': int(counters.get('deposits_count', 0)),
+        'deposits_by_method': deposits_by_method,
+        'withdrawals': withdrawals,
+    }
@@ -0,0 +1,202 @@
+"""
+Единственный писатель SQLite с групповым commit
+
+Все изменения БД ставятся в очередь и выполняются на одном выделенном соединении:
+операции, накопившиеся за время предыдущего commit (но не больше max_batch),
+выполняются одной транзакцией. Ошибка одной операции откатывает только ее (остаток пачки
+выполняется с SAVEPOINT на каждую операцию). Результат возвращается вызывающему после commit.
+"""
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH = 128
+MAX_DELAY = 0.0   # сколько ждать попутных операций перед началом пачки, секунд
+
+
+class Rollback(Exception):
+    """Откатить изменения операции и вернуть result вызывающему (не ошибка)"""
+
+    def __init__(self, result=None):
+        super().__init__(result)
+        self.result = result
+
+
+class WriteQueue:
+    """Очередь операций записи; операция - async-функция, получающая соединение"""
+
+    def __init__(self, pool, max_batch=MAX_BATCH, max_delay=MAX_DELAY):
+        self.pool = pool   # соединение писателя открывается с настройками пула
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+
+        self._queue = None
+        self._conn = None
+        self._task = None
+        self._closed = False
+
+        self._ops_total = 0
+        self._batches_total = 0
+        self._failed_ops = 0
+        self._retried_batches = 0
+        self._max_batch_seen = 0
+        self._commit_time_total = 0.0
+        self._commit_time_max = 0.0
+
+    def start(self):
+        """Запустить писателя (иначе он запустится при первой операции)"""
+        if self._closed:
+            raise RuntimeError('Write queue is closed')
+
+        # Очередь создается лениво, чтобы привязаться к работающему event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def submit(self, operation):
+        """Выполнить operation(db) в транзакции писателя; результат - после commit"""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((future, operation))
+        return await future
+
+    async def stop(self):
+        """Дождаться выполнения поставленных операций и закрыть соединение писателя"""
+        self._closed = True
+
+        if self._task is not None:
+            # Пустая операция-маркер: все, что было поставлено до нее, уже выполнено
+            self._queue.put_nowait((None, None))
+            await self._task
+            self._task = None
+
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            if self.max_delay and batch[0][0] is not None:
+                await asyncio.sleep(self.max_delay)
+
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            stopping = any(future is None for future, _ in batch)
+            batch = [item for item in batch if item[0] is not None]
+            if batch:
+                await self._execute(batch)
+            if stopping:
+                return
+
+    async def _execute(self, batch):
+        """Выполнить пачку одной транзакцией и раздать результаты"""
+        try:
+            if self._conn is None:
+                self._conn = await self.pool.connect()
+
+            outcomes = await self._apply(batch)
+
+            started = time.perf_counter()
+            await self._conn.commit()
+            elapsed = time.perf_counter() - started
+        except Exception as e:
+            logger.error(f"Write batch of {len(batch)} failed: {e}")
+            await self._reset()
+            for future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self._ops_total += len(batch)
+        self._batches_total += 1
+        self._max_batch_seen = max(self._max_batch_seen, len(batch))
+        self._commit_time_total += elapsed
+        self._commit_time_max = max(self._commit_time_max, elapsed)
+
+        for (future, _), outcome in zip(batch, outcomes):
+            if outcome is None or future.done():
+                continue
+            ok, value = outcome
+            if ok:
+                future.set_result(value)
+            else:
+                self._failed_ops += 1
+                future.set_exception(value)
+
+    async def _apply(self, batch):
+        """Выполнить операции пачки в новой транзакции; [(успех, результат) | None для отмененных]"""
+        db = self._conn
+        outcomes = []
+        # SAVEPOINT на каждую операцию - лишние обращения к потоку SQLite, поэтому
+        # они включаются только после первой откатившейся операции пачки
+        isolated = False
+
+        await db.execute('BEGIN IMMEDIATE')
+        for future, operation in batch:
+            if future.cancelled():
+                outcomes.append(None)
+                continue
+
+            if isolated:
+                await db.execute('SAVEPOINT op')
+            try:
+                result = await operation(db)
+            except Exception as e:
+                outcome = (True, e.result) if isinstance(e, Rollback) else (False, e)
+                if isolated:
+                    await db.execute('ROLLBACK TO op')
+                    await db.execute('RELEASE op')
+                else:
+                    # Откатить транзакцию и повторить предыдущие (успешные) операции:
+                    # состояние перед этой операцией то же, поэтому ее исход не изменится
+                    await db.rollback()
+                    await db.execute('BEGIN IMMEDIATE')
+                    for index, (_, previous) in enumerate(batch[:len(outcomes)]):
+                        if outcomes[index] is not None:
+                            outcomes[index] = (True, await previous(db))
+                    isolated = True
+                    self._retried_batches += 1
+                outcomes.append(outcome)
+            else:
+                if isolated:
+                    await db.execute('RELEASE op')
+                outcomes.append((True, result))
+
+        return outcomes
+
+    async def _reset(self):
+        """Откатить незавершенную транзакцию; неисправное соединение закрыть"""
+        if self._conn is None:
+            return
+
+        try:
+            if self._conn.in_transaction:
+                await self._conn.rollback()
+        except Exception:
+            try:
+                await self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def stats(self):
+        """Статистика писателя"""
+        return {
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'ops_total': self._ops_total,
+            'batches_total': self._batches_total,
+            'failed_ops': self._failed_ops,
+            'retried_batches': self._retried_batches,
+            'avg_batch': self._ops_total / self._batches_total if self._batches_total else 0.0,
+            'max_batch': self._max_batch_seen,
+            'commit_time_avg_ms': (self._commit_time_total / self._batches_total * 1000) if self._batches_total else 0.0,
+            'commit_time_max_ms': self._commit_time_max * 1000,
+        }
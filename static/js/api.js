@@ -1,10 +1,16 @@
 // API модуль для взаимодействия с бэкендом
+
+// POST-запросы, которые ничего не меняют
+const READ_ONLY_ENDPOINTS = new Set(['/api/batch', '/api/user/activity']);
+
 class API {
     constructor() {
         this.baseUrl = CONFIG.API_URL;
         this.tg = window.Telegram.WebApp;
         this.userId = this.tg.initDataUnsafe?.user?.id || 0;
         this.userData = this.tg.initDataUnsafe?.user || {};
+        // Вызывается после успешного запроса, меняющего данные (игра, продажа, вывод...)
+        this.onMutation = null;
     }
 
     async request(endpoint, method = 'GET', data = null) {
@@ -28,6 +34,10 @@ class API {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
             
+            if (method !== 'GET' && !READ_ONLY_ENDPOINTS.has(endpoint) && this.onMutation) {
+                this.onMutation(endpoint);
+            }
+            
             return await response.json();
         } catch (error) {
             console.error('API request error:', error);
@@ -80,14 +90,35 @@ class API {
         return await this.request(`/api/games/rolls/bets?game_number=${gameNumber}`);
     }
 
+    // Push-события (раунды Rolls, пул ставок, результаты, баланс)
+    connectRealtime(onEvent) {
+        const socket = new WebSocket(`${this.baseUrl.replace(/^http/, 'ws')}/api/ws`);
+
+        // initData - первым сообщением, а не в URL (query-строка попадает в логи прокси)
+        socket.onopen = () => {
+            socket.send(JSON.stringify({ init_data: this.tg.initData, user_id: this.userId }));
+        };
+
+        socket.onmessage = (message) => {
+            try {
+                onEvent(JSON.parse(message.data));
+            } catch (error) {
+                console.error('Realtime event error:', error);
+            }
+        };
+
+        return socket;
+    }
+
     // Mutants (Cases)
     async canOpenFreeCase() {
         return await this.request('/api/games/mutants/free-case-status');
     }
 
-    async openCase(caseName) {
+    async openCase(caseName, count = 1) {
         return await this.request('/api/games/mutants/open-case', 'POST', {
-            case_name: caseName
+            case_name: caseName,
+            count: count
         });
     }
 
@@ -95,9 +126,20 @@ class API {
         return await this.request(`/api/games/mutants/history?limit=${limit}`);
     }
 
+    // Данные для старта приложения одним запросом
+    async bootstrap(include = null) {
+        return await this.request(`/api/bootstrap${include ? `?include=${include.join(',')}` : ''}`);
+    }
+
+    // Несколько ресурсов одним запросом: { stats: {}, inventory: { limit: 50 } }
+    async batch(resources) {
+        return await this.request('/api/batch', 'POST', resources);
+    }
+
     // Инвентарь
-    async getInventory() {
-        return await this.request('/api/inventory');
+    async getInventory(params = {}) {
+        const query = new URLSearchParams(params).toString();
+        return await this.request(`/api/inventory${query ? `?${query}` : ''}`);
     }
 
     async sellItem(itemId) {
@@ -106,13 +148,17 @@ class API {
         });
     }
 
-    async sellAllItems() {
-        return await this.request('/api/inventory/sell-all', 'POST');
+    async sellAllItems(filter = {}) {
+        return await this.request('/api/inventory/sell-all', 'POST', filter);
     }
 
     // Лидерборд
-    async getLeaderboard(limit = 35) {
-        return await this.request(`/api/leaderboard?limit=${limit}`);
+    async getLeaderboard(limit = 35, window = 'all') {
+        return await this.request(`/api/leaderboard?limit=${limit}&window=${window}`);
+    }
+
+    async getLeaderboardRank(window = 'all') {
+        return await this.request(`/api/leaderboard/me?window=${window}`);
     }
 
     // Рефералы
@@ -6,6 +6,8 @@ class CasinoApp {
         this.userData = null;
         this.balance = 0;
         this.refBalance = 0;
+        this.prefetched = {};
+        this.prefetchedAt = 0;
         
         this.init();
     }
@@ -19,8 +21,8 @@ class CasinoApp {
         // Установка темы
         document.body.style.backgroundColor = this.tg.backgroundColor || '#0a0e27';
         
-        // Загрузка данных пользователя
-        await this.loadUserData();
+        // Все стартовые данные одним запросом
+        await this.loadBootstrap();
         
         // Инициализация UI
         this.setupEventListeners();
@@ -34,20 +36,48 @@ class CasinoApp {
         setInterval(() => this.updateActivity(), 30000);
     }
 
-    async loadUserData() {
+    async loadBootstrap() {
         try {
-            const data = await api.getUserData();
-            this.userData = data.user;
-            this.balance = data.balance;
-            this.refBalance = data.ref_balance;
+            const data = await api.bootstrap();
+            this.applyUserData(data.user);
             
-            this.updateHeader();
+            // Остальное используется при первом открытии вкладок, пока не устарело
+            this.prefetched = data;
+            this.prefetchedAt = Date.now();
+            api.onMutation = () => { this.prefetched = {}; };
+        } catch (error) {
+            console.error('Error loading bootstrap data:', error);
+            await this.loadUserData();
+        }
+    }
+
+    takePrefetched(name) {
+        // Данные bootstrap годны PREFETCH_TTL и до первого изменения (игра, продажа...)
+        if (Date.now() - this.prefetchedAt > CONFIG.PREFETCH_TTL) {
+            this.prefetched = {};
+        }
+        const data = this.prefetched[name];
+        delete this.prefetched[name];
+        return data && !data.error ? data : null;
+    }
+
+    async loadUserData() {
+        try {
+            this.applyUserData(await api.getUserData());
         } catch (error) {
             console.error('Error loading user data:', error);
             this.showNotification('Ошибка загрузки данных', 'error');
         }
     }
 
+    applyUserData(data) {
+        this.userData = data.user;
+        this.balance = data.balance;
+        this.refBalance = data.ref_balance;
+        
+        this.updateHeader();
+    }
+
     updateHeader() {
         // Обновление аватара
         const avatar = document.getElementById('user-avatar');
@@ -194,7 +224,7 @@ class CasinoApp {
         `;
 
         try {
-            const leaderboard = await api.getLeaderboard();
+            const leaderboard = this.takePrefetched('leaderboard') || await api.getLeaderboard();
             const listElement = document.getElementById('leaderboard-list');
             
             if (leaderboard.length === 0) {
@@ -293,8 +323,11 @@ class CasinoApp {
 
     async updateProfileData() {
         try {
-            const stats = await api.getUserStats();
-            const inventory = await api.getInventory();
+            let stats = this.takePrefetched('stats');
+            let inventoryPage = this.takePrefetched('inventory');
+            if (!stats || !inventoryPage) {
+                ({ stats, inventory: inventoryPage } = await api.batch({ stats: {}, inventory: {} }));
+            }
 
             // Аватар
             const avatar = document.getElementById('profile-avatar');
@@ -313,19 +346,23 @@ class CasinoApp {
             document.getElementById('stat-games').textContent = stats.games_played || 0;
             document.getElementById('stat-deposits').textContent = `${(stats.total_deposits || 0).toFixed(2)}`;
 
-            // Инвентарь
-            this.displayInventory(inventory);
+            // Инвентарь (первая страница, остальное - по кнопке)
+            this.inventory = inventoryPage.items;
+            this.inventoryCursor = inventoryPage.next_cursor;
+            this.inventoryTotal = inventoryPage.total;
+            this.displayInventory();
         } catch (error) {
             console.error('Error updating profile:', error);
         }
     }
 
-    displayInventory(inventory) {
+    displayInventory() {
+        const inventory = this.inventory;
         const grid = document.getElementById('inventory-grid');
         const countElement = document.getElementById('inventory-count');
         const sellAllBtn = document.getElementById('sell-all-btn');
 
-        countElement.textContent = inventory.length;
+        countElement.textContent = this.inventoryTotal;
 
         if (inventory.length === 0) {
             grid.innerHTML = '<div class="empty-inventory" style="grid-column: 1 / -1;">Инвентарь пуст</div>';
@@ -342,6 +379,13 @@ class CasinoApp {
             </div>
         `).join('');
 
+        if (this.inventoryCursor) {
+            grid.insertAdjacentHTML('beforeend', `
+                <button class="sell-all-btn" id="inventory-more-btn" style="grid-column: 1 / -1;">Показать еще</button>
+            `);
+            document.getElementById('inventory-more-btn').addEventListener('click', () => this.loadMoreInventory());
+        }
+
         // Обработчики кликов на предметы
         grid.querySelectorAll('.inventory-item').forEach(item => {
             item.addEventListener('click', (e) => {
@@ -352,6 +396,17 @@ class CasinoApp {
         });
     }
 
+    async loadMoreInventory() {
+        try {
+            const page = await api.getInventory({ cursor: this.inventoryCursor });
+            this.inventory = this.inventory.concat(page.items);
+            this.inventoryCursor = page.next_cursor;
+            this.displayInventory();
+        } catch (error) {
+            this.showNotification('Ошибка загрузки', 'error');
+        }
+    }
+
     showItemModal(item) {
         const modal = document.getElementById('item-modal');
         document.getElementById('item-name').textContent = item.item_name;
@@ -482,7 +537,7 @@ class CasinoApp {
         modal.classList.add('active');
 
         try {
-            const refData = await api.getReferralData();
+            const refData = this.takePrefetched('referral') || await api.getReferralData();
 
             document.getElementById('ref-count').textContent = refData.referrals_count;
             document.getElementById('ref-earned').textContent = `${refData.total_earned.toFixed(2)} TON`;
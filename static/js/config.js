@@ -69,14 +69,14 @@ const CONFIG = {
                     limited: true,
                     rewards: [
                         { name: 'Low Rider', type: 'nft', value: 500, chance: 0.01 },
-                        { name: 'Cigar Doggystyle', type: 'nft', value: 200, chance: 0.36 },
-                        { name: 'Cigar Infinity', type: 'nft', value: 100, chance: 1 },
-                        { name: 'Cigar Space', type: 'nft', value: 75, chance: 1.76 },
-                        { name: 'Snoop Dog King Snoop', type: 'nft', value: 50, chance: 2.52 },
-                        { name: 'Snoop Dog', type: 'nft', value: 30, chance: 8.41 },
-                        { name: 'Swag Bag', type: 'nft', value: 20, chance: 9 },
-                        { name: '2.2 TON', value: 2.2, chance: 80 },
-                        { name: 'Ничего', value: 0, chance: -3.06 }
+                        { name: 'Cigar Doggystyle', type: 'nft', value: 200, chance: 0.15 },
+                        { name: 'Cigar Infinity', type: 'nft', value: 100, chance: 0.5 },
+                        { name: 'Cigar Space', type: 'nft', value: 75, chance: 0.8 },
+                        { name: 'Snoop Dog King Snoop', type: 'nft', value: 50, chance: 1.2 },
+                        { name: 'Snoop Dog', type: 'nft', value: 30, chance: 4 },
+                        { name: 'Swag Bag', type: 'nft', value: 20, chance: 5 },
+                        { name: '2.2 TON', value: 2.2, chance: 50 },
+                        { name: 'Ничего', value: 0, chance: 38.34 }
                     ]
                 }
             }
@@ -96,7 +96,10 @@ const CONFIG = {
     REFERRAL: {
         DEFAULT_PERCENT: 10,
         MIN_TRANSFER: 3
-    }
+    },
+    
+    // Сколько стартовые данные (bootstrap) годны для первого открытия вкладок
+    PREFETCH_TTL: 30000 // 30 секунд
 };
 
 // Экспорт для использования в других файлах
@@ -8,11 +8,25 @@ class RollsGame {
         this.timeRemaining = 10;
         this.betColor = null;
         this.betAmount = 0;
+        this.rolling = false;
+        this.socket = null;
+        this.destroyed = false;
+        this.history = [];
+        
+        // Предыдущий экземпляр игры больше не нужен
+        if (app.rollsGame) app.rollsGame.destroy();
+        app.rollsGame = this;
         
         this.render();
         this.startGameLoop();
     }
 
+    destroy() {
+        this.destroyed = true;
+        clearInterval(this.gameInterval);
+        if (this.socket) this.socket.close();
+    }
+
     render() {
         this.container.innerHTML = `
             <div class="rolls-container">
@@ -96,51 +110,107 @@ class RollsGame {
         }
 
         try {
-            await api.placeBet(this.betColor, amount);
-            await this.app.loadUserData();
+            const result = await api.placeBet(this.betColor, amount);
+            this.app.balance = result.balance;
+            this.app.updateHeader();
             this.app.showNotification('Ставка принята', 'success');
-            this.updateBetsDisplay();
+            if (!this.isLive()) this.updateBetsDisplay();
         } catch (error) {
             this.app.showNotification('Ошибка ставки', 'error');
         }
     }
 
     async startGameLoop() {
-        this.currentGame = await api.getCurrentRollsGame();
+        await this.syncRound();
+        this.connectRealtime();
         
         this.gameInterval = setInterval(async () => {
-            this.timeRemaining--;
+            if (this.rolling) return;
+
+            if (this.timeRemaining > 0) this.timeRemaining--;
             document.getElementById('timer').textContent = `ROLLING IN ${this.timeRemaining}`;
 
+            // Пока WebSocket подключен, раунды, пул ставок и результаты приходят push-событиями
+            if (this.isLive()) return;
+
             if (this.timeRemaining <= 0) {
+                this.rolling = true;
                 await this.playRound();
-                this.timeRemaining = 10;
+                await this.syncRound();
+                this.rolling = false;
             }
 
             this.updateBetsDisplay();
         }, 1000);
     }
 
+    connectRealtime() {
+        try {
+            this.socket = api.connectRealtime(event => this.handleEvent(event));
+            this.socket.onclose = () => {
+                // Переподключение; до него работает опрос
+                if (!this.destroyed) setTimeout(() => this.connectRealtime(), 3000);
+            };
+        } catch (error) {
+            console.error('Realtime connection error:', error);
+        }
+    }
+
+    isLive() {
+        return this.socket && this.socket.readyState === WebSocket.OPEN;
+    }
+
+    handleEvent({ event, data }) {
+        switch (event) {
+            case 'round_start':
+                this.currentGame = { game_number: data.game_number };
+                this.timeRemaining = Math.ceil(data.time_remaining);
+                this.renderPool({ red: 0, blue: 0, green: 0 });
+                break;
+            case 'pool':
+                if (data.game_number === this.currentGame?.game_number) {
+                    this.renderPool(data.pool);
+                }
+                break;
+            case 'result':
+                this.generateChips();
+                setTimeout(() => {
+                    this.highlightWinner(data.winning_color);
+                    this.history.unshift(data);
+                    this.renderHistory();
+                }, 2000);
+                break;
+            case 'balance':
+                this.app.balance = data.balance;
+                this.app.updateHeader();
+                break;
+        }
+    }
+
+    async syncRound() {
+        // Раунды ведет сервер: номер игры и оставшееся время берутся оттуда
+        try {
+            this.currentGame = await api.getCurrentRollsGame();
+            this.timeRemaining = Math.ceil(this.currentGame.time_remaining);
+        } catch (error) {
+            console.error('Error syncing round:', error);
+        }
+    }
+
     async playRound() {
         try {
+            const gameNumber = this.currentGame.game_number;
             this.generateChips();
             
-            // Имитация выбора победителя
-            const random = Math.random() * 100;
-            let winningColor;
+            // Победный цвет определяется сервером
+            await new Promise(resolve => setTimeout(resolve, 2000));
+            const history = await api.getRollsHistory(1);
             
-            if (random < 2) {
-                winningColor = 'green';
-            } else if (random < 51) {
-                winningColor = 'red';
-            } else {
-                winningColor = 'blue';
+            if (history.length && history[0].game_number === gameNumber) {
+                this.highlightWinner(history[0].winning_color);
+                await this.app.loadUserData();
             }
-
-            setTimeout(() => {
-                this.highlightWinner(winningColor);
-                this.loadHistory();
-            }, 2000);
+            this.loadHistory();
         } catch (error) {
             console.error('Error playing round:', error);
         }
@@ -190,44 +260,54 @@ class RollsGame {
         try {
             const bets = await api.getRollsBets(this.currentGame.game_number);
             
-            const redTotal = bets.filter(b => b.color === 'red').reduce((sum, b) => sum + b.amount, 0);
-            const blueTotal = bets.filter(b => b.color === 'blue').reduce((sum, b) => sum + b.amount, 0);
-            const greenTotal = bets.filter(b => b.color === 'green').reduce((sum, b) => sum + b.amount, 0);
-
-            document.getElementById('red-bets').textContent = `${redTotal.toFixed(2)} TON`;
-            document.getElementById('blue-bets').textContent = `${blueTotal.toFixed(2)} TON`;
-            document.getElementById('green-bets').textContent = `${greenTotal.toFixed(2)} TON`;
+            this.renderPool({
+                red: bets.filter(b => b.color === 'red').reduce((sum, b) => sum + b.amount, 0),
+                blue: bets.filter(b => b.color === 'blue').reduce((sum, b) => sum + b.amount, 0),
+                green: bets.filter(b => b.color === 'green').reduce((sum, b) => sum + b.amount, 0)
+            });
         } catch (error) {
             console.error('Error updating bets:', error);
         }
     }
 
+    renderPool(pool) {
+        document.getElementById('red-bets').textContent = `${pool.red.toFixed(2)} TON`;
+        document.getElementById('blue-bets').textContent = `${pool.blue.toFixed(2)} TON`;
+        document.getElementById('green-bets').textContent = `${pool.green.toFixed(2)} TON`;
+    }
+
     async loadHistory() {
         try {
-            const history = await api.getRollsHistory(100);
-            const container = document.getElementById('rolls-history');
-            
-            container.innerHTML = '<div style="font-size: 12px; color: #8892b0; margin-bottom: 8px;">Last 100</div>';
-            
-            const stats = { red: 0, blue: 0, green: 0 };
-            
-            history.slice(0, 100).forEach(game => {
-                const chip = document.createElement('div');
-                chip.className = `history-chip ${game.winning_color}`;
-                container.appendChild(chip);
-                stats[game.winning_color]++;
-            });
-
-            const statsDiv = document.createElement('div');
-            statsDiv.style.cssText = 'display: flex; gap: 8px; margin-top: 8px; font-size: 12px;';
-            statsDiv.innerHTML = `
-                <span style="color: #e74c3c;">${stats.red}</span>
-                <span style="color: #3498db;">${stats.blue}</span>
-                <span style="color: #2ecc71;">${stats.green}</span>
-            `;
-            container.appendChild(statsDiv);
+            this.history = await api.getRollsHistory(100);
+            this.renderHistory();
         } catch (error) {
             console.error('Error loading history:', error);
         }
     }
+
+    renderHistory() {
+        const container = document.getElementById('rolls-history');
+        if (!container) return;
+        
+        container.innerHTML = '<div style="font-size: 12px; color: #8892b0; margin-bottom: 8px;">Last 100</div>';
+        
+        const stats = { red: 0, blue: 0, green: 0 };
+        
+        this.history = this.history.slice(0, 100);
+        this.history.forEach(game => {
+            const chip = document.createElement('div');
+            chip.className = `history-chip ${game.winning_color}`;
+            container.appendChild(chip);
+            stats[game.winning_color]++;
+        });
+
+        const statsDiv = document.createElement('div');
+        statsDiv.style.cssText = 'display: flex; gap: 8px; margin-top: 8px; font-size: 12px;';
+        statsDiv.innerHTML = `
+            <span style="color: #e74c3c;">${stats.red}</span>
+            <span style="color: #3498db;">${stats.blue}</span>
+            <span style="color: #2ecc71;">${stats.green}</span>
+        `;
+        container.appendChild(statsDiv);
+    }
 }
@@ -0,0 +1,111 @@
+"""
+Тесты проверки initData: подпись, срок действия, кэш сессий и первое сообщение WebSocket
+Запуск: python -m pytest -q tests
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+from urllib.parse import urlencode
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.auth import MAX_AUTH_AGE, InitDataAuth, verify_init_data
+
+BOT_TOKEN = '123456:test-token'
+SECRET_KEY = hmac.new(b'WebAppData', BOT_TOKEN.encode(), hashlib.sha256).digest()
+
+
+def sign(user_id=42, auth_date=None, token=BOT_TOKEN):
+    """initData, подписанная как в Telegram WebApp"""
+    fields = {
+        'auth_date': str(int(time.time()) if auth_date is None else auth_date),
+        'query_id': 'AAE',
+        'user': json.dumps({'id': user_id, 'first_name': 'Test'}),
+    }
+    secret_key = hmac.new(b'WebAppData', token.encode(), hashlib.sha256).digest()
+    data_check_string = '\n'.join(f'{key}={fields[key]}' for key in sorted(fields))
+    fields['hash'] = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+    return urlencode(fields)
+
+
+def test_valid_init_data_is_accepted():
+    now = time.time()
+    assert verify_init_data(sign(42, int(now)), SECRET_KEY, now=now) == (42, int(now))
+
+
+def test_tampered_init_data_is_rejected():
+    init_data = sign(42)
+
+    assert verify_init_data(init_data.replace('%22id%22%3A+42', '%22id%22%3A+43'), SECRET_KEY) is None
+    assert verify_init_data(sign(42, token='654321:other'), SECRET_KEY) is None
+    assert verify_init_data(init_data.split('&hash=')[0], SECRET_KEY) is None
+    assert verify_init_data('not a query string', SECRET_KEY) is None
+
+
+def test_expired_init_data_is_rejected():
+    now = time.time()
+    assert verify_init_data(sign(42, int(now) - MAX_AUTH_AGE - 1), SECRET_KEY, now=now) is None
+    assert verify_init_data(sign(42, int(now) - 60), SECRET_KEY, max_age=30, now=now) is None
+
+
+def test_failed_verification_is_not_cached():
+    auth = InitDataAuth(BOT_TOKEN)
+    init_data = sign(42)
+    forged = init_data[:-4] + '0000'
+
+    assert auth.authenticate(init_data) == 42
+    assert auth.authenticate(init_data) == 42
+    assert auth.authenticate(forged) is None
+    assert auth.authenticate(forged) is None
+
+    stats = auth.stats()
+    assert stats['hits'] == 1 and stats['failures'] == 2 and stats['cached'] == 1
+
+
+def test_cached_session_expires_with_init_data():
+    auth = InitDataAuth(BOT_TOKEN)
+    init_data = sign(42, int(time.time()) - MAX_AUTH_AGE + 1)
+
+    assert auth.authenticate(init_data) == 42
+    # Кэш не продлевает initData дольше MAX_AUTH_AGE
+    _, expires_at = auth._cache[init_data]
+    assert expires_at <= time.time() + 1
+
+
+def test_websocket_first_message():
+    auth = InitDataAuth(BOT_TOKEN)
+
+    assert auth.authenticate_message({'init_data': sign(42)}) == 42
+    assert auth.authenticate_message({'init_data': sign(42, int(time.time()) - MAX_AUTH_AGE - 1)}) is None
+    assert auth.authenticate_message({'user_id': 42}) is None
+    assert auth.authenticate_message({'init_data': 42}) is None
+    assert auth.authenticate_message('init_data') is None
+
+    # Режим разработки: пользователь из сообщения, как из заголовка X-Telegram-User-Id
+    dev = InitDataAuth(enabled=False)
+    assert dev.authenticate_message({'user_id': 42}) == 42
+    assert dev.authenticate_message({'user_id': 'x'}) is None
+
+
+def test_middleware_ignores_init_data_in_url():
+    auth = InitDataAuth(BOT_TOKEN)
+
+    async def whoami(request):
+        return web.json_response({'user_id': request['user_id']})
+
+    async def scenario():
+        app = web.Application(middlewares=[auth.middleware])
+        app.router.add_get('/api/whoami', whoami)
+        async with TestClient(TestServer(app)) as client:
+            init_data = sign(42)
+            in_header = await client.get('/api/whoami', headers={'X-Telegram-Init-Data': init_data})
+            in_url = await client.get('/api/whoami', params={'init_data': init_data})
+            return in_header.status, await in_header.json(), in_url.status
+
+    assert asyncio.run(scenario()) == (200, {'user_id': 42}, 401)
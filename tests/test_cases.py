@@ -0,0 +1,121 @@
+"""
+Тесты каталога кейсов: проверка cases.json и ожидаемого выигрыша
+Запуск: python -m pytest -q tests
+"""
+import copy
+import json
+import math
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.cases import MAX_RTP, MIN_RTP, AliasTable, CaseCatalog, expected_value, validate_case
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'cases.json')
+
+
+def test_catalog_cases_are_profitable():
+    catalog = CaseCatalog(CATALOG_PATH)
+    with open(CATALOG_PATH, encoding='utf-8') as f:
+        keys = list(json.load(f))
+
+    assert keys
+    for key in keys:
+        case = catalog.get(key)
+        ev = expected_value(case)
+        if case['price'] == 0:
+            assert case.get('cooldown'), key
+            continue
+        assert ev < case['price'], key
+        assert MIN_RTP <= ev / case['price'] <= MAX_RTP, key
+
+
+def paid_case():
+    return {
+        'price': 10,
+        'rewards': [
+            {'name': 'win', 'value': 20, 'chance': 40},
+            {'name': 'none', 'value': 0, 'chance': 60},
+        ],
+    }
+
+
+def test_case_paying_more_than_price_is_rejected():
+    case = paid_case()
+    validate_case('OK', case)
+
+    case['rewards'][0]['chance'], case['rewards'][1]['chance'] = 50, 50   # EV = цена
+    with pytest.raises(ValueError, match='expected value'):
+        validate_case('EVEN', case)
+
+    # Даже при широкой полосе RTP кейс не может окупаться для игрока
+    with pytest.raises(ValueError, match='expected value'):
+        validate_case('EVEN', case, 0.1, 1.5)
+
+
+def test_case_outside_rtp_band_is_rejected():
+    case = paid_case()
+    case['rewards'][0]['chance'], case['rewards'][1]['chance'] = 5, 95   # RTP 10%
+    with pytest.raises(ValueError, match='RTP'):
+        validate_case('STINGY', case)
+
+
+def test_free_case_requires_cooldown():
+    case = {'price': 0, 'rewards': [{'name': '0.05 TON', 'value': 0.05, 'chance': 100}]}
+    with pytest.raises(ValueError, match='cooldown'):
+        validate_case('FREE', case)
+    validate_case('FREE', dict(case, cooldown=86400))
+
+
+def test_invalid_catalog_is_not_loaded(tmp_path):
+    with open(CATALOG_PATH, encoding='utf-8') as f:
+        cases = json.load(f)
+    broken = copy.deepcopy(cases)
+    broken['SNOOP_GIFTS']['price'] = 1
+
+    path = tmp_path / 'cases.json'
+    path.write_text(json.dumps(broken), encoding='utf-8')
+    with pytest.raises(ValueError):
+        CaseCatalog(str(path))
+
+
+def alias_probabilities(table):
+    """Точная вероятность каждого индекса по столбцам таблицы псевдонимов"""
+    probabilities = [0.0] * table.n
+    for column in range(table.n):
+        probabilities[column] += table.prob[column] / table.n
+        probabilities[table.alias[column]] += (1 - table.prob[column]) / table.n
+    return probabilities
+
+
+def test_alias_table_matches_configured_chances():
+    with open(CATALOG_PATH, encoding='utf-8') as f:
+        cases = json.load(f)
+
+    for key, case in cases.items():
+        chances = [reward['chance'] for reward in case['rewards']]
+        probabilities = alias_probabilities(AliasTable(chances))
+        for chance, probability in zip(chances, probabilities):
+            assert probability == pytest.approx(chance / 100, abs=1e-12), key
+
+
+def test_draw_frequencies_match_configured_chances():
+    catalog = CaseCatalog(CATALOG_PATH)
+    rng = random.Random(20240601)
+    draws = 200000
+
+    for key in ('REGULAR_1', 'SNOOP_GIFTS'):
+        rewards = catalog.get(key)['rewards']
+        counts = {}
+        for reward in catalog.draw_many(key, draws, rng):
+            counts[reward['name']] = counts.get(reward['name'], 0) + 1
+
+        for reward in rewards:
+            p = reward['chance'] / 100
+            expected = draws * p
+            # 5 стандартных отклонений биномиального распределения
+            assert abs(counts.get(reward['name'], 0) - expected) <= 5 * math.sqrt(draws * p * (1 - p)) + 1, \
+                (key, reward['name'], counts.get(reward['name'], 0), expected)
@@ -0,0 +1,74 @@
+"""
+Тесты лидерборда: границы окон "день" и "неделя" (UTC) и загрузка из строк БД
+Запуск: python -m pytest -q tests
+"""
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.leaderboard import DAY_SECONDS, Leaderboard, build_leaderboard, leaderboard_since, parse_timestamp
+
+# Понедельник, 00:00:00 UTC
+MONDAY = datetime(2026, 3, 2, tzinfo=timezone.utc).timestamp()
+
+
+def scores(leaderboard, window, now):
+    return {row['user_id']: row['total_deposits'] for row in leaderboard.top(window, now=now)}
+
+
+def sqlite_time(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def test_day_window_resets_at_utc_midnight():
+    leaderboard = Leaderboard()
+    leaderboard.record(1, 10, now=MONDAY + DAY_SECONDS - 1)   # 23:59:59
+    leaderboard.record(2, 5, now=MONDAY + DAY_SECONDS)        # 00:00:00 следующего дня
+
+    assert scores(leaderboard, 'day', MONDAY + DAY_SECONDS) == {2: 5}
+    assert scores(leaderboard, 'week', MONDAY + DAY_SECONDS) == {1: 10, 2: 5}
+    assert leaderboard.rank(1, 'day', now=MONDAY + DAY_SECONDS)['rank'] is None
+    assert leaderboard.rank(1, 'week', now=MONDAY + DAY_SECONDS)['rank'] == 1
+
+
+def test_week_window_drops_the_eighth_day():
+    leaderboard = Leaderboard()
+    leaderboard.record(1, 10, now=MONDAY)
+    leaderboard.record(2, 3, now=MONDAY + 3 * DAY_SECONDS)
+
+    # Последняя секунда седьмого дня - пополнение еще в неделе
+    assert scores(leaderboard, 'week', MONDAY + 7 * DAY_SECONDS - 1) == {1: 10, 2: 3}
+    # Начало восьмого дня - день пополнения выпал из окна
+    assert scores(leaderboard, 'week', MONDAY + 7 * DAY_SECONDS) == {2: 3}
+    assert scores(leaderboard, 'all', MONDAY + 7 * DAY_SECONDS) == {1: 10, 2: 3}
+
+
+def test_late_record_older_than_week_counts_only_all_time():
+    leaderboard = Leaderboard()
+    now = MONDAY + 10 * DAY_SECONDS
+    leaderboard.record(1, 1, now=now)
+    leaderboard.record(2, 7, now=now - 7 * DAY_SECONDS)
+
+    assert scores(leaderboard, 'week', now) == {1: 1}
+    assert scores(leaderboard, 'all', now) == {2: 7, 1: 1}
+
+
+def test_build_leaderboard_matches_window_start():
+    now = MONDAY + 8 * DAY_SECONDS + 3600   # вторник следующей недели, 01:00
+    since = parse_timestamp(leaderboard_since(now))
+    assert since == MONDAY + 2 * DAY_SECONDS
+
+    users = [(1, 'alice', 'Alice', 30), (2, 'bob', 'Bob', 12), (3, 'carol', 'Carol', 0)]
+    events = [
+        (1, 20, sqlite_time(since - 1)),   # за день до окна - только в общем рейтинге
+        (1, 10, sqlite_time(since)),
+        (2, 12, sqlite_time(now - 60)),
+    ]
+    leaderboard = build_leaderboard(users, [(3, 4)], events)
+
+    # События окна не прибавляются к накопленным суммам повторно
+    assert scores(leaderboard, 'all', now) == {1: 30, 2: 12, 3: 4}
+    assert scores(leaderboard, 'week', now) == {2: 12, 1: 10}
+    assert scores(leaderboard, 'day', now) == {2: 12}
+    assert leaderboard.top('week', now=now)[0]['username'] == 'bob'
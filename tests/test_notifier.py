@@ -0,0 +1,120 @@
+"""
+Тесты outbox уведомлений: сводки однотипных уведомлений и повторы с экспоненциальной задержкой
+Запуск: python -m pytest -q tests
+"""
+import asyncio
+import os
+import sys
+import time
+
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.methods import SendMessage
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.notifier import BACKOFF_BASE, NotificationDispatcher
+from database.db_manager import DatabaseManager
+
+DIGEST_INTERVAL = 60
+
+
+class FakeBot:
+    """Запоминает отправленные сообщения; errors - исключения для следующих отправок"""
+
+    def __init__(self, errors=()):
+        self.sent = []
+        self.errors = list(errors)
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append((chat_id, text))
+
+
+async def open_dispatcher(path, bot):
+    db = DatabaseManager(path)
+    await db.init_database()
+    db.start()
+    # Высокий лимит чата - тест не ждет реальных секунд между отправками
+    return db, NotificationDispatcher(db, bot, chat_rate=100, digest_interval=DIGEST_INTERVAL)
+
+
+def deposit(user_id, amount):
+    return {'user_id': user_id, 'username': f'user{user_id}', 'amount': amount, 'method': 'ton'}
+
+
+def test_burst_is_collapsed_into_digest(tmp_path):
+    bot = FakeBot()
+
+    async def scenario():
+        db, notifier = await open_dispatcher(str(tmp_path / 'outbox.db'), bot)
+        try:
+            await notifier.notify_many([(1, 'deposit', deposit(user_id, 2)) for user_id in range(5)])
+            await notifier.notify(2, 'message', {'text': 'hello'})
+            now = time.time()
+            await notifier.dispatch(now)
+            first = list(bot.sent)
+
+            # Следующее пополнение в течение интервала ждет его окончания
+            await notifier.notify(1, 'deposit', deposit(9, 3))
+            await notifier.dispatch(now + 1)
+            held = len(bot.sent)
+            await notifier.dispatch(now + DIGEST_INTERVAL + 1)
+
+            left = await db.get_due_notifications(now + 10 * DIGEST_INTERVAL)
+            return first, held, bot.sent[held:], left, notifier.stats()
+        finally:
+            await db.close()
+
+    first, held, later, left, stats = asyncio.run(scenario())
+
+    assert sorted(chat_id for chat_id, _ in first) == [1, 2]
+    digest = next(text for chat_id, text in first if chat_id == 1)
+    assert digest.startswith('💰 Пополнений за 1 мин: 5 на 10.00 TON')
+    assert held == 2
+    assert len(later) == 1 and later[0][1].startswith('💰 Новое пополнение!')
+    assert left == []
+    assert stats['digests_total'] == 1 and stats['collapsed_total'] == 5
+
+
+def test_failed_send_backs_off_exponentially(tmp_path):
+    bot = FakeBot(errors=[ConnectionError('timeout'), ConnectionError('timeout')])
+
+    async def scenario():
+        db, notifier = await open_dispatcher(str(tmp_path / 'outbox.db'), bot)
+        try:
+            await notifier.notify(1, 'message', {'text': 'hello'})
+            now = time.time()
+            schedule = []
+            for attempt_at in (now, now + BACKOFF_BASE, now + 3 * BACKOFF_BASE):
+                # До наступления задержки уведомление не выбирается
+                early = await db.get_due_notifications(attempt_at - 0.5)
+                schedule.append(([row['attempts'] for row in early], await notifier.dispatch(attempt_at)))
+            return schedule, await db.get_due_notifications(now + 1000)
+        finally:
+            await db.close()
+
+    schedule, left = asyncio.run(scenario())
+
+    # Задержки 2 и 4 секунды: попытки в now, now + 2, now + 6
+    assert schedule == [([], 1), ([], 1), ([], 1)]
+    assert bot.sent == [(1, 'hello')]
+    assert left == []
+
+
+def test_blocked_chat_is_dropped(tmp_path):
+    blocked = TelegramForbiddenError(SendMessage(chat_id=1, text='hello'), 'Forbidden: bot was blocked by the user')
+    bot = FakeBot(errors=[blocked])
+
+    async def scenario():
+        db, notifier = await open_dispatcher(str(tmp_path / 'outbox.db'), bot)
+        try:
+            await notifier.notify(1, 'message', {'text': 'hello'})
+            await notifier.dispatch(time.time())
+            return await db.get_due_notifications(time.time() + 10 ** 6), notifier.stats()
+        finally:
+            await db.close()
+
+    left, stats = asyncio.run(scenario())
+
+    assert left == [] and bot.sent == []
+    assert stats['dropped_total'] == 1 and stats['retries_total'] == 0
@@ -0,0 +1,79 @@
+"""
+Тесты Rolls: возврат ставок раундов без результата (ошибка расчета, перезапуск)
+Запуск: python -m pytest -q tests
+"""
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.rolls import RollsEngine
+from database.db_manager import DatabaseManager
+
+
+async def open_database(path, users=(1, 2)):
+    db = DatabaseManager(path)
+    await db.init_database()
+    db.start()
+    for user_id in users:
+        await db.register_user(user_id, f'user{user_id}', 'Test')
+        await db.add_balance(user_id, 10)
+    return db
+
+
+async def balance(db, user_id):
+    return (await db.get_balance(user_id))['balance']
+
+
+def test_startup_refunds_every_round_without_result(tmp_path):
+    async def scenario():
+        db = await open_database(str(tmp_path / 'rolls.db'))
+        # Раунд 1 не рассчитан (ошибка), раунд 2 рассчитан после него
+        await db.place_rolls_bet(1, 1, 'red', 4)
+        await db.place_rolls_bet(2, 2, 'blue', 3)
+        await db.settle_rolls_round(2, 'red', 2)
+        # Раунд 3 прерван остановкой сервера
+        await db.place_rolls_bet(2, 3, 'green', 1)
+
+        engine = RollsEngine(db, round_duration=60)
+        try:
+            await engine.start()
+            await engine.stop()
+
+            balances = await balance(db, 1), await balance(db, 2)
+            return engine, balances, await db.get_rolls_bets(1) + await db.get_rolls_bets(3)
+        finally:
+            await db.close()
+
+    engine, balances, bets = asyncio.run(scenario())
+
+    assert balances == (10, 7)
+    assert all(bet['win_amount'] == bet['amount'] for bet in bets)
+    # Отсчет продолжается с раунда 3: номер раунда с возвращенными ставками не переиспользуется
+    assert engine.game_number == 3
+
+
+def test_failed_settlement_is_refunded(tmp_path):
+    async def scenario():
+        db = await open_database(str(tmp_path / 'rolls.db'))
+
+        async def broken_settle(game_number, winning_color, multiplier):
+            raise RuntimeError('disk I/O error')
+        db.settle_rolls_round = broken_settle
+
+        engine = RollsEngine(db, round_duration=0.05)
+        try:
+            await engine.start()
+            await asyncio.sleep(0)   # открытие первого раунда
+            bet = await engine.place_bet(1, 'red', 4)
+            await asyncio.sleep(0.1)
+            await engine.stop()
+            return bet, await balance(db, 1), await db.get_rolls_bets(1)
+        finally:
+            await db.close()
+
+    bet, user_balance, bets = asyncio.run(scenario())
+
+    assert bet == {'game_number': 1, 'balance': 6}
+    assert user_balance == 10
+    assert bets == [{'user_id': 1, 'color': 'red', 'amount': 4, 'win_amount': 4}]
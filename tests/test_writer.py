@@ -0,0 +1,166 @@
+"""
+Тесты группового писателя: повтор пачки после ошибки, SAVEPOINT, Rollback, отмена, stop()
+Запуск: python -m pytest -q tests
+"""
+import asyncio
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.pool import ConnectionPool
+from database.writer import Rollback, WriteQueue
+
+
+def insert(value, fail=None):
+    """Операция: вставить value; fail - исключение, которое бросить после вставки"""
+    async def operation(db):
+        await db.execute('INSERT INTO items (value) VALUES (?)', (value,))
+        if fail is not None:
+            raise fail
+        return value
+    return operation
+
+
+def stored(path):
+    conn = sqlite3.connect(path)
+    try:
+        return [row[0] for row in conn.execute('SELECT value FROM items ORDER BY value')]
+    finally:
+        conn.close()
+
+
+async def open_writer(path):
+    writer = WriteQueue(ConnectionPool(path))
+
+    async def create(db):
+        await db.execute('CREATE TABLE items (value INTEGER)')
+    await writer.submit(create)
+    return writer
+
+
+async def in_one_batch(writer, operations, before_release=None):
+    """Поставить операции так, чтобы они попали в одну пачку: писатель занят операцией-затвором"""
+    gate = asyncio.Event()
+
+    async def hold(db):
+        await gate.wait()
+    held = asyncio.create_task(writer.submit(hold))
+    await asyncio.sleep(0.01)
+
+    tasks = [asyncio.create_task(writer.submit(operation)) for operation in operations]
+    await asyncio.sleep(0)
+    if before_release is not None:
+        before_release(tasks)
+    batches = writer.stats()['batches_total']
+
+    gate.set()
+    await held
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    # Затвор - отдельная пачка, операции - следующая
+    assert writer.stats()['batches_total'] == batches + 2
+    return results
+
+
+def test_failed_operation_rolls_back_only_itself(tmp_path):
+    path = str(tmp_path / 'writer.db')
+
+    async def scenario():
+        writer = await open_writer(path)
+        results = await in_one_batch(writer, [
+            insert(1),
+            insert(2, ValueError('first')),   # повтор пачки без SAVEPOINT
+            insert(3),
+            insert(4, KeyError('second')),    # уже с SAVEPOINT на операцию
+            insert(5),
+        ])
+        stats = writer.stats()
+        await writer.stop()
+        return results, stats
+
+    results, stats = asyncio.run(scenario())
+
+    assert results[0] == 1 and results[2] == 3 and results[4] == 5
+    assert isinstance(results[1], ValueError)
+    assert isinstance(results[3], KeyError)
+    assert stored(path) == [1, 3, 5]
+    assert stats['failed_ops'] == 2
+    assert stats['retried_batches'] == 1
+
+
+def test_rollback_returns_result_without_changes(tmp_path):
+    path = str(tmp_path / 'writer.db')
+
+    async def scenario():
+        writer = await open_writer(path)
+        results = await in_one_batch(writer, [
+            insert(1),
+            insert(2, Rollback({'reason': 'insufficient'})),
+            insert(3),
+        ])
+        stats = writer.stats()
+        await writer.stop()
+        return results, stats
+
+    results, stats = asyncio.run(scenario())
+
+    assert results == [1, {'reason': 'insufficient'}, 3]
+    assert stored(path) == [1, 3]
+    assert stats['failed_ops'] == 0
+
+
+def test_cancelled_operation_is_skipped(tmp_path):
+    path = str(tmp_path / 'writer.db')
+    executed = []
+
+    def tracked(value, fail=None):
+        operation = insert(value, fail)
+
+        async def run(db):
+            executed.append(value)
+            return await operation(db)
+        return run
+
+    async def scenario():
+        writer = await open_writer(path)
+        results = await in_one_batch(
+            writer,
+            [tracked(1), tracked(2), tracked(3, ValueError('after cancelled')), tracked(4)],
+            before_release=lambda tasks: tasks[1].cancel(),
+        )
+        await writer.stop()
+        return results
+
+    results = asyncio.run(scenario())
+
+    assert results[0] == 1 and results[3] == 4
+    assert isinstance(results[1], asyncio.CancelledError)
+    assert isinstance(results[2], ValueError)
+    # Отмененная операция не выполнялась ни в первом проходе, ни при повторе пачки
+    assert 2 not in executed
+    assert executed.count(1) == 2
+    assert stored(path) == [1, 4]
+
+
+def test_stop_drains_queue(tmp_path):
+    path = str(tmp_path / 'writer.db')
+
+    async def scenario():
+        writer = await open_writer(path)
+        tasks = [asyncio.create_task(writer.submit(insert(value))) for value in range(300)]
+        await asyncio.sleep(0)
+
+        await writer.stop()
+        assert all(task.done() for task in tasks)
+        results = [task.result() for task in tasks]
+
+        with pytest.raises(RuntimeError):
+            await writer.submit(insert(1000))
+        return results
+
+    results = asyncio.run(scenario())
+
+    assert results == list(range(300))
+    assert stored(path) == list(range(300))